@@ -0,0 +1,77 @@
+"""Cache of the values compiled from the configuration files.
+
+Parsing a configuration file, and evaluating its literals, is done only
+once: the compiled values are kept in memory for the current process,
+and in a binary sidecar file (the configuration file name followed by
+'.cache') for the next ones. Both are invalidated when the modification
+time or the size of the configuration file change, or when the version
+of the parser changes.
+
+The compiled values must be a dictionary of built-in types and numpy
+arrays, so that the sidecar files can be loaded by any module, no
+matter how it was imported. They are shared by all the callers, so they
+must not be modified.
+"""
+# Standard libraries
+import cPickle as pickle
+import os
+import threading
+
+# Compiled values of every file, with the key they were compiled with.
+_memory = {}
+_lock = threading.Lock()
+
+
+def load(filename, parse, version=1):
+    """Get the values compiled from a configuration file.
+
+    :param str filename: path to the configuration file.
+    :param parse: function that reads the configuration file, given its
+     path, and returns the dictionary of compiled values.
+    :param int version: version of the *parse* function. It has to be
+     increased when its output changes, to invalidate the caches.
+    :return: the compiled values.
+    :rtype: dict
+    :raises OSError: if the configuration file does not exist.
+    """
+    path = os.path.abspath(filename)
+    status = os.stat(path)
+    key = (parse.__name__, version, status.st_mtime, status.st_size)
+    with _lock:
+        cached = _memory.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        values = _read_sidecar(path, key)
+        if values is None:
+            values = parse(path)
+            _write_sidecar(path, key, values)
+        _memory[path] = (key, values)
+        return values
+
+
+def _read_sidecar(path, key):
+    """Get the values of the sidecar file, if it exists and is valid."""
+    try:
+        with open(path + '.cache', 'rb') as infile:
+            cached_key, values = pickle.load(infile)
+    except (IOError, EOFError, ValueError, TypeError, pickle.PickleError):
+        return None
+    if cached_key != key:
+        return None
+    return values
+
+
+def _write_sidecar(path, key, values):
+    """Write the sidecar file, if the folder is writable.
+
+    The file is written with a temporary name and then renamed, so that
+    other processes never read an incomplete file.
+    """
+    temporary = '{}.cache.{}'.format(path, os.getpid())
+    try:
+        with open(temporary, 'wb') as outfile:
+            pickle.dump((key, values), outfile, pickle.HIGHEST_PROTOCOL)
+        os.rename(temporary, path + '.cache')
+    except (IOError, OSError):
+        if os.path.exists(temporary):
+            os.remove(temporary)
@@ -0,0 +1,131 @@
+"""Encoding of the messages exchanged through the ZeroMQ buses.
+
+The poses of the UGVs, published by *multiplecamera*, their speed set
+points, published by *navigator*, and their goals are sent every cycle
+between several processes. Instead of JSON, they are encoded in a
+compact binary message of fixed layout: a version byte, a topic byte
+and the values of the topic fields, in little endian order.
+
+JSON is kept as a fallback, for the tools that do not use this module
+and for a mixed deployment during an upgrade. The receivers decode both
+formats: a binary message starts with the version byte, and a JSON one
+with an opening brace, so each message tells its own format. The
+publishers send binary messages, unless the environment variable
+*UVISPACE_MESSAGE_FORMAT* is set to 'json'. A binary message of an
+unknown version is rejected, so the publishers of a newer version have
+to be switched to JSON until all the receivers are upgraded.
+
+The messages are decoded as dictionaries with the same keys as the JSON
+ones. The fields missing when encoding are sent as 0, and a zero
+timestamp means that the sending time is unknown. Goals without
+orientation are sent with a NaN *theta*, and it is not decoded.
+"""
+# Standard libraries
+import json
+import math
+import os
+import struct
+
+# Version of the binary layouts. Increase it when a layout changes. It
+# must never be the first byte of a JSON object, '{'.
+VERSION = 1
+# Topics of the messages.
+POSE = 1
+SPEED = 2
+GOAL = 3
+
+_HEADER = struct.Struct('<BB')
+# Struct format and field names of every topic, after the header.
+_LAYOUTS = {
+    POSE: ('<dddI', ('x', 'y', 'theta', 'step')),
+    SPEED: ('<Idddhh', ('step', 'timestamp', 'linear', 'angular',
+                        'sp_left', 'sp_right')),
+    GOAL: ('<ddd', ('x', 'y', 'theta')),
+}
+_STRUCTS = {topic: (struct.Struct('<BB' + layout[1:]), fields)
+            for topic, (layout, fields) in _LAYOUTS.items()}
+
+
+def binary_default():
+    """Check if the publishers have to send binary messages.
+
+    :return: False if *UVISPACE_MESSAGE_FORMAT* is set to 'json'.
+    :rtype: bool
+    """
+    return os.environ.get('UVISPACE_MESSAGE_FORMAT', 'binary') != 'json'
+
+
+def encode(topic, message, binary=None):
+    """Encode a message of a topic.
+
+    :param int topic: *POSE*, *SPEED* or *GOAL*.
+    :param dict message: values of the message fields.
+    :param bool binary: if True, use the binary layout of the topic, and
+     if False, JSON. By default, it is given by *binary_default*.
+    :return: the encoded message.
+    :rtype: str
+    :raises struct.error: if a value does not fit in its field.
+    """
+    if binary is None:
+        binary = binary_default()
+    if not binary:
+        return json.dumps(message)
+    packer, fields = _STRUCTS[topic]
+    values = [message.get(field, 0) for field in fields]
+    if topic == GOAL and 'theta' not in message:
+        values[2] = float('nan')
+    return packer.pack(VERSION, topic, *values)
+
+
+def decode(payload, topic=None):
+    """Decode a binary or a JSON message.
+
+    :param str payload: the encoded message.
+    :param int topic: expected topic of a binary message, or None for
+     accepting any topic.
+    :return: values of the message fields.
+    :rtype: dict
+    :raises ValueError: if the version or the topic of a binary message
+     are unknown or unexpected, or if its length is wrong.
+    """
+    if payload[:1] == '{':
+        return json.loads(payload)
+    if len(payload) < _HEADER.size:
+        raise ValueError("Message of {} bytes".format(len(payload)))
+    version, received = _HEADER.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError("Unknown message version {}".format(version))
+    if received not in _STRUCTS or topic not in (None, received):
+        raise ValueError("Unexpected message topic {}".format(received))
+    unpacker, fields = _STRUCTS[received]
+    if len(payload) != unpacker.size:
+        raise ValueError("Wrong length {} of a message of topic {}".format(
+                len(payload), received))
+    message = dict(zip(fields, unpacker.unpack(payload)[2:]))
+    if received == GOAL and math.isnan(message['theta']):
+        del message['theta']
+    return message
+
+
+def send(socket, topic, message, flags=0, binary=None):
+    """Encode a message and send it through a ZeroMQ socket.
+
+    :param socket: *zmq.Socket* object.
+    :param int topic: *POSE*, *SPEED* or *GOAL*.
+    :param dict message: values of the message fields.
+    :param int flags: ZeroMQ send flags.
+    :param bool binary: format of the message, as in *encode*.
+    """
+    socket.send(encode(topic, message, binary), flags)
+
+
+def recv(socket, topic=None, flags=0):
+    """Receive a message from a ZeroMQ socket and decode it.
+
+    :param socket: *zmq.Socket* object.
+    :param int topic: expected topic, as in *decode*.
+    :param int flags: ZeroMQ receive flags.
+    :return: values of the message fields.
+    :rtype: dict
+    """
+    return decode(socket.recv(flags), topic)
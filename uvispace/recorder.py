@@ -0,0 +1,139 @@
+"""Growable arrays for recording values during long runs.
+
+A *Recorder* stores rows of a fixed number of columns in a preallocated
+buffer. When the buffer is full, its capacity is doubled, so appending a
+row takes amortized constant time, instead of copying all the previous
+rows as *np.vstack* does.
+
+The recorded rows are obtained as a view of the buffer, without copying
+them. The view is only valid until the next append that grows the
+buffer, so it must not be kept while recording.
+
+For multi-hour runs, the buffer can be backed by a file, mapped in
+memory. The file holds the raw rows, in the native byte order, and it
+can be loaded again with *load*.
+"""
+# Third party libraries
+import numpy as np
+
+
+class Recorder(object):
+    """Array of rows with amortized constant time appends.
+
+    :param int columns: number of values of each row.
+    :param dtype: data type of the values.
+    :param int capacity: initial number of rows allocated.
+    :param str filename: path of the file where the rows are mapped, or
+     None for keeping them only in memory. The file is overwritten.
+    """
+
+    def __init__(self, columns, dtype=np.float64, capacity=1024,
+                 filename=None):
+        """Recorder class constructor. Allocate the buffer."""
+        if capacity < 1:
+            raise ValueError("The capacity must be positive")
+        self.columns = columns
+        self.dtype = np.dtype(dtype)
+        self.filename = filename
+        self.closed = False
+        self._size = 0
+        self._buffer = self._allocate(capacity, 'w+')
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        """Number of rows that can be appended without growing."""
+        return len(self._buffer)
+
+    @property
+    def data(self):
+        """View of the recorded rows, valid until the buffer grows."""
+        return self._buffer[:self._size]
+
+    def append(self, row):
+        """Record a new row.
+
+        :param row: values of the row.
+        :type row: list, tuple or np.array(shape=columns)
+        """
+        if self._size == len(self._buffer):
+            self._grow(self._size + 1)
+        self._buffer[self._size] = row
+        self._size += 1
+
+    def extend(self, rows):
+        """Record several rows at once.
+
+        :param rows: values of the rows.
+        :type rows: np.array(shape=Mxcolumns)
+        """
+        rows = np.asarray(rows, dtype=self.dtype).reshape(-1, self.columns)
+        end = self._size + len(rows)
+        if end > len(self._buffer):
+            self._grow(end)
+        self._buffer[self._size:end] = rows
+        self._size = end
+
+    def clear(self):
+        """Forget the recorded rows, keeping the allocated buffer."""
+        self._size = 0
+
+    def close(self):
+        """Flush the mapped file and truncate it to the recorded rows.
+
+        Afterwards, the recorded rows are still available as a read-only
+        view of the file, but no more rows can be appended. Memory-only
+        recorders are not modified.
+        """
+        if self.filename is None:
+            return
+        self.closed = True
+        self._buffer.flush()
+        with open(self.filename, 'r+b') as recording:
+            recording.truncate(self._size * self.columns
+                               * self.dtype.itemsize)
+        # An empty file can not be mapped.
+        if self._size:
+            self._buffer = load(self.filename, self.columns, self.dtype)
+        else:
+            self._buffer = np.zeros((0, self.columns), dtype=self.dtype)
+
+    def _allocate(self, capacity, mode):
+        """Get a buffer of the given capacity, in memory or mapped."""
+        shape = (capacity, self.columns)
+        if self.filename is None:
+            return np.zeros(shape, dtype=self.dtype)
+        return np.memmap(self.filename, dtype=self.dtype, mode=mode,
+                         shape=shape)
+
+    def _grow(self, size):
+        """Double the capacity of the buffer until it holds *size* rows."""
+        # The buffer of a closed recorder is full, so every append ends
+        # here.
+        if self.closed:
+            raise ValueError("The recorder file is closed")
+        capacity = len(self._buffer)
+        while capacity < size:
+            capacity *= 2
+        if self.filename is None:
+            buffer = self._allocate(capacity, None)
+            buffer[:self._size] = self._buffer[:self._size]
+        else:
+            # The file is extended, and mapped again with the new size.
+            self._buffer.flush()
+            buffer = self._allocate(capacity, 'r+')
+        self._buffer = buffer
+
+
+def load(filename, columns, dtype=np.float64):
+    """Map the rows recorded in a file, without reading them.
+
+    :param str filename: path of the file written by a *Recorder*.
+    :param int columns: number of values of each row.
+    :param dtype: data type of the values.
+    :return: read-only view of the recorded rows.
+    :rtype: np.memmap(shape=Mxcolumns)
+    """
+    return np.memmap(filename, dtype=dtype, mode='r').reshape(-1, columns)
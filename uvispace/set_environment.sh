@@ -21,5 +21,7 @@ export PYTHONPATH=$PYTHONPATH:$parent_path
 export UVISPACE_BASE_PORT_POSITION=35000
 export UVISPACE_BASE_PORT_SPEED=35010
 export UVISPACE_BASE_PORT_GOAL=35020
+# Format of the messages sent by the publishers: 'binary' or 'json'.
+export UVISPACE_MESSAGE_FORMAT=binary
 
 echo "Exported the environment variables for the uvispace project."
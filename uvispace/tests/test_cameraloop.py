@@ -0,0 +1,123 @@
+import threading
+import unittest
+import numpy.testing as npt
+from uvispace.tests.test_client import FakeRegisterDevice
+from uvispace.uvisensor import cameraloop
+from uvispace.uvisensor.client import Client
+
+
+class SilentRegisterDevice(FakeRegisterDevice):
+    """Register device that does not answer its first request."""
+
+    def __init__(self, values):
+        FakeRegisterDevice.__init__(self, values)
+        self.silent = True
+
+    def run(self):
+        connection, _ = self.server.accept()
+        connection.sendall('Welcome\n')
+        data = ''
+        while True:
+            package = connection.recv(4096)
+            if not package:
+                break
+            data += package
+            while '\n' in data:
+                line, data = data.split('\n', 1)
+                self.requests.append(line)
+                if self.silent:
+                    self.silent = False
+                    continue
+                value = self.values[line.split(',')[1]]
+                connection.sendall('{}\n'.format(value))
+        connection.close()
+        self.server.close()
+
+
+class PollingLoopTestCases(unittest.TestCase):
+    """Tests the concurrent polling of several devices."""
+
+    def connect(self, device):
+        device.start()
+        client = Client(timeout=0.5)
+        client.open_connection('127.0.0.1', device.port)
+        return client
+
+    def test_polling(self):
+        """PollingLoop run method: Checks the replies of 2 devices."""
+        end_event = threading.Event()
+        replies = [[], []]
+
+        def callback(index):
+            def store(locations):
+                replies[index].append(locations)
+                if min(len(reply) for reply in replies) >= 3:
+                    end_event.set()
+            return store
+
+        pollers = []
+        for index in range(2):
+            device = FakeRegisterDevice(
+                    {'al': "{{'1': [[{0}, 1], [2, 3]]}}".format(index)})
+            pollers.append(cameraloop.LocationPoller(
+                    self.connect(device), callback(index), period=0.01))
+        cameraloop.PollingLoop(pollers).run(end_event)
+        for index, poller in enumerate(pollers):
+            self.assertGreaterEqual(poller.stats['replies'], 3)
+            self.assertEqual(poller.stats['timeouts'], 0)
+            npt.assert_equal(replies[index][-1]['1'], [[index, 1], [2, 3]])
+            poller.client.close()
+
+    def test_lost_reply(self):
+        """LocationPoller on_timer method: Checks lost replies timeout."""
+        end_event = threading.Event()
+        device = SilentRegisterDevice({'al': "{}"})
+        poller = cameraloop.LocationPoller(
+                self.connect(device), lambda locations: end_event.set(),
+                period=0.01, reply_timeout=0.05)
+        cameraloop.PollingLoop([poller]).run(end_event)
+        self.assertEqual(poller.stats['timeouts'], 1)
+        self.assertEqual(poller.stats['replies'], 1)
+        self.assertEqual(device.requests, ['r,al', 'r,al'])
+        poller.client.close()
+
+    def test_capture_time_after_timeout(self):
+        """LocationPoller handle_read method: Checks unmatched replies."""
+        end_event = threading.Event()
+        device = SilentRegisterDevice({'al': "{}"})
+        captures = []
+
+        def store(locations):
+            captures.append(poller.capture_time)
+            if len(captures) == 3:
+                end_event.set()
+
+        poller = cameraloop.LocationPoller(self.connect(device), store,
+                                           period=0.01, reply_timeout=0.05)
+        cameraloop.PollingLoop([poller]).run(end_event)
+        # The first reply may belong to any of the 2 requests sent.
+        self.assertIsNone(captures[0])
+        self.assertLess(captures[1], captures[2])
+        poller.client.close()
+
+    def test_queued_writes(self):
+        """LocationPoller queue_write method: Checks ACKs are skipped."""
+        end_event = threading.Event()
+        device = FakeRegisterDevice({'al': "{'1': [[1, 2]]}"})
+        replies = []
+
+        def store(locations):
+            if not replies:
+                poller.queue_write('FREE_TRACKER', 1)
+            replies.append(locations)
+            if len(replies) == 3:
+                end_event.set()
+
+        poller = cameraloop.LocationPoller(self.connect(device), store,
+                                           period=0.01)
+        cameraloop.PollingLoop([poller]).run(end_event)
+        self.assertEqual(device.requests[:3], ['r,al', 'w,ft,1', 'r,al'])
+        self.assertEqual(poller.stats['writes'], 1)
+        npt.assert_equal(replies[-1]['1'], [[1, 2]])
+        self.assertIsNotNone(poller.capture_time)
+        poller.client.close()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace import configcache
+from uvispace.uvisensor import cameramodel
+
+CONF_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uvisensor',
+                           'resources', 'config')
+
+
+class CameraModelTestCases(unittest.TestCase):
+    """Tests the compiled camera models and their cache."""
+
+    def setUp(self):
+        """Copy a configuration file to a temporary folder."""
+        self.folder = tempfile.mkdtemp()
+        self.conf_file = os.path.join(self.folder, 'camera.cfg')
+        shutil.copy(os.path.join(CONF_FOLDER, 'video_sensor2.cfg'),
+                    self.conf_file)
+        self.calls = 0
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        shutil.rmtree(self.folder)
+
+    def parse_conffile(self, filename):
+        """Count the calls to the parser."""
+        self.calls += 1
+        return cameramodel.parse_conffile(filename)
+
+    def test_model(self):
+        """load_camera_model function: Checks the compiled values."""
+        model = cameramodel.load_camera_model(self.conf_file)
+        self.assertEqual((model.ip, model.port), ('172.19.5.214', 5005))
+        self.assertEqual(model.shape, (486, 648))
+        self.assertEqual(model.offsets, [486, 648])
+        self.assertEqual(model.params['skip'], model.params['row_mode'])
+        npt.assert_allclose(np.dot(model.H, model.inverse_H), np.eye(3),
+                            atol=1e-9)
+        self.assertEqual(model.limits.shape, (4, 2))
+        with self.assertRaises(ValueError):
+            model.H[0, 0] = 1
+
+    def test_cache(self):
+        """configcache load function: Checks the cache invalidation."""
+        first = configcache.load(self.conf_file, self.parse_conffile)
+        self.assertTrue(os.path.exists(self.conf_file + '.cache'))
+        self.assertIs(configcache.load(self.conf_file, self.parse_conffile),
+                      first)
+        # The sidecar file is used when the memory cache is not valid.
+        del configcache._memory[os.path.abspath(self.conf_file)]
+        second = configcache.load(self.conf_file, self.parse_conffile)
+        npt.assert_equal(second['H'], first['H'])
+        self.assertEqual(self.calls, 1)
+        # A modified file is parsed again.
+        with open(self.conf_file, 'a') as outfile:
+            outfile.write('\n')
+        configcache.load(self.conf_file, self.parse_conffile)
+        self.assertEqual(self.calls, 2)
+
+    def test_invalid(self):
+        """parse_conffile function: Checks the validation errors."""
+        with open(self.conf_file) as infile:
+            content = infile.read()
+        with open(self.conf_file, 'w') as outfile:
+            outfile.write(content.replace('quadrant = 2', 'quadrant = 5'))
+        with self.assertRaises(ValueError):
+            cameramodel.parse_conffile(self.conf_file)
+        with open(self.conf_file, 'w') as outfile:
+            outfile.write(content.replace('[Misc]', '[Other]'))
+        with self.assertRaises(ValueError):
+            cameramodel.parse_conffile(self.conf_file)
@@ -0,0 +1,233 @@
+import ast
+import socket
+import struct
+import threading
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace.uvisensor import client as client_module
+from uvispace.uvisensor.client import Client
+
+
+class FakeDevice(threading.Thread):
+    """Local TCP server that sends a welcome message and a payload."""
+
+    def __init__(self, payload, chunk=1000):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.payload = payload
+        self.chunk = chunk
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+
+    def run(self):
+        connection, _ = self.server.accept()
+        connection.sendall('Welcome\n')
+        # Wait for the client to empty the welcome message.
+        connection.recv(16)
+        for index in range(0, len(self.payload), self.chunk):
+            connection.sendall(self.payload[index:index+self.chunk])
+        connection.close()
+        self.server.close()
+
+
+class FakeRegisterDevice(threading.Thread):
+    """Local TCP server that answers register requests line by line."""
+
+    def __init__(self, values, write_acks=True, lost_acks=()):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.values = values
+        self.write_acks = write_acks
+        # Registers whose writes are never acknowledged.
+        self.lost_acks = lost_acks
+        self.requests = []
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+
+    def run(self):
+        connection, _ = self.server.accept()
+        connection.sendall('Welcome\n')
+        data = ''
+        while True:
+            package = connection.recv(4096)
+            if not package:
+                break
+            data += package
+            while '\n' in data:
+                line, data = data.split('\n', 1)
+                self.requests.append(line)
+                fields = line.split(',')
+                if fields[0] == 'r':
+                    connection.sendall('{}\n'.format(self.values[fields[1]]))
+                elif self.write_acks and fields[1] not in self.lost_acks:
+                    connection.sendall('ACK {}\n'.format(fields[1]))
+        connection.close()
+        self.server.close()
+
+
+class ReadDataTestCases(unittest.TestCase):
+    """Tests the data reception methods of the Client class."""
+
+    def connect(self, payload):
+        device = FakeDevice(payload)
+        device.start()
+        client = Client(timeout=1.0)
+        client.open_connection('127.0.0.1', device.port)
+        client.send('G\n')
+        return client
+
+    def test_read_array(self):
+        """Client read_array method: Checks data, shape and buffer reuse."""
+        frame = np.arange(480 * 640, dtype=np.uint32).astype(np.uint8)
+        client = self.connect(frame.tostring() * 2)
+        image = client.read_array((480, 640))
+        npt.assert_equal(image.ravel(), frame)
+        self.assertEqual(client.read_stats['bytes'], frame.size)
+        self.assertGreaterEqual(client.read_stats['recv_calls'], 1)
+        second = client.read_array((480, 640))
+        self.assertIs(second.base, image.base)
+        client.close()
+
+    def test_read_array_incomplete(self):
+        """Client read_array method: Checks incomplete data is zero padded."""
+        client = self.connect('\x07' * 100)
+        image = client.read_array((20, 10))
+        npt.assert_equal(image[:10], 7)
+        npt.assert_equal(image[10:], 0)
+        self.assertEqual(client.read_stats['bytes'], 100)
+        client.close()
+
+    def test_read_data(self):
+        """Client read_data method: Checks the returned string."""
+        client = self.connect('abcdef' * 1000)
+        self.assertEqual(client.read_data(6000), 'abcdef' * 1000)
+        client.close()
+
+    def test_read_data_after_line(self):
+        """Client read_data method: Checks the data buffered is not lost."""
+        client = self.connect('Image captured.\n' + 'abcdef' * 1000)
+        self.assertEqual(client.write_command('GET_NEW_FRAME', True),
+                         'Image captured.\n')
+        self.assertEqual(client.read_data(6000), 'abcdef' * 1000)
+        client.close()
+
+
+class BatchTestCases(unittest.TestCase):
+    """Tests the batches of register requests of the Client class."""
+
+    def connect(self, write_acks=True, lost_acks=()):
+        self.device = FakeRegisterDevice(
+                {'al': "{'1': [[10, 20], [30, 40]]}", 'is': '(640, 480)'},
+                write_acks, lost_acks)
+        self.device.start()
+        client = Client(timeout=0.5, write_acks=write_acks)
+        client.open_connection('127.0.0.1', self.device.port)
+        return client
+
+    def test_flush_queue(self):
+        """Client flush_queue method: Checks responses matching."""
+        client = self.connect()
+        self.assertEqual(client.queue_write('RED_THRESHOLD', '1,2'), 0)
+        self.assertEqual(client.queue_read('ACTUAL_LOCATION'), 1)
+        client.queue_write('IMAGE_EXPOSURE', '1111')
+        client.queue_read('IMAGE_SHAPE')
+        results = client.flush_queue()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0::2], ['ACK rt\n', 'ACK ie\n'])
+        npt.assert_equal(results[1]['1'], [[10, 20], [30, 40]])
+        self.assertEqual(results[3], (640, 480))
+        self.assertEqual(self.device.requests, ['w,rt,1,2', 'r,al',
+                                                'w,ie,1111', 'r,is'])
+        self.assertEqual(client.flush_queue(), [])
+        client.close()
+
+    def test_flush_queue_no_acks(self):
+        """Client flush_queue method: Checks writes without ACK messages."""
+        client = self.connect(write_acks=False)
+        client.queue_write('RED_THRESHOLD', '1,2')
+        client.queue_read('IMAGE_SHAPE')
+        client.queue_write('IMAGE_EXPOSURE', '1111')
+        self.assertEqual(client.flush_queue(),
+                         ['EMPTY BUFFER', (640, 480), 'EMPTY BUFFER'])
+        client.close()
+
+    def test_flush_queue_lost_ack(self):
+        """Client flush_queue method: Checks a lost ACK shifts no reply."""
+        client = self.connect(lost_acks=('rt',))
+        client.queue_write('RED_THRESHOLD', '1,2')
+        client.queue_read('ACTUAL_LOCATION')
+        client.queue_write('IMAGE_EXPOSURE', '1111')
+        client.queue_read('IMAGE_SHAPE')
+        results = client.flush_queue()
+        npt.assert_equal(results[1]['1'], [[10, 20], [30, 40]])
+        self.assertEqual(results[3], (640, 480))
+        self.assertEqual(sorted(results[0::2]), ['ACK ie\n', 'EMPTY BUFFER'])
+        client.close()
+
+    def test_late_acks(self):
+        """Client read_register method: Checks late ACKs are skipped."""
+        client = self.connect()
+        client.write_acks = False
+        client.queue_write('RED_THRESHOLD', '1,2')
+        client.queue_write('IMAGE_EXPOSURE', '1111')
+        self.assertEqual(client.flush_queue(), ['EMPTY BUFFER'] * 2)
+        # The ACKs of the writes arrive before the reply of the read.
+        self.assertEqual(client.read_register('IMAGE_SHAPE'), (640, 480))
+        self.assertEqual(client.write_register('IMAGE_EXPOSURE', '1'),
+                         'ACK ie\n')
+        client.close()
+
+
+class ParseReplyTestCases(unittest.TestCase):
+    """Tests the conversion of the register replies."""
+
+    def test_parse_reply(self):
+        """parse_reply function: Checks the known formats and fallback."""
+        parse = client_module.parse_reply
+        self.assertEqual(parse('640\n'), 640)
+        self.assertEqual(parse('(640, 480)\n'), (640, 480))
+        self.assertEqual(parse('(-3,)'), (-3,))
+        reply = "{'1': [[10, 20], [30, -40]], '2': [[5, 6]]}\n"
+        points = parse(reply)
+        self.assertEqual(sorted(points.keys()), ['1', '2'])
+        for key, value in ast.literal_eval(reply).items():
+            npt.assert_equal(points[key], value)
+        self.assertEqual(points['2'].shape, (1, 2))
+        self.assertEqual(parse('{}'), {})
+        # Lost trackers have no points.
+        self.assertEqual(parse("{'1': [], '2': [[5, 6]]}")['1'].shape, (0, 2))
+        # Unknown formats are evaluated, with the same types.
+        self.assertEqual(parse("(1.5, 'a')"), (1.5, 'a'))
+        for reply in ('{1: [[10, 20], [30, -40]], 2: []}',
+                      '{"1": [[10, 20], [30, -40]], "2": []}'):
+            points = parse(reply)
+            self.assertEqual(sorted(points.keys()), ['1', '2'])
+            npt.assert_equal(points['1'], [[10, 20], [30, -40]])
+            self.assertEqual(points['2'].shape, (0, 2))
+
+    def test_parse_binary_reply(self):
+        """parse_binary_reply function: Checks the 3 kinds of values."""
+        parse = client_module.parse_binary_reply
+        self.assertEqual(parse('i', struct.pack('<i', 640)), 640)
+        self.assertEqual(parse('t', struct.pack('<2i', 640, 480)), (640, 480))
+        payload = struct.pack('<8i', 1, 2, 10, 20, 30, -40, 2, 0)
+        points = parse('d', payload)
+        npt.assert_equal(points['1'], [[10, 20], [30, -40]])
+        self.assertEqual(points['2'].shape, (0, 2))
+        self.assertRaises(ValueError, parse, 'x', '')
+
+    def test_read_register_binary(self):
+        """Client read_register method: Checks the binary replies."""
+        payload = struct.pack('<4i', 1, 1, 7, 8)
+        device = FakeDevice(struct.pack('<cI', 'd', len(payload)) + payload)
+        device.start()
+        client = Client(timeout=0.5, binary_replies=True)
+        client.open_connection('127.0.0.1', device.port)
+        points = client.read_register('ACTUAL_LOCATION')
+        npt.assert_equal(points['1'], [[7, 8]])
+        client.close()
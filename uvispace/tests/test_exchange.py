@@ -0,0 +1,130 @@
+import multiprocessing
+import time
+import unittest
+import numpy as np
+import numpy.testing as npt
+import zmq
+from uvispace.uvisensor import exchange
+from uvispace.uvisensor.geometry import Triangle
+
+
+class SnapshotTestCases(unittest.TestCase):
+    """Tests the snapshots exchange between a writer and a reader."""
+
+    def test_publish(self):
+        """SnapshotBuffer publish method: Checks the sequence numbers."""
+        buffer = exchange.SnapshotBuffer({})
+        self.assertEqual(buffer.latest().sequence, 0)
+        data = {'1': None}
+        snapshot = buffer.publish(data)
+        self.assertEqual(snapshot.sequence, 1)
+        self.assertIs(buffer.latest(), snapshot)
+        # The data is not copied.
+        self.assertIs(buffer.latest().data, data)
+        # The capture time is kept, instead of the publishing time.
+        self.assertEqual(buffer.publish(data, 12.5).timestamp, 12.5)
+
+    def test_reader(self):
+        """SnapshotReader read method: Checks stale and skipped snapshots."""
+        buffer = exchange.SnapshotBuffer('initial')
+        reader = exchange.SnapshotReader(buffer)
+        snapshot, skipped = reader.read()
+        self.assertEqual((snapshot.data, skipped), ('initial', -1))
+        buffer.publish('first')
+        self.assertEqual(reader.read()[1], 0)
+        for data in ('second', 'third', 'fourth'):
+            buffer.publish(data)
+        snapshot, skipped = reader.read()
+        self.assertEqual((snapshot.data, skipped), ('fourth', 2))
+        self.assertEqual(reader.read()[1], -1)
+        self.assertEqual(reader.stats, {'new': 2, 'stale': 2, 'skipped': 2})
+
+    def test_read_new(self):
+        """SnapshotReader read_new method: Checks the recent snapshots."""
+        buffer = exchange.SnapshotBuffer('initial', size=2)
+        reader = exchange.SnapshotReader(buffer)
+        self.assertEqual(reader.read_new(), ([], -1))
+        first = buffer.publish('first', 1.0)
+        second = buffer.publish('second', 2.0)
+        self.assertEqual(reader.read_new(), ([first, second], 0))
+        for data in ('third', 'fourth', 'fifth'):
+            buffer.publish(data)
+        snapshots, skipped = reader.read_new()
+        self.assertEqual([snapshot.data for snapshot in snapshots],
+                         ['fourth', 'fifth'])
+        self.assertEqual(skipped, 1)
+        self.assertEqual(reader.stats, {'new': 4, 'stale': 1, 'skipped': 1})
+
+
+class SocketSnapshotTestCases(unittest.TestCase):
+    """Tests the snapshots exchange through ZeroMQ sockets."""
+
+    def setUp(self):
+        """Connect a PUSH socket to a PULL one."""
+        self.context = zmq.Context()
+        self.receiver_socket = self.context.socket(zmq.PULL)
+        self.receiver_socket.bind('inproc://snapshots')
+        self.sender_socket = self.context.socket(zmq.PUSH)
+        self.sender_socket.connect('inproc://snapshots')
+
+    def tearDown(self):
+        """Close the sockets."""
+        self.sender_socket.close(linger=0)
+        self.receiver_socket.close(linger=0)
+        self.context.term()
+
+    def test_encode_triangles(self):
+        """encode_triangles function: Checks the records round trip."""
+        vertices = np.array([[10.5, -20.], [30., 40.], [-50., 60.25]])
+        triangles = {'3': Triangle(vertices, isglobal=True, cartesian=True),
+                     '12': None}
+        payload = exchange.encode_triangles(triangles)
+        self.assertEqual(len(payload), 2 * exchange.MEASUREMENT_DTYPE.itemsize)
+        decoded = exchange.decode_triangles(payload)
+        self.assertEqual(sorted(decoded), ['12', '3'])
+        self.assertIsNone(decoded['12'])
+        npt.assert_allclose(decoded['3'].vertices, vertices)
+        self.assertTrue(decoded['3'].isglobal)
+        self.assertEqual(exchange.decode_triangles(
+                exchange.encode_triangles({})), {})
+
+    def test_socket_snapshots(self):
+        """SocketReceiver latest method: Checks the latest snapshot."""
+        sender = exchange.SocketSender(self.sender_socket)
+        receiver = exchange.SocketReceiver(self.receiver_socket,
+                                           data='initial')
+        reader = exchange.SnapshotReader(receiver)
+        self.assertEqual(reader.read()[0].data, 'initial')
+        for data in ('first', 'second', {'third': [3]}):
+            sent = sender.publish(data)
+        time.sleep(0.05)
+        snapshot, skipped = reader.read()
+        self.assertEqual(snapshot, sent)
+        self.assertEqual(skipped, 2)
+        self.assertEqual(reader.read()[1], -1)
+
+    def test_socket_read_new(self):
+        """SocketReceiver recent method: Checks every message is decoded."""
+        sender = exchange.SocketSender(self.sender_socket)
+        receiver = exchange.SocketReceiver(self.receiver_socket, size=2)
+        reader = exchange.SnapshotReader(receiver)
+        sent = [sender.publish(data, timestamp) for data, timestamp in
+                (('first', 1.0), ('second', 2.0), ('third', 3.0))]
+        time.sleep(0.05)
+        self.assertEqual(reader.read_new(), (sent[1:], 1))
+        self.assertEqual(reader.read_new(), ([], -1))
+
+
+class IdAllocatorTestCases(unittest.TestCase):
+    """Tests the ids allocated to several workers."""
+
+    def test_allocate(self):
+        """IdAllocator allocate method: Checks ids shared by processes."""
+        tracker_ids = exchange.IdAllocator()
+        self.assertEqual(tracker_ids.allocate(2), [1, 2])
+        self.assertEqual(tracker_ids.allocate(0), [])
+        worker = multiprocessing.Process(target=tracker_ids.allocate,
+                                         args=(3,))
+        worker.start()
+        worker.join()
+        self.assertEqual(tracker_ids.allocate(1), [6])
@@ -0,0 +1,96 @@
+import copy
+import pickle
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace.uvisensor.geometry import (BorderRegion, Segment, Triangle,
+                                          TriangleBatch)
+
+
+class TriangleTestCases(unittest.TestCase):
+    """Tests the array-backed triangles and batches."""
+
+    def setUp(self):
+        """Create an isosceles triangle pointing to the right."""
+        self.vertices = np.array([[100, 50], [110, 80], [120, 50]])
+
+    def test_pose(self):
+        """Triangle get_pose method: Checks the lazy pose."""
+        triangle = Triangle(self.vertices)
+        npt.assert_allclose(triangle.midpoint, [110, 50])
+        self.assertEqual(triangle.base_index, 1)
+        npt.assert_allclose(triangle.get_pose(), [110, 50, 0], atol=1e-6)
+        # Changing the vertices invalidates the pose.
+        triangle.vertices = self.vertices[::-1] + 10
+        npt.assert_allclose(triangle.midpoint, [120, 60])
+
+    def test_conversions(self):
+        """Triangle local2global method: Checks the record conversion."""
+        triangle = Triangle(self.vertices)
+        angle = triangle.get_pose()[2]
+        triangle.local2global([480, 640], K=4)
+        self.assertTrue(triangle.isglobal and triangle.cartesian)
+        npt.assert_allclose(triangle.midpoint, [-2360, 1480])
+        npt.assert_allclose(triangle.get_pose()[2], angle)
+        npt.assert_allclose(triangle.barycenter,
+                            triangle.vertices.mean(axis=0))
+        triangle.global2local([480, 640])
+        npt.assert_allclose(triangle.vertices, self.vertices)
+
+    def test_batch(self):
+        """TriangleBatch: Checks it is equivalent to single triangles."""
+        vertices = np.random.RandomState(0).uniform(0, 400, (10, 3, 2))
+        batch = TriangleBatch(vertices)
+        batch.local2global([480, 640], K=4)
+        windows = batch.get_windows(-1000, 1000)
+        for index, triangle in enumerate(batch):
+            single = Triangle(vertices[index])
+            single.local2global([480, 640], K=4)
+            npt.assert_allclose(triangle.get_pose(), single.get_pose(),
+                                rtol=1e-5)
+            npt.assert_allclose(single.get_window(-1000, 1000),
+                                windows[index], rtol=1e-5)
+        self.assertEqual(len(TriangleBatch(np.empty((0, 3, 2)))), 0)
+
+    def test_copy(self):
+        """Triangle copy: Checks copies do not share the record."""
+        triangle = TriangleBatch([self.vertices], isglobal=True)[0]
+        for duplicate in (copy.copy(triangle),
+                          pickle.loads(pickle.dumps(triangle, 2))):
+            self.assertTrue(duplicate.isglobal)
+            duplicate.vertices = self.vertices * 2
+            npt.assert_allclose(triangle.vertices, self.vertices)
+
+
+class BorderRegionTestCases(unittest.TestCase):
+    """Tests the vectorized evaluation of the borders regions."""
+
+    def setUp(self):
+        """Create the regions of 2 irregular quadrants."""
+        self.limits = np.array([[[0, 0], [1000, 20], [980, 900], [10, 1000]],
+                                [[0, 0], [-1000, 0], [-1000, 900],
+                                 [0, 1000]]])
+        self.regions = BorderRegion(self.limits)
+
+    def test_distances(self):
+        """BorderRegion distances method: Checks them with Segment."""
+        points = np.random.RandomState(0).uniform(-1200, 1200, (50, 2))
+        distances = self.regions.distances(points)
+        self.assertEqual(distances.shape, (50, 2))
+        for quadrant, limits in enumerate(self.limits):
+            segments = [Segment(limits[index], limits[index - 1])
+                        for index in range(4)]
+            for point, distance in zip(points, distances[:, quadrant]):
+                self.assertAlmostEqual(
+                        min(seg.distance2point(point) for seg in segments),
+                        distance)
+
+    def test_in_borders(self):
+        """BorderRegion in_borders method: Checks the matrix."""
+        vertices = np.array([[[500, 500], [510, 520], [520, 500]],
+                             [[-20, 500], [0, 520], [20, 500]],
+                             [[-500, 900], [-490, 920], [-480, 900]]])
+        npt.assert_array_equal(self.regions.in_borders(vertices),
+                               [[False, False], [True, True], [False, True]])
+        self.assertTrue(Triangle(vertices[2]).in_borders(self.limits[1]))
+        self.assertEqual(self.regions.in_borders([]).shape, (0, 2))
@@ -0,0 +1,238 @@
+import unittest
+import cv2
+import numpy as np
+import numpy.testing as npt
+import skimage.measure
+from uvispace.uvisensor import imgprocessing
+
+
+class BinarizerTestCases(unittest.TestCase):
+    """Tests the thresholds decoding and the Binarizer engine."""
+
+    def setUp(self):
+        """Draw a bright triangle with a dark hole on a dark image."""
+        self.image = np.full((120, 160), 20, np.uint8)
+        vertices = np.array([[40, 100], [120, 100], [80, 20]], np.int32)
+        cv2.fillConvexPoly(self.image, vertices, 200)
+        self.image[70:75, 78:83] = 20
+        # Red component of 700 and 900, i.e. 175 and 225 in 8 bits.
+        self.thresholds = (700 << 20, 900 << 20)
+
+    def test_decode_thresholds(self):
+        """decode_thresholds function: Checks the components slicing."""
+        register = (1 << 20 | 2 << 10 | 3, 1000 << 20 | 800 << 10 | 600)
+        self.assertEqual(imgprocessing.decode_thresholds(register), (0, 250))
+        self.assertEqual(
+                imgprocessing.decode_thresholds(register, 'green'), (0, 200))
+        self.assertEqual(
+                imgprocessing.decode_thresholds(register, 'blue'), (0, 150))
+        # Same result as slicing the binary representation of the register.
+        register = (551040525, 784051947)
+        expected = (int(bin(register[0])[-30:-20], 2) // 4,
+                    int(bin(register[1])[-30:-20], 2) // 4)
+        self.assertEqual(imgprocessing.decode_thresholds(register), expected)
+
+    def test_binarize_fills_holes(self):
+        """Binarizer binarize method: Checks output and hole filling."""
+        binarizer = imgprocessing.Binarizer()
+        binarizer.set_thresholds(self.thresholds)
+        output = binarizer.binarize(self.image)
+        self.assertEqual(output.dtype, np.uint8)
+        self.assertEqual(output.shape, self.image.shape)
+        npt.assert_equal(output[70:75, 78:83], 255)
+        npt.assert_equal(output[:10, :], 0)
+        self.assertEqual(output[95, 80], 255)
+
+    def test_binarize_reuses_buffers(self):
+        """Binarizer binarize method: Checks buffers reuse and resizing."""
+        binarizer = imgprocessing.Binarizer(self.image.shape)
+        binarizer.set_thresholds(self.thresholds)
+        first = binarizer.binarize(self.image)
+        second = binarizer.binarize(np.zeros_like(self.image))
+        self.assertIs(first, second)
+        npt.assert_equal(second, 0)
+        # A different frame shape reallocates the buffers.
+        third = binarizer.binarize(np.zeros((60, 80), np.uint8))
+        self.assertEqual(third.shape, (60, 80))
+
+    def test_image_binarize(self):
+        """Image binarize method: Checks the stored binarized image."""
+        image = imgprocessing.Image(self.image)
+        output = image.binarize(self.thresholds)
+        self.assertIs(image._binarized, output)
+        self.assertEqual(output[50, 80], 255)
+
+
+class RegionsOfInterestTestCases(unittest.TestCase):
+    """Tests the shapes detection restricted to regions of interest."""
+
+    def setUp(self):
+        """Draw 2 triangles on a binary image."""
+        self.image = imgprocessing.Image(np.zeros((240, 320), np.uint8))
+        self.image._binarized = np.zeros((240, 320), np.uint8)
+        for col in (60, 220):
+            vertices = np.array([[col - 30, 180], [col + 30, 180],
+                                 [col, 60]], np.int32)
+            cv2.fillConvexPoly(self.image._binarized, vertices, 255)
+
+    def test_set_rois(self):
+        """Image set_rois method: Checks clipping and overlaps merging."""
+        rois = self.image.set_rois([[[-10.5, 20.2], [30.5, 40.7]],
+                                    [[25, 35], [50, 60]],
+                                    [[200, 300], [250, 330]]])
+        self.assertEqual(len(rois), 2)
+        npt.assert_equal(rois[0], [[0, 20], [50, 60]])
+        npt.assert_equal(rois[1], [[200, 300], [239, 319]])
+
+    def test_get_shapes_inside_rois(self):
+        """Image get_shapes method: Checks shapes outside ROIs are ignored."""
+        self.image.set_rois([[[40, 20], [200, 100]]])
+        triangles = self.image.get_shapes()
+        self.assertEqual(len(triangles), 1)
+        self.assertLess(triangles[0].vertices[:, 1].max(), 100)
+
+    def test_get_shapes_lost_ugv(self):
+        """Image get_shapes method: Checks full scan when an UGV is lost."""
+        self.image.set_rois([[[40, 20], [200, 100]], [[0, 120], [30, 160]]])
+        triangles = self.image.get_shapes()
+        self.assertEqual(len(triangles), 2)
+
+    def test_get_shapes_full_frame(self):
+        """Image get_shapes method: Checks a new UGV outside the ROIs."""
+        self.image.set_rois([[[40, 20], [200, 100]]])
+        self.assertEqual(len(self.image.get_shapes()), 1)
+        self.assertEqual(len(self.image.get_shapes(full_frame=True)), 2)
+
+    def test_get_shapes_merged_rois(self):
+        """Image get_shapes method: Checks a loss inside merged ROIs."""
+        # 2 UGVs tracked around the first triangle, one of them lost.
+        rois = self.image.set_rois([[[40, 20], [200, 100]],
+                                    [[50, 30], [190, 90]]])
+        self.assertEqual((len(rois), self.image.tracked), (1, 2))
+        self.assertEqual(len(self.image.get_shapes()), 2)
+
+    def test_get_shapes_partial_shapes(self):
+        """Image get_shapes method: Checks shapes cut by ROIs are ignored."""
+        # The region cuts the second triangle and contains the first one.
+        self.image.set_rois([[[40, 20], [200, 200]]])
+        triangles = self.image.get_shapes()
+        self.assertEqual(len(triangles), 1)
+        self.assertLess(triangles[0].vertices[:, 1].max(), 100)
+
+
+class DistortionModelTestCases(unittest.TestCase):
+    """Tests the barrel distortion correction of contours and images."""
+
+    def test_model_cache(self):
+        """get_distortion_model function: Checks models are reused."""
+        model = imgprocessing.get_distortion_model(0.035, 0.035, (48, 64))
+        self.assertIs(
+                imgprocessing.get_distortion_model(0.035, 0.035, (48, 64, 3)),
+                model)
+        self.assertIsNot(
+                imgprocessing.get_distortion_model(0.03, 0.035, (48, 64)),
+                model)
+
+    def test_correct_points(self):
+        """DistortionModel correct_points method: Checks the equations."""
+        model = imgprocessing.DistortionModel(0.02, 0.04, (200, 300))
+        points = np.array([[100., 150.], [0., 0.], [150., 250.]])
+        # r = (50**2 + 100**2) / ((100**2 + 150**2) * 2) = 0.19231
+        expected = [[100., 150.], [-100*(1+0.04*0.5) + 100, -150*(1+0.02*0.5)
+                                   + 150],
+                    [50*(1+0.04*0.19231) + 100, 100*(1+0.02*0.19231) + 150]]
+        npt.assert_allclose(model.correct_points(points), expected, atol=1e-3)
+
+    def test_correct_contours(self):
+        """DistortionModel correct_contours method: Checks batched output."""
+        model = imgprocessing.DistortionModel(0.035, 0.035, (120, 160))
+        contours = [np.array([[1, 2], [3, 4], [5, 6]]),
+                    np.array([[100., 150.]]),
+                    np.array([[60., 80.], [0., 0.]])]
+        corrected = model.correct_contours(contours)
+        self.assertEqual(len(corrected), 3)
+        for cnt, result in zip(contours, corrected):
+            npt.assert_allclose(result, model.correct_points(cnt))
+        # The outputs are views of a single buffer.
+        self.assertIs(corrected[0].base, corrected[2].base)
+        self.assertEqual(model.correct_contours([]), [])
+
+    def test_maps_consistency(self):
+        """DistortionModel get_maps method: Checks inverse of the points."""
+        model = imgprocessing.DistortionModel(0.035, 0.035, (120, 160))
+        map1, map2 = model.get_maps()
+        self.assertIs(model.get_maps()[0], map1)
+        map_x, map_y = cv2.convertMaps(map1, map2, cv2.CV_32FC1)
+        distorted = np.array([[5., 7.], [60., 80.], [110., 150.]])
+        undistorted = np.round(model.correct_points(distorted)).astype(int)
+        for point, (row, col) in zip(distorted, undistorted):
+            # The map at the undistorted pixel points to the distorted one.
+            source = [map_y[row, col], map_x[row, col]]
+            npt.assert_allclose(source, point, atol=1)
+
+    def test_correct_image(self):
+        """Image correct_distortion method: Checks the whole image mode."""
+        frame = np.zeros((120, 160), np.uint8)
+        frame[10:14, 10:14] = 255
+        image = imgprocessing.Image(frame)
+        image._binarized = frame.copy()
+        image.correct_distortion(only_contours=False)
+        model = imgprocessing.get_distortion_model(0.035, 0.035, (120, 160))
+        row, col = np.round(model.correct_points(
+                np.array([[11.5, 11.5]]))[0]).astype(int)
+        self.assertGreater(image.image[row, col], 128)
+        self.assertEqual(image._binarized[row, col], 255)
+        npt.assert_equal(np.unique(image._binarized), [0, 255])
+
+
+class ClassifyTrianglesTestCases(unittest.TestCase):
+    """Tests the batch classification of the contours."""
+
+    def setUp(self):
+        """Get the contours of a triangle, a circle, a speck and a square."""
+        binary = np.zeros((200, 300), np.uint8)
+        vertices = np.array([[20, 150], [80, 150], [50, 30]], np.int32)
+        cv2.fillConvexPoly(binary, vertices, 255)
+        cv2.circle(binary, (150, 60), 30, 255, -1)
+        binary[180:182, 10:12] = 255
+        binary[100:160, 200:260] = 255
+        self.image = imgprocessing.Image(np.zeros((200, 300), np.uint8))
+        self.image._binarized = binary
+
+    def test_classify_triangles(self):
+        """classify_triangles function: Checks prefilters and output."""
+        contours = skimage.measure.find_contours(self.image._binarized, 200)
+        self.assertEqual(len(contours), 4)
+        vertices = imgprocessing.classify_triangles(contours, [199, 299])
+        self.assertEqual(vertices.shape, (1, 3, 2))
+        npt.assert_allclose(np.sort(vertices[0, :, 0]), [30, 150, 150],
+                            atol=2)
+        # The prefilters can be relaxed to let every contour pass.
+        vertices = imgprocessing.classify_triangles(
+                contours, [199, 299], min_area=0, max_compactness=1)
+        self.assertGreaterEqual(len(vertices), 1)
+        self.assertEqual(imgprocessing.classify_triangles(
+                [], [199, 299]).shape, (0, 3, 2))
+
+    def test_contour_indexes(self):
+        """classify_triangles function: Checks the contours indexes."""
+        contours = skimage.measure.find_contours(self.image._binarized, 200)
+        triangle = [index for index, cnt in enumerate(contours)
+                    if cnt[:, 1].max() < 100][0]
+        contours.insert(0, np.empty((0, 2)))
+        vertices, indexes = imgprocessing.classify_triangles(
+                contours, [199, 299], return_indexes=True)
+        npt.assert_equal(indexes, [triangle + 1])
+        vertices, indexes = imgprocessing.classify_triangles(
+                [], [199, 299], return_indexes=True)
+        self.assertEqual((vertices.shape, indexes.shape), ((0, 3, 2), (0,)))
+
+    def test_lazy_triangles(self):
+        """Image get_vertices method: Checks triangles are created lazily."""
+        vertices = self.image.get_vertices()
+        self.assertEqual(vertices.shape, (1, 3, 2))
+        self.assertIsNone(self.image._triangles)
+        triangles = self.image.triangles
+        self.assertEqual(len(triangles), 1)
+        npt.assert_allclose(triangles[0].vertices, vertices[0])
+        self.assertIs(self.image.triangles, triangles)
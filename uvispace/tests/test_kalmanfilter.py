@@ -0,0 +1,80 @@
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace.uvisensor import kalmanfilter
+
+
+class KalmanTestCases(unittest.TestCase):
+    """Tests the Kalman filter and its history buffers."""
+
+    def run_filter(self, kalman, steps=10):
+        """Follow a straight line and return the filtered states."""
+        states = []
+        for step in range(steps):
+            kalman.predict(np.array([[100.], [0.]]), 0.02)
+            state, _ = kalman.update(np.array([[2. * step], [0.], [0.]]))
+            states.append(state.ravel())
+        return np.array(states)
+
+    def test_history(self):
+        """History: Checks the order of the values in the ring buffer."""
+        history = kalmanfilter.History(2, 3)
+        for value in range(2):
+            history.append(np.array([[value], [-value]]))
+        npt.assert_array_equal(history.get_values()[:, 0], [0, 1])
+        for value in range(2, 5):
+            history.append(np.array([[value], [-value]]))
+        self.assertEqual(len(history), 3)
+        npt.assert_array_equal(history.get_values()[:, 0], [2, 3, 4])
+
+    def test_kalman_history(self):
+        """Kalman: Checks the history does not change the estimates."""
+        kalman = kalmanfilter.Kalman()
+        recorder = kalmanfilter.Kalman(history=5)
+        states = self.run_filter(kalman)
+        npt.assert_allclose(self.run_filter(recorder), states)
+        self.assertEqual(kalman.states.shape, (3, 1))
+        npt.assert_allclose(kalman.states[:, -1], states[-1])
+        # The initial state and the first 5 steps were overwritten.
+        npt.assert_allclose(recorder.states.T, states[5:])
+        self.assertEqual(recorder.measurements.shape, (3, 5))
+        self.assertEqual(recorder.history['pred_states'].count, 11)
+
+    def test_bank(self):
+        """KalmanBank: Checks it matches a Kalman object per vehicle."""
+        random = np.random.RandomState(0)
+        bank = kalmanfilter.KalmanBank(2)
+        kalmans = [kalmanfilter.Kalman(), kalmanfilter.Kalman()]
+        noises = [(1., 2., 0.1), (3., 4., 0.2)]
+        bank.set_prediction_noise(noises)
+        for kalman, noise in zip(kalmans, noises):
+            kalman.set_prediction_noise(noise)
+        for step in range(10):
+            inputs = random.normal(0, 100, (2, 2, 1))
+            measurements = random.normal(0, 300, (2, 3, 1))
+            bank.predict(inputs, 0.02)
+            # The second vehicle is only detected on even steps.
+            states, _ = bank.update(measurements, mask=[True, step % 2 == 0])
+            for index, kalman in enumerate(kalmans):
+                state, _ = kalman.predict(inputs[index], 0.02)
+                if index == 0 or step % 2 == 0:
+                    state, _ = kalman.update(measurements[index])
+                else:
+                    kalman._state, kalman._P = state, kalman._pred_P.copy()
+                npt.assert_allclose(states[index], state)
+        self.assertEqual(bank.add(), 2)
+        self.assertEqual(len(bank), 3)
+
+    def test_extended(self):
+        """Kalman extended mode: Checks the Jacobian and the wrapping."""
+        kalman = kalmanfilter.Kalman(extended=True)
+        kalman._state = np.array([[0.], [0.], [np.pi - 0.01]])
+        _, P = kalman.predict(np.array([[100.], [0.]]), 1)
+        # The heading uncertainty is transferred to the Y coordinate.
+        self.assertLess(P[1, 2], 0)
+        # The measured heading is close to the predicted one, across pi.
+        state, _ = kalman.update(np.array([[-100.], [0.], [-np.pi + 0.01]]))
+        self.assertGreater(abs(state[2, 0]), np.pi - 0.02)
+        self.assertLess(state[2, 0], np.pi)
+        npt.assert_allclose(kalmanfilter.wrap_angle(np.array([3, 4, -4])),
+                            [3, 4 - 2 * np.pi, 2 * np.pi - 4])
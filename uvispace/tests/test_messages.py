@@ -0,0 +1,76 @@
+import json
+import struct
+import unittest
+import zmq
+from uvispace import messages
+
+
+class MessagesTestCases(unittest.TestCase):
+    """Tests the binary and JSON encoding of the bus messages."""
+
+    def setUp(self):
+        """Set a message of every topic."""
+        self.pose = {'x': 1520.25, 'y': -340.5, 'theta': 2.75, 'step': 42}
+        self.speed = {'step': 7, 'timestamp': 1234.5625, 'linear': 250.0,
+                      'angular': -0.5, 'sp_left': 160, 'sp_right': 94}
+        self.goal = {'x': -750.0, 'y': 1000.0, 'theta': 0.25}
+
+    def test_binary(self):
+        """encode function: Checks the binary round trip of every topic."""
+        for topic, message in ((messages.POSE, self.pose),
+                               (messages.SPEED, self.speed),
+                               (messages.GOAL, self.goal)):
+            payload = messages.encode(topic, message, binary=True)
+            self.assertEqual(payload[:2], struct.pack(
+                    '<BB', messages.VERSION, topic))
+            self.assertLess(len(payload), len(json.dumps(message)))
+            self.assertEqual(messages.decode(payload, topic), message)
+
+    def test_missing_fields(self):
+        """encode function: Checks the defaults of the missing fields."""
+        speed = messages.decode(messages.encode(
+                messages.SPEED, {'sp_left': 127, 'sp_right': 127}, True))
+        self.assertEqual(speed['timestamp'], 0)
+        self.assertEqual(speed['sp_right'], 127)
+        goal = messages.decode(messages.encode(
+                messages.GOAL, {'x': 1.0, 'y': 2.0}, True))
+        self.assertEqual(goal, {'x': 1.0, 'y': 2.0})
+
+    def test_json_fallback(self):
+        """decode function: Checks JSON messages are accepted."""
+        payload = messages.encode(messages.POSE, self.pose, binary=False)
+        self.assertEqual(payload, json.dumps(self.pose))
+        self.assertEqual(messages.decode(payload, messages.POSE), self.pose)
+
+    def test_invalid(self):
+        """decode function: Checks the rejected binary messages."""
+        payload = messages.encode(messages.POSE, self.pose, binary=True)
+        with self.assertRaises(ValueError):
+            messages.decode(payload, messages.SPEED)
+        with self.assertRaises(ValueError):
+            messages.decode(payload[:-1])
+        with self.assertRaises(ValueError):
+            messages.decode(struct.pack('<B', messages.VERSION + 1)
+                            + payload[1:])
+
+    def test_sockets(self):
+        """send and recv functions: Checks mixed formats on a socket."""
+        context = zmq.Context()
+        receiver = context.socket(zmq.PULL)
+        receiver.bind('inproc://messages')
+        sender = context.socket(zmq.PUSH)
+        sender.connect('inproc://messages')
+        try:
+            messages.send(sender, messages.SPEED, self.speed, binary=True)
+            sender.send_json(self.speed)
+            for _ in range(2):
+                self.assertEqual(messages.recv(receiver, messages.SPEED),
+                                 self.speed)
+        finally:
+            sender.close(linger=0)
+            receiver.close(linger=0)
+            context.term()
+
+
+if __name__ == '__main__':
+    unittest.main()
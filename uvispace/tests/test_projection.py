@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace.uvisensor import cameramodel
+from uvispace.uvisensor import projection
+from uvispace.uvisensor.geometry import Triangle
+
+CONF_FILE = os.path.join(os.path.dirname(__file__), '..', 'uvisensor',
+                         'resources', 'config', 'video_sensor1.cfg')
+
+
+class ProjectionTestCases(unittest.TestCase):
+    """Tests the batch projections with the homography of a camera."""
+
+    def setUp(self):
+        """Load the homography of a camera and some image points."""
+        # The configuration is copied, as its cache is written beside it.
+        folder = tempfile.mkdtemp()
+        conf_file = os.path.join(folder, 'camera.cfg')
+        shutil.copy(CONF_FILE, conf_file)
+        self.H = cameramodel.load_camera_model(conf_file).H
+        shutil.rmtree(folder)
+        self.points = np.random.RandomState(0).uniform(0, 2000, (50, 2))
+
+    def test_project_points(self):
+        """project_points: Checks the result of every point."""
+        projected = projection.project_points(self.points, self.H)
+        for point, expected in zip(self.points, projected):
+            product = np.dot(self.H, np.hstack([point, 1]))
+            npt.assert_allclose(product[:2] / product[2], expected)
+        # Any number of leading dimensions is accepted.
+        batch = projection.project_points(self.points.reshape(5, 5, 2, 2),
+                                          self.H)
+        npt.assert_allclose(batch.reshape(-1, 2), projected)
+
+    def test_backward(self):
+        """Projection backward method: Checks the inverse projection."""
+        transform = projection.get_projection(self.H)
+        npt.assert_allclose(
+                transform.backward(transform.forward(self.points)),
+                self.points, atol=1e-6)
+        self.assertIs(projection.get_projection(self.H.copy()), transform)
+
+    def test_triangle(self):
+        """Triangle homography methods: Checks the round trip."""
+        triangle = Triangle(self.points[:3])
+        triangle.homography(self.H)
+        self.assertEqual(triangle.vertices.dtype, np.float32)
+        triangle.inverse_homography(self.H)
+        npt.assert_allclose(triangle.vertices, self.points[:3], rtol=1e-4)
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace import recorder
+
+
+class RecorderTestCases(unittest.TestCase):
+    """Tests the growable recorders, in memory and mapped to files."""
+
+    def setUp(self):
+        """Create a temporary folder for the recorded files."""
+        self.folder = tempfile.mkdtemp()
+        self.rows = np.arange(300, dtype=float).reshape(-1, 3)
+
+    def tearDown(self):
+        """Remove the temporary folder."""
+        shutil.rmtree(self.folder)
+
+    def record(self, history):
+        """Record the rows one by one and then all at once."""
+        for row in self.rows:
+            history.append(row)
+        history.extend(self.rows)
+        return np.vstack((self.rows, self.rows))
+
+    def test_memory(self):
+        """Recorder append method: Checks the buffer grows."""
+        history = recorder.Recorder(3, capacity=1)
+        expected = self.record(history)
+        self.assertEqual(len(history), 200)
+        self.assertEqual(history.capacity, 256)
+        npt.assert_array_equal(history.data, expected)
+        # The recorded rows are not copied.
+        history.data[0, 0] = -1
+        self.assertEqual(history.data[0, 0], -1)
+        history.clear()
+        self.assertEqual(history.data.shape, (0, 3))
+
+    def test_file(self):
+        """Recorder close method: Checks the file holds the rows."""
+        filename = os.path.join(self.folder, 'history.dat')
+        history = recorder.Recorder(3, capacity=4, filename=filename)
+        expected = self.record(history)
+        history.close()
+        self.assertEqual(os.path.getsize(filename), expected.nbytes)
+        npt.assert_array_equal(history.data, expected)
+        npt.assert_array_equal(recorder.load(filename, 3), expected)
+        self.assertRaises(ValueError, history.append, self.rows[0])
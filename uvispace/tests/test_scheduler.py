@@ -0,0 +1,82 @@
+import threading
+import time
+import unittest
+from uvispace.uvisensor import scheduler
+
+
+class FakeClock(object):
+    """Monotonic clock and time module replacing the real ones.
+
+    Every sleep lasts the requested time plus a fixed oversleep, so the
+    deadlines checks do not depend on the load of the machine.
+    """
+
+    def __init__(self, oversleep=0.0):
+        """Class constructor. Set the initial time."""
+        self.now = 1000.0
+        self.oversleep = oversleep
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds + self.oversleep
+
+
+class PeriodicTimerTestCases(unittest.TestCase):
+    """Tests the deadlines and statistics of the PeriodicTimer class."""
+
+    def setUp(self):
+        """Replace the clock and the time module of the scheduler."""
+        self.clock = FakeClock(oversleep=0.0005)
+        self.real_monotonic = scheduler.monotonic
+        scheduler.monotonic = self.clock.monotonic
+        scheduler.time = self.clock
+
+    def tearDown(self):
+        """Restore the real clock and time module."""
+        scheduler.monotonic = self.real_monotonic
+        scheduler.time = time
+
+    def test_monotonic(self):
+        """monotonic function: Checks the clock increases with time."""
+        start = self.real_monotonic()
+        time.sleep(0.01)
+        self.assertAlmostEqual(self.real_monotonic() - start, 0.01,
+                               delta=0.01)
+
+    def test_drift_free_deadlines(self):
+        """PeriodicTimer wait method: Checks the deadlines do not drift."""
+        timer = scheduler.PeriodicTimer(0.01)
+        start = self.clock.now
+        for _ in range(11):
+            self.assertFalse(timer.wait())
+            # Cycles shorter than the period do not delay the deadlines.
+            self.clock.now += 0.004
+        # The oversleep of every cycle is not accumulated.
+        self.assertAlmostEqual(self.clock.now - start, 0.1045)
+        self.assertEqual(timer.stats['cycles'], 11)
+        self.assertEqual(timer.stats['overruns'], 0)
+        self.assertAlmostEqual(timer.stats['mean_jitter'], 0.0005)
+        self.assertAlmostEqual(timer.stats['max_jitter'], 0.0005)
+
+    def test_overruns(self):
+        """PeriodicTimer wait method: Checks missed deadlines skipping."""
+        timer = scheduler.PeriodicTimer(0.01)
+        timer.wait()
+        self.clock.now += 0.035
+        timer.wait()
+        self.assertEqual(timer.stats['overruns'], 1)
+        # The next deadline is the next multiple of the period.
+        self.assertAlmostEqual(timer.remaining(), 0.005)
+
+    def test_end_event(self):
+        """PeriodicTimer wait method: Checks the wait ends with the event."""
+        scheduler.monotonic = self.real_monotonic
+        timer = scheduler.PeriodicTimer(10)
+        event = threading.Event()
+        self.assertFalse(timer.wait(event))
+        threading.Timer(0.01, event.set).start()
+        start = scheduler.monotonic()
+        self.assertTrue(timer.wait(event))
+        self.assertLess(scheduler.monotonic() - start, 1)
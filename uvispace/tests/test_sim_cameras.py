@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace.uvisensor.client import Client
+from uvispace.uvisensor.geometry import Triangle
+from uvispace.uvisensor.resources import sim_cameras
+
+CONF_FILE = os.path.join(os.path.dirname(__file__), '..', 'uvisensor',
+                         'resources', 'config', 'video_sensor1.cfg')
+
+
+class SimulatedCameraTestCases(unittest.TestCase):
+    """Tests the geometry and the protocol of the simulated cameras."""
+
+    def setUp(self):
+        """Serve a camera watching 6 UGVs."""
+        # The configuration is copied, as its cache is written beside it.
+        self.folder = tempfile.mkdtemp()
+        conf_file = os.path.join(self.folder, 'camera.cfg')
+        shutil.copy(CONF_FILE, conf_file)
+        self.world = sim_cameras.SimulatedWorld(robots=6)
+        self.camera = sim_cameras.SimulatedCamera(self.world, conf_file)
+        self.server = sim_cameras.CameraServer(self.camera)
+        self.server.start()
+        self.client = Client(timeout=1.0)
+        self.client.open_connection('127.0.0.1', self.server.port)
+
+    def tearDown(self):
+        """Close the connection and the server."""
+        self.client.close_connection()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def test_project(self):
+        """SimulatedCamera project method: Checks the inverse transform."""
+        vertices = self.world.triangles(0)[:1]
+        triangle = Triangle(self.camera.project(vertices)[0])
+        triangle.local2global(self.camera.offsets, K=self.camera.K)
+        triangle.homography(self.camera.projection.H)
+        npt.assert_allclose(triangle.vertices, vertices[0], atol=0.01)
+
+    def test_registers(self):
+        """CameraServer: Checks register writes and reads."""
+        self.assertEqual(self.client.write_register('IMAGE_SHAPE', '648,486'),
+                         'ACK IMAGE_SHAPE\n')
+        self.assertEqual(self.client.read_register('IMAGE_SHAPE'), (648, 486))
+        self.client.binary_replies = True
+        self.assertEqual(self.client.read_register('IMAGE_SHAPE'), (648, 486))
+
+    def test_trackers(self):
+        """CameraServer: Checks the contours of the ROI trackers."""
+        ids, vertices = self.camera.visible_triangles(
+                self.world.frame_time())
+        self.assertGreater(len(ids), 0)
+        # A window around the first visible UGV, and an empty one.
+        center = vertices[0].mean(axis=0)[::-1] * self.camera.scale
+        self.client.write_register('SET_WINDOW', '3,{},{},200,200'.format(
+                int(center[0]) - 100, int(center[1]) - 100))
+        self.client.write_register('SET_WINDOW', '4,0,0,1,1')
+        locations = self.client.read_register('ACTUAL_LOCATION')
+        self.assertEqual(sorted(locations), ['3', '4'])
+        self.assertEqual(locations['4'].shape, (0, 2))
+        npt.assert_allclose(locations['3'].mean(axis=0), center, atol=20)
+        self.client.binary_replies = True
+        binary = self.client.read_register('ACTUAL_LOCATION')
+        self.assertEqual(sorted(binary), ['3', '4'])
+        self.client.write_register('FREE_TRACKER', 3)
+        self.assertEqual(self.client.read_register('ACTIVE_WINDOWS'), (4,))
+
+    def test_capture_frame(self):
+        """CameraServer: Checks the captured frames show the UGVs."""
+        self.assertEqual(self.client.write_command('GET_NEW_FRAME', True),
+                         'Image captured.\n')
+        self.client.write_command('GET_GRAY_IMAGE')
+        frame = self.client.read_array(self.camera.shape)
+        ids, vertices = self.camera.visible_triangles(
+                self.world.frame_time())
+        row, col = np.round(vertices[0].mean(axis=0)).astype(int)
+        self.assertEqual(frame[row, col], self.camera.level)
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+import numpy.testing as npt
+from uvispace.uvisensor.timeline import FusionTimeline
+
+
+class FusionTimelineTestCases(unittest.TestCase):
+    """Tests the fusion of timestamped events in time order."""
+
+    def setUp(self):
+        """Create the events of 2 UGVs during 1 second."""
+        random = np.random.RandomState(0)
+        self.events = []
+        for timestamp in np.arange(0, 1, 0.01):
+            if random.rand() < 0.3:
+                self.events.append((timestamp, random.randint(2),
+                                    (100 * random.rand(), random.rand())))
+            else:
+                self.events.append((timestamp, [0, 1],
+                                    random.normal(0, 100, (2, 3))))
+        self.delays = random.uniform(0, 0.08, len(self.events))
+
+    def run_timeline(self, delays):
+        """Receive the events with the given delays, and estimate."""
+        fusion = FusionTimeline(window=0.1)
+        fusion.add()
+        fusion.add()
+        received = sorted(zip(np.array([event[0] for event in self.events])
+                              + delays, self.events))
+        for now in np.arange(0.02, 1.2, 0.02):
+            while received and received[0][0] <= now:
+                timestamp, slots, values = received.pop(0)[1]
+                if isinstance(slots, list):
+                    fusion.add_poses(timestamp, slots, values)
+                else:
+                    fusion.add_speeds(slots, timestamp, *values)
+            states = fusion.estimate(now)
+        return states, fusion.stats
+
+    def test_order(self):
+        """FusionTimeline estimate method: Checks late events are fused."""
+        states, stats = self.run_timeline(np.zeros(len(self.events)))
+        self.assertEqual(stats['retrodicted'], 0)
+        late_states, stats = self.run_timeline(self.delays)
+        self.assertGreater(stats['retrodicted'], 0)
+        self.assertEqual(stats['dropped'], 0)
+        npt.assert_allclose(late_states, states)
+
+    def test_window(self):
+        """FusionTimeline add_poses method: Checks old events are dropped."""
+        fusion = FusionTimeline(window=0.1)
+        fusion.add()
+        self.assertTrue(fusion.add_poses(1.0, [0], [[10, 20, 0.5]]))
+        fusion.estimate(1.0)
+        self.assertTrue(fusion.add_poses(1.2, [0], [[10, 20, 0.5]]))
+        fusion.estimate(1.2)
+        self.assertFalse(fusion.add_poses(1.05, [0], [[10, 20, 0.5]]))
+        # A UGV added later starts with its initial state.
+        slot = fusion.add()
+        self.assertTrue(fusion.add_poses(1.15, [slot], [[-50, 0, 1]]))
+        states = fusion.estimate(1.3)
+        self.assertEqual(states.shape, (2, 3, 1))
+        npt.assert_allclose(states[1, :2, 0], [-50, 0], atol=1)
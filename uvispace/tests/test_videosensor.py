@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import cv2
+import numpy as np
+from uvispace.uvisensor import exchange
+from uvispace.uvisensor import scheduler
+from uvispace.uvisensor import videosensor
+from uvispace.uvisensor.resources import sim_cameras
+
+CONF_FILE = os.path.join(os.path.dirname(__file__), '..', 'uvisensor',
+                         'resources', 'config', 'video_sensor1.cfg')
+
+
+class FrameStreamTestCases(unittest.TestCase):
+    """Tests the continuous capture of frames from a simulated camera."""
+
+    def setUp(self):
+        """Connect a VideoSensor to a simulated camera."""
+        # The configuration is copied, as its cache is written beside it.
+        self.folder = tempfile.mkdtemp()
+        source = os.path.join(self.folder, 'source.cfg')
+        shutil.copy(CONF_FILE, source)
+        world = sim_cameras.SimulatedWorld(robots=2, fps=100)
+        self.server = sim_cameras.CameraServer(
+                sim_cameras.SimulatedCamera(world, source))
+        self.server.start()
+        conf_file = os.path.join(self.folder, 'camera.cfg')
+        sim_cameras.write_config(source, conf_file, self.server.port)
+        self.camera = videosensor.camera_startup(conf_file)
+
+    def tearDown(self):
+        """Disconnect the camera and close the server."""
+        self.camera.disconnect_client()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def test_stream(self):
+        """FrameStream: Checks the frames, timestamps and statistics."""
+        for prefetch in (True, False):
+            stream = self.camera.stream_frames(frames=4, prefetch=prefetch)
+            timestamps = []
+            for timestamp, frame in stream:
+                self.assertEqual(frame.shape, stream.shape)
+                timestamps.append(timestamp)
+            self.assertEqual(len(timestamps), 4)
+            self.assertEqual(timestamps, sorted(timestamps))
+            self.assertEqual(stream.stats['frames'], 4)
+            self.assertGreater(stream.stats['fps'], 0)
+        # The connection is still in sync.
+        self.assertEqual(self.camera.get_register('SYSTEM_OUTPUT'), 4)
+
+    def test_prefetch_timestamps(self):
+        """FrameStream: Checks the processing does not delay timestamps."""
+        stream = self.camera.stream_frames(frames=3, prefetch=True)
+        timestamps = []
+        resume_times = []
+        for timestamp, frame in stream:
+            timestamps.append(timestamp)
+            # Process the frame, while the next one is captured.
+            time.sleep(0.05)
+            resume_times.append(scheduler.monotonic())
+        for timestamp, resume_time in zip(timestamps[1:], resume_times):
+            self.assertLess(timestamp, resume_time - 0.04)
+
+    def test_lost_capture(self):
+        """FrameStream: Checks a lost capture message is waited once."""
+        self.camera._client.settimeout(0.05)
+        stream = videosensor.FrameStream(self.camera, frames=2, tries=2)
+        stream.CAPTURED = 'Never captured.\n'
+        waits = []
+        wait_capture = stream._wait_capture
+
+        def count_waits():
+            waits.append(True)
+            wait_capture()
+        stream._wait_capture = count_waits
+        with self.assertRaises(IOError):
+            list(stream)
+        self.assertEqual(len(waits), 1)
+
+    def test_stream_stopped(self):
+        """FrameStream: Checks the prefetched capture is consumed."""
+        stream = self.camera.stream_frames(gray=False)
+        for index, (_, frame) in enumerate(stream):
+            self.assertEqual(frame.shape[2], 3)
+            if index == 2:
+                break
+        self.assertEqual(self.camera.get_register('SYSTEM_OUTPUT'), 4)
+
+
+def fake_camera(columns):
+    """Get a camera whose frames show a triangle at every column."""
+    frame = np.full((240, 320), 20, np.uint8)
+    for col in columns:
+        vertices = np.array([[col - 30, 180], [col + 30, 180], [col, 60]],
+                            np.int32)
+        cv2.fillConvexPoly(frame, vertices, 200)
+    camera = videosensor.VideoSensor()
+    camera.capture_frame = lambda **kwargs: frame
+    camera._params['red_thresholds'] = (700 << 20, 900 << 20)
+    return camera
+
+
+class GetImageTestCases(unittest.TestCase):
+    """Tests the periodic full frame scans of get_image."""
+
+    def setUp(self):
+        """Set a camera whose frames show 2 triangles."""
+        self.camera = fake_camera((60, 220))
+
+    def test_new_ugv(self):
+        """get_image function: Checks an UGV entering outside the ROIs."""
+        self.camera.rescan_period = 3
+        # Only the first triangle is tracked.
+        self.camera._windows = [np.array([[40, 20], [200, 100]])]
+        counts = [len(videosensor.get_image(self.camera).triangles)
+                  for _ in range(6)]
+        self.assertEqual(counts, [1, 1, 2, 1, 1, 2])
+
+
+class SetTrackerTestCases(unittest.TestCase):
+    """Tests the ids of the trackers set on several cameras."""
+
+    def test_shared_ids(self):
+        """set_tracker function: Checks ids from a shared allocator."""
+        tracker_ids = exchange.IdAllocator()
+        windows = []
+        # Each camera sees a different UGV.
+        for column in (60, 220):
+            camera = fake_camera([column])
+            camera.write_queue = lambda regkey, value: windows.append(value)
+            image = videosensor.get_image(camera)
+            self.assertEqual(len(image.triangles), 1)
+            videosensor.set_tracker(camera, image, tracker_ids.allocate(
+                    len(image.triangles)))
+        self.assertEqual([window.split(',')[0] for window in windows],
+                         ['1', '2'])
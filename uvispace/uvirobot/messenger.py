@@ -46,6 +46,7 @@ except ImportError:
     # Exit program if the settings module can't be found.
     sys.exit("Can't find settings module. Maybe environment variables are not"
              "set. Run the environment .sh script at the project root folder.")
+import messages
 logger = logging.getLogger('messenger')
 
 
@@ -93,7 +94,7 @@ def listen_speed_set_points(my_serial, robot_id, speed_calc_times,
     # listen for speed directives until interrupted
     try:
         while True:
-            data = speed_subscriber.recv_json()
+            data = messages.recv(speed_subscriber, messages.SPEED)
             logger.debug("Received new speed set point: {}".format(data))
             move_robot(data, my_serial, wait_times, speed_calc_times,
                        xbee_times)
@@ -29,6 +29,7 @@ except ImportError:
     # Exit program if the settings module can't be found.
     sys.exit("Can't find settings module. Maybe environment variables are not"
              "set. Run the environment .sh script at the project root folder.")
+import messages
 logger = logging.getLogger('navigator')
 
 
@@ -85,13 +86,14 @@ def listen_sockets(sockets, my_robot):
         events = dict(poller.poll(1000))
         if (sockets['pose_subscriber'] in events
                 and events[sockets['pose_subscriber']] == zmq.POLLIN):
-            position = sockets['pose_subscriber'].recv_json()
+            position = messages.recv(sockets['pose_subscriber'],
+                                     messages.POSE)
             logger.debug("Received new pose: {}".format(position))
             my_robot.set_speed(position)
 
         if (sockets['goal_subscriber'] in events
                 and events[sockets['goal_subscriber']] == zmq.POLLIN):
-            goal = sockets['goal_subscriber'].recv_json()
+            goal = messages.recv(sockets['goal_subscriber'], messages.GOAL)
             logger.debug("Received new goal: {}".format(goal))
             my_robot.new_goal(goal)
 
@@ -150,7 +152,8 @@ def main():
     logger.info("Waiting for first pose")
     while run_program and not my_robot.init:
         try:
-            position = sockets['pose_subscriber'].recv_json(zmq.NOBLOCK)
+            position = messages.recv(sockets['pose_subscriber'],
+                                     messages.POSE, zmq.NOBLOCK)
         except zmq.ZMQError:
             pass
         else:
@@ -168,7 +171,7 @@ def main():
     for socket in sockets:
         sockets[socket].close()
     # Plot results
-    if my_robot.path.all() is not None:
+    if len(my_robot.path):
         # Print the log output to files and plot it
         script_path = os.path.dirname(os.path.realpath(__file__))
         # A file identifier is generated from the current time value
@@ -17,6 +17,7 @@ except ImportError:
     # Exit program if the settings module can't be found.
     sys.exit("Can't find settings module. Maybe environment variables are not"
              "set. Run the environment .sh script at the project root folder.")
+import messages
 logger = logging.getLogger('navigator')
 
 def main():
@@ -65,7 +66,7 @@ def main():
     }
     # The loop is exited after the sigint_handler function is called.
     while run_program:
-        goal_publisher.send_json(goal)
+        messages.send(goal_publisher, messages.GOAL, goal)
         logger.info("Sent {}".format(goal))
         time.sleep(2)
     # Cleanup resources
@@ -32,6 +32,7 @@ except ImportError:
 
 # Logging setup.
 import settings
+import messages
 
 
 def get_key():
@@ -129,38 +130,38 @@ def main():
             screen_message = 'moving forward'
             speed_message['sp_left'] = speed.left_fwd_solver.solve(400, 0)
             speed_message['sp_right'] = speed.right_fwd_solver.solve(400, 0)
-            speed_publisher.send_json(speed_message)
+            messages.send(speed_publisher, messages.SPEED, speed_message)
         # Move backwards.
         elif key in ('s', 'S'):
             screen_message = 'moving backwards'
             speed_message['sp_left'] = speed.left_fwd_solver.solve(-200, 0)
             speed_message['sp_right'] = speed.right_fwd_solver.solve(-200, 0)
-            speed_publisher.send_json(speed_message)
+            messages.send(speed_publisher, messages.SPEED, speed_message)
         # Move left.
         elif key in ('a', 'A'):
             screen_message = 'moving left'
             speed_message['sp_left'] = speed.left_fwd_solver.solve(200, 1)
             speed_message['sp_right'] = speed.right_fwd_solver.solve(200, 1)
-            speed_publisher.send_json(speed_message)
+            messages.send(speed_publisher, messages.SPEED, speed_message)
         # Move right.
         elif key in ('d', 'D'):
             screen_message = 'moving right'
             speed_message['sp_left'] = speed.left_fwd_solver.solve(200, -1)
             speed_message['sp_right'] = speed.right_fwd_solver.solve(200, -1)
-            speed_publisher.send_json(speed_message)
+            messages.send(speed_publisher, messages.SPEED, speed_message)
         # Stop moving and exit.
         elif key in ('q', 'Q'):
             print ('Stop and exiting program. Have a good day! =)')
             speed_message['sp_left'] = speed.left_fwd_solver.solve(0, 0)
             speed_message['sp_right'] = speed.right_fwd_solver.solve(0, 0)
-            speed_publisher.send_json(speed_message)
+            messages.send(speed_publisher, messages.SPEED, speed_message)
             break
         # Stop moving.
         else:
             screen_message = 'stop moving'
             speed_message['sp_left'] = speed.left_fwd_solver.solve(0, 0)
             speed_message['sp_right'] = speed.right_fwd_solver.solve(0, 0)
-            speed_publisher.send_json(speed_message)
+            messages.send(speed_publisher, messages.SPEED, speed_message)
         # If key pressed now and key pressed previously are different,
         # update message.
         if prev_key != key:
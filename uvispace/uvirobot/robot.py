@@ -9,7 +9,6 @@ attributes such as the *robot_id* or its speed values. It imports
 # Standard libraries
 import ast
 import ConfigParser
-import glob
 import logging
 import os
 import sys
@@ -27,8 +26,46 @@ except ImportError:
     # Exit program if the settings module can't be found.
     sys.exit("Can't find settings module. Maybe environment variables are not"
              "set. Run the environment .sh script at the project root folder.")
+import configcache
+import messages
+import recorder
+from uvisensor.scheduler import monotonic
 logger = logging.getLogger("navigator")
 
+# Version of the compiled coefficients. Increase it when parse_conffile
+# changes.
+CONF_VERSION = 1
+
+
+def parse_conffile(filename):
+    """Read and validate the speed coefficients of a robot config file.
+
+    :param str filename: path to the configuration file.
+    :return: the 6 polynomial coefficients of each wheel and movement,
+     with the keys 'left_fwd', 'right_fwd', 'left_turn' and 'right_turn'.
+    :rtype: dict
+    :raises ValueError: if a coefficients option is missing or invalid.
+    """
+    conf = ConfigParser.ConfigParser()
+    conf.read(filename)
+    coefs = {}
+    for movement in ('fwd', 'turn'):
+        for side in ('left', 'right'):
+            try:
+                values = ast.literal_eval(conf.get(
+                        'Coefficients_{}'.format(movement),
+                        'coefs_{}'.format(side)))
+                values = tuple(float(value) for value in values)
+            except (ConfigParser.Error, SyntaxError, TypeError,
+                    ValueError) as error:
+                raise ValueError("Invalid configuration file {}: {}".format(
+                        filename, error))
+            if len(values) != 6:
+                raise ValueError("Expected 6 coefficients, not {}".format(
+                        len(values)))
+            coefs['{}_{}'.format(side, movement)] = values
+    return coefs
+
 
 class RobotController(object):
     """This class contains methods needed to control a robot's behavior.
@@ -47,6 +84,10 @@ class RobotController(object):
     :param route: array that stores the P points of the route made by
      the UGV.
     :type route: numpy.array float64 (shape=Px2).
+
+    The goal points and the route are recorded with *recorder.Recorder*
+    objects, and the 3 arrays are views of them. The path is made of the
+    recorded goals already reached, and the goal points of the rest.
     :param float beta: angle of the line between the UGV and the next
      goal point. The value is in radians.
     :param float epsilon: difference between beta angle and UGV angle
@@ -68,35 +109,34 @@ class RobotController(object):
         self.init = False
         self.speed_status = {
             'step': 0,
+            'timestamp': 0.0,
             'linear': 0.0,
             'angular': 0.0,
             'sp_left': 127,
             'sp_right': 127,
         }
-        # Path and vehicle distances and angles.
-        self.goal_points = np.array([None, None]).reshape(1,2)
-        self.path = np.array([None, None]).reshape(1,2)
-        self.route = np.array([None, None]).reshape(1,2)
+        # Path and vehicle distances and angles. The goals before the index
+        # of the next one are the reached ones.
+        self._goals = recorder.Recorder(2, capacity=16)
+        self._next_goal = 0
+        self._route = recorder.Recorder(2)
         self.beta = 0
         self.epsilon = 0
         self.max_valid_angle = max_valid_angle*np.pi / 180
         self.distance = 0
         self.max_valid_distance = max_valid_distance
-        # Load the config file and read the polynomial coeficients
-        self.conf = ConfigParser.ConfigParser()
-        self.conf_file = glob.glob("./resources/config/robot{}.cfg"
-                                   .format(self.robot_id))
-        self.conf.read(self.conf_file)
+        # Load the polynomial coeficients of the config file. It is only
+        # parsed if it changed since the last time it was compiled.
+        self.conf_file = "./resources/config/robot{}.cfg".format(
+                self.robot_id)
+        coefs = configcache.load(self.conf_file, parse_conffile,
+                                 CONF_VERSION)
         # Coefficients for a forward movement.
-        self._left_fwd_coefs = ast.literal_eval(self.conf.get(
-                'Coefficients_fwd', 'coefs_left'))
-        self._right_fwd_coefs = ast.literal_eval(self.conf.get(
-                'Coefficients_fwd', 'coefs_right'))
+        self._left_fwd_coefs = coefs['left_fwd']
+        self._right_fwd_coefs = coefs['right_fwd']
         # Coefficients for an in-place turn movement (without linear shift).
-        self._left_turn_coefs = ast.literal_eval(self.conf.get(
-                'Coefficients_turn', 'coefs_left'))
-        self._right_turn_coefs = ast.literal_eval(self.conf.get(
-                'Coefficients_turn', 'coefs_right'))
+        self._left_turn_coefs = coefs['left_turn']
+        self._right_turn_coefs = coefs['right_turn']
         # Send the coeficients to the polynomial solver objects
         self.robot_speed = Speed()
         self.robot_speed.left_fwd_solver.update_coefs(self._left_fwd_coefs)
@@ -108,6 +148,21 @@ class RobotController(object):
         self.speed_publisher.bind("tcp://*:{}".format(
                 int(os.environ.get("UVISPACE_BASE_PORT_SPEED"))+robot_id))
 
+    @property
+    def goal_points(self):
+        """Goal points not reached yet, from the next one."""
+        return self._goals.data[self._next_goal:]
+
+    @property
+    def path(self):
+        """Goal points already reached, i.e. the ideal path."""
+        return self._goals.data[:self._next_goal]
+
+    @property
+    def route(self):
+        """Points of the route made by the UGV."""
+        return self._route.data
+
     def set_speed(self, pose):
         """Receive a new pose and calculate a speed value.
 
@@ -122,13 +177,10 @@ class RobotController(object):
             self.init = True
             linear = 0
             angular = 0
-        if self.goal_points.all() is not None:
+        if len(self.goal_points):
             # There is a goal point.
             current_point = (pose['x'], pose['y'])
-            if self.route.all() is None:
-                self.route = np.array([current_point]).reshape(1,2)
-            else:
-                self.route = np.vstack((self.route, current_point))
+            self._route.append(current_point)
             next_point = self.goal_points[0, :]
             segment = next_point - current_point
             self.beta = np.arctan2(segment[1], segment[0])
@@ -186,11 +238,13 @@ class RobotController(object):
         :param int sp_right: setpoint right value.
         """
         self.speed_status['step'] = step
+        # Monotonic sending time, for fusing the speeds in time order.
+        self.speed_status['timestamp'] = monotonic()
         self.speed_status['linear'] = linear
         self.speed_status['angular'] = angular
         self.speed_status['sp_left'] = sp_left
         self.speed_status['sp_right'] = sp_right
-        self.speed_publisher.send_json(self.speed_status)
+        messages.send(self.speed_publisher, messages.SPEED, self.speed_status)
         return
 
     def new_goal(self, goal):
@@ -203,10 +257,7 @@ class RobotController(object):
         if self.init:
             goal_point = (goal['x'], goal['y'])
             # Adds the new goal to goal points array.
-            if self.goal_points.all() == None:
-                self.goal_points = np.array([goal_point]).reshape(1,2)
-            else:
-                self.goal_points = np.vstack([self.goal_points, goal_point])
+            self._goals.append(goal_point)
             logger.info('New goal--> X: {}, Y: {}'.format(goal['x'], goal['y']))
         else:
             logger.info('The system is not yet initialized, '
@@ -220,18 +271,8 @@ class RobotController(object):
         deleted when the destination is reached. The goal destination
         points are stored in the path array.
         """
-        data_array = self.goal_points
-        # Array that stores the ideal path for the robot.
-        if self.path.all() is None:
-            self.path = data_array[0, :]
-        else:
-            self.path = np.vstack((self.path, data_array[0, :]))
-        if data_array.shape[0] == 1:
-            # If the data matrix only contain one data.
-            data_array = np.array([None, None]).reshape(1,2)
-        else:
-            data_array = data_array[1:, :]
-        self.goal_points = data_array
+        # The reached goal becomes the last point of the path.
+        self._next_goal += 1
         return
 
     def on_shutdown(self):
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""This module contains an event loop for polling several cameras.
+
+Instead of having a thread per camera, doing blocking reads of its
+registers and waiting actively for the next cycle, a single loop waits
+with *select* on the sockets of every camera. Thus, the requests to the
+cameras are concurrent, and the number of threads does not grow with
+the number of cameras.
+
+Each camera is handled by a *LocationPoller* object, that sends a read
+request at every deadline, reads the incoming data only when it is
+available, and calls a function with the content of every reply. The
+register writes are queued on the poller too, and sent without waiting
+for their messages, so a slow camera does not stall the others. The
+*PollingLoop* class runs the pollers until an event is set.
+"""
+# Standard libraries
+import collections
+import errno
+import logging
+import select
+import sys
+# Local libraries
+from client import is_data_reply, parse_reply
+from scheduler import monotonic
+
+try:
+    # Logging setup.
+    import settings
+except ImportError:
+    # Exit program if the settings module can't be found.
+    sys.exit("Can't find settings module. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+logger = logging.getLogger("sensor")
+
+
+class LocationPoller(object):
+    """Periodic and non-blocking reads of a register of a camera.
+
+    A request is sent every *period* seconds. If the reply of the
+    previous request has not arrived yet, the new request waits for it
+    until *reply_timeout* seconds since the previous request elapse.
+    Then, the new request is sent anyway, in case the reply was lost.
+    A reply that arrives late is still processed, as it only contains
+    data one period older.
+
+    The writes queued with *queue_write* are sent before the next
+    request, without waiting for their messages. The write messages
+    received, e.g. 'ACK ...', are skipped (see *client.is_data_reply*).
+
+    The *stats* dictionary counts the sent 'requests' and 'writes', the
+    received 'replies' and the requests whose reply timed out
+    ('timeouts').
+
+    When the callback is called, *capture_time* holds the time when the
+    request of the reply was sent, i.e. the capture time of its data.
+    The replies are not numbered, so after a timeout a reply can not be
+    matched to its request: it may be the late reply of the old one, or
+    the reply of the new one. Then, *capture_time* is None until a
+    single request is awaited again.
+
+    :param client: instance of *client.Client* with an open connection.
+    :param callback: function called with the content of every reply,
+     converted with *client.parse_reply*.
+    :param float period: time, in seconds, between requests.
+    :param float reply_timeout: time, in seconds, waited for a reply.
+     By default, it is equal to the period.
+    :param str register: key identifier of the register to be read.
+    """
+
+    def __init__(self, client, callback, period=0.02, reply_timeout=None,
+                 register='ACTUAL_LOCATION'):
+        """Class constructor. Set attributes."""
+        self.client = client
+        self.callback = callback
+        self.period = period
+        if reply_timeout is None:
+            reply_timeout = period
+        self.reply_timeout = reply_timeout
+        self.next_deadline = 0
+        self._request = 'r,{}\n'.format(client._REGISTERS[register])
+        # Times of the requests whose replies are awaited, oldest first,
+        # and of the request of the last reply.
+        self._request_times = collections.deque(maxlen=8)
+        self.capture_time = None
+        # Register writes to be sent before the next request.
+        self._writes = []
+        self.stats = {
+            'requests': 0,
+            'writes': 0,
+            'replies': 0,
+            'timeouts': 0,
+        }
+
+    def fileno(self):
+        """Return the socket file descriptor, as required by *select*."""
+        return self.client.fileno()
+
+    def start(self, now):
+        """Set the first deadline at the given time."""
+        self.next_deadline = now
+
+    def due_time(self):
+        """Get the time when *on_timer* has to be called again."""
+        if self._writes:
+            return 0
+        if not self._request_times:
+            return self.next_deadline
+        return max(self.next_deadline,
+                   self._request_times[-1] + self.reply_timeout)
+
+    def queue_write(self, regkey, value):
+        """Queue a register write, to be sent before the next request.
+
+        :param str regkey: register identifier that will be written.
+        :param str value: data that will be written to the register.
+        """
+        self._writes.append('w,{},{}\n'.format(
+                self.client._REGISTERS[regkey], value))
+
+    def on_timer(self, now):
+        """Send the queued writes, and a new request if it is due.
+
+        The deadlines are multiples of the period since the start, so
+        delays do not accumulate. The deadlines missed are skipped.
+
+        :param float now: current time, in seconds.
+        """
+        if self._writes:
+            self.client.sendall(''.join(self._writes))
+            self.stats['writes'] += len(self._writes)
+            self._writes = []
+        if now < self.next_deadline:
+            return
+        if self._request_times:
+            last_time = self._request_times[-1]
+            if now - last_time < self.reply_timeout:
+                return
+            logger.warn('No reply from {} after {:.3f}s'.format(
+                    self.client.ip, now - last_time))
+            self.stats['timeouts'] += 1
+        self.client.send(self._request)
+        self._request_times.append(now)
+        self.stats['requests'] += 1
+        self.next_deadline += self.period
+        if self.next_deadline <= now:
+            missed = int((now - self.next_deadline) // self.period) + 1
+            self.next_deadline += missed * self.period
+
+    def handle_read(self):
+        """Read the available data and process the complete replies.
+
+        It has to be called when the socket is readable, so that the
+        reading does not block.
+        """
+        for line in self.client.read_available():
+            if not is_data_reply(line):
+                logger.debug('Skipped {!r} from {}'.format(line,
+                                                           self.client.ip))
+                continue
+            if len(self._request_times) == 1:
+                self.capture_time = self._request_times.popleft()
+            else:
+                # Unknown request. The late replies of the others, if
+                # any, get no capture time either.
+                self.capture_time = None
+                self._request_times.clear()
+            self.stats['replies'] += 1
+            self.callback(parse_reply(line))
+
+
+class PollingLoop(object):
+    """Event loop running several *LocationPoller* objects.
+
+    :param list pollers: *LocationPoller* objects to be run.
+    """
+
+    def __init__(self, pollers):
+        """Class constructor. Set attributes."""
+        self.pollers = pollers
+
+    def run(self, end_event):
+        """Run the pollers until the given event is set.
+
+        :param end_event: *threading.Event* object that is set to True
+         when the execution has to end.
+        """
+        now = monotonic()
+        for poller in self.pollers:
+            poller.start(now)
+        while not end_event.is_set():
+            now = monotonic()
+            for poller in self.pollers:
+                poller.on_timer(now)
+            # Wait for replies until the next deadline.
+            timeout = min(poller.due_time() for poller in self.pollers)
+            timeout = max(0, timeout - monotonic())
+            try:
+                readable, _, _ = select.select(self.pollers, [], [], timeout)
+            except select.error as (code, msg):
+                # Ignore system (user) interrupts and wait again.
+                if code != errno.EINTR:
+                    raise
+                continue
+            for poller in readable:
+                poller.handle_read()
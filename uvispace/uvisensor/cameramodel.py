@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""This module contains the compiled model of a camera configuration.
+
+A *CameraModel* contains every value of a camera configuration file
+that is needed at run time: connection address, acquisition parameters
+and threshold registers, quadrant offsets, homography and its inverse,
+limits of the camera space, scale ratios and distortion constants. The
+homography and its inverse are available as a *projection.Projection*.
+
+The configuration files are parsed and validated only once, and the
+compiled values are cached by the *configcache* module. Thus, the
+*VideoSensor*, the *CameraThread* and the transforms of the triangles
+share the same read-only arrays.
+"""
+# Standard libraries
+import ast
+import ConfigParser
+import logging
+import sys
+# Third party libraries
+import numpy as np
+
+try:
+    # Logging setup.
+    import settings
+except ImportError:
+    # Exit program if the settings module can't be found.
+    sys.exit("Can't find settings module. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+import configcache
+import projection
+logger = logging.getLogger("sensor")
+
+# Version of the compiled values. Increase it when parse_conffile changes.
+VERSION = 1
+# Ratio between the FPGA and the image coordinates.
+SCALE = 2.0
+# Ratio between the global coordinates (mm) and the image coordinates.
+K = 4
+# Default constants of the barrel distortion of the lenses.
+DISTORTION = (0.035, 0.035)
+# Row and column offsets of each quadrant, as multiples of the image
+# height and width.
+_QUADRANT_OFFSETS = {1: (1, 0), 2: (1, 1), 3: (0, 1), 4: (0, 0)}
+
+
+def _read_array(conf, section, option, shape):
+    """Evaluate an array written on several lines, and check its shape."""
+    raw_value = conf.get(section, option)
+    array = np.array(ast.literal_eval(','.join(raw_value.split('\n'))),
+                     dtype=float)
+    if array.shape != shape:
+        raise ValueError("'{}' must have shape {}, not {}".format(
+                option, shape, array.shape))
+    return array
+
+
+def parse_conffile(filename):
+    """Read and validate a camera configuration file.
+
+    :param str filename: path to the configuration file.
+    :return: the compiled values, see *CameraModel*.
+    :rtype: dict
+    :raises ValueError: if an option is missing or invalid.
+    """
+    conf = ConfigParser.RawConfigParser()
+    conf.read(filename)
+    try:
+        params = {
+            'red_thresholds': ast.literal_eval(
+                    conf.get('Sensor', 'red_thresholds')),
+            'green_thresholds': ast.literal_eval(
+                    conf.get('Sensor', 'green_thresholds')),
+            'blue_thresholds': ast.literal_eval(
+                    conf.get('Sensor', 'blue_thresholds')),
+            'width': conf.getint('Camera', 'width'),
+            'height': conf.getint('Camera', 'height'),
+            'start_col': conf.getint('Camera', 'start_column'),
+            'start_row': conf.getint('Camera', 'start_row'),
+            'col_size': conf.getint('Camera', 'column_size'),
+            'row_size': conf.getint('Camera', 'row_size'),
+            'col_mode': conf.getint('Camera', 'column_mode'),
+            'row_mode': conf.getint('Camera', 'row_mode'),
+            'exposure': conf.getint('Camera', 'exposure'),
+            'output': 0,
+        }
+        params['skip'] = params['row_mode']
+        quadrant = conf.getint('Misc', 'quadrant')
+        H = _read_array(conf, 'Misc', 'H', (3, 3))
+        limits = _read_array(conf, 'Misc', 'limits', (4, 2))
+        values = {
+            'ip': conf.get('VideoSensor', 'ip'),
+            'port': conf.getint('VideoSensor', 'port'),
+            'params': params,
+            'quadrant': quadrant,
+            'H': H,
+            'limits': limits,
+        }
+        if conf.has_option('Misc', 'distortion'):
+            values['distortion'] = tuple(ast.literal_eval(
+                    conf.get('Misc', 'distortion')))
+    except (ConfigParser.Error, SyntaxError) as error:
+        raise ValueError("Invalid configuration file {}: {}".format(
+                filename, error))
+    for name in ('red_thresholds', 'green_thresholds', 'blue_thresholds'):
+        if len(params[name]) != 2:
+            raise ValueError("'{}' must have 2 registers".format(name))
+    if params['width'] <= 0 or params['height'] <= 0:
+        raise ValueError("The image shape must be positive")
+    if quadrant not in _QUADRANT_OFFSETS:
+        raise ValueError("Quadrant not valid: {}".format(quadrant))
+    # Fails if the homography is singular.
+    values['inverse_H'] = np.linalg.inv(H)
+    return values
+
+
+class CameraModel(object):
+    """Compiled configuration of a camera.
+
+    The attributes are read-only, as they are shared by every user of
+    the same configuration file.
+
+    :param str filename: path to the configuration file.
+    :param str ip: IP address of the FPGA.
+    :param int port: TCP port of the FPGA.
+    :param dict params: acquisition parameters and threshold registers,
+     with the keys of *VideoSensor.PARAMETERS*.
+    :param int quadrant: quadrant of the camera space, from 1 to 4.
+    :param H: homography from the local to the global coordinates.
+    :type H: numpy.array(shape=3x3)
+    :param inverse_H: inverse of the homography.
+    :type inverse_H: numpy.array(shape=3x3)
+    :param limits: the 4 points defining the camera space.
+    :type limits: numpy.array(shape=4x2)
+    :param tuple distortion: barrel distortion constants (kx, ky).
+    :param float scale: ratio between the FPGA and image coordinates.
+    :param K: ratio between the global (mm) and image coordinates.
+    """
+
+    def __init__(self, filename, ip, port, params, quadrant, H, inverse_H,
+                 limits, distortion=DISTORTION, scale=SCALE, K=K):
+        """Class constructor. Set the attributes and the offsets."""
+        self.filename = filename
+        self.ip = ip
+        self.port = port
+        self.params = params
+        self.quadrant = quadrant
+        self.H = H
+        self.inverse_H = inverse_H
+        self.limits = limits
+        self.distortion = distortion
+        self.scale = scale
+        self.K = K
+        for array in (self.H, self.inverse_H, self.limits):
+            array.flags.writeable = False
+        # Projection shared with the triangles transformed with H.
+        self.projection = projection.get_projection(H, inverse_H)
+        # Row and column offsets of the local coordinates.
+        row_factor, col_factor = _QUADRANT_OFFSETS[quadrant]
+        self.offsets = [row_factor * params['height'],
+                        col_factor * params['width']]
+
+    @property
+    def shape(self):
+        """Shape of the images, i.e. (height, width)."""
+        return (self.params['height'], self.params['width'])
+
+
+def load_camera_model(filename):
+    """Get the model of a camera configuration file.
+
+    The configuration is parsed only if it changed since the last time,
+    in any process. See the *configcache* module.
+
+    :param str filename: path to the configuration file.
+    :rtype: CameraModel
+    :raises ValueError: if the configuration file is invalid.
+    :raises OSError: if the configuration file does not exist.
+    """
+    values = configcache.load(filename, parse_conffile, VERSION)
+    return CameraModel(filename, **values)
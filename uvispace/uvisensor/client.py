@@ -14,7 +14,12 @@ import errno
 import logging
 import socket
 from socket import socket as Socket
+import string
+import struct
 import sys
+import time
+# Third party libraries
+import numpy as np
 
 try:
     # Logging setup.
@@ -25,6 +30,118 @@ except ImportError:
              "set. Run the environment .sh script at the project root folder.")
 logger = logging.getLogger("sensor")
 
+# Characters of the text replies that separate the numbers of a list.
+_SEPARATORS = string.maketrans('[](),:', '      ')
+# Header of the binary replies: kind of value and length of the payload.
+_BINARY_HEADER = struct.Struct('<cI')
+_BINARY_KINDS = 'itd'
+# First characters of the text replies of the register reads. Any other
+# line, e.g. 'ACK ...', is the message given back after a write.
+_DATA_STARTS = tuple('0123456789-({[')
+
+
+def is_data_reply(line):
+    """Check if a reply line is the content of a register read.
+
+    The replies are told apart by their content, instead of their
+    position, so a missing or late write message does not shift the
+    replies of the reads.
+
+    :param str line: line received from the FPGA.
+    :return: False if the line is a message given back after a write.
+    :rtype: bool
+    """
+    return line.lstrip().startswith(_DATA_STARTS)
+
+
+def parse_reply(reply):
+    """Convert the text reply of a register read into a value.
+
+    The known reply formats are parsed without evaluating the string,
+    which is much faster than *ast.literal_eval*:
+
+    * Integers e.g. '640'.
+    * Tuples of integers e.g. '(640, 480)'.
+    * Dictionaries of tracker ids and their lists of [x, y] points, e.g.
+      "{'1': [[10, 20], [30, 40]]}". The points are returned as numpy
+      arrays with shape (N, 2).
+
+    Other formats fall back to *ast.literal_eval*, e.g. dictionaries
+    with unquoted or double-quoted ids. Their ids are converted to
+    strings, and their points to arrays, as in the known format.
+
+    :param str reply: message received after a register read.
+    :return: the content of the register.
+    :rtype: int, tuple or dict
+    """
+    text = reply.strip()
+    try:
+        if text.startswith('{'):
+            # Tracker ids are between quotes, and their points after them.
+            fields = text[1:-1].split("'")
+            if text != '{}' and (
+                    len(fields) < 3 or len(fields) % 2 == 0
+                    or fields[0].strip()
+                    or not all(field.lstrip().startswith(':')
+                               for field in fields[2::2])):
+                raise ValueError("Unknown dictionary format")
+            points = {}
+            for index in range(1, len(fields) - 1, 2):
+                numbers = fields[index+1].translate(_SEPARATORS)
+                # An empty string would be parsed as a single 0.
+                if numbers.strip():
+                    values = np.fromstring(numbers, dtype=int, sep=' ')
+                else:
+                    values = np.empty(0, dtype=int)
+                points[fields[index]] = values.reshape(-1, 2)
+            return points
+        elif text.startswith('('):
+            return tuple(int(value) for value in text[1:-1].split(',')
+                         if value.strip())
+        return int(text)
+    except ValueError:
+        value = ast.literal_eval(text)
+        if isinstance(value, dict):
+            value = {str(key): np.asarray(points, dtype=int).reshape(-1, 2)
+                     for key, points in value.items()}
+        return value
+
+
+def parse_binary_reply(kind, payload):
+    """Convert the binary reply of a register read into a value.
+
+    The payload is a sequence of little endian 32 bits integers, whose
+    meaning depends on the kind of value:
+
+    * 'i': a single integer.
+    * 't': the elements of a tuple.
+    * 'd': for every tracker, its id, its number of points N, and the
+      2*N coordinates of the points.
+
+    :param str kind: kind of value, as read from the reply header.
+    :param payload: data after the reply header.
+    :type payload: str or bytearray
+    :return: the content of the register, with the same types as the
+     output of *parse_reply*.
+    :rtype: int, tuple or dict
+    """
+    values = np.frombuffer(payload, dtype='<i4')
+    if kind == 'i':
+        return int(values[0])
+    elif kind == 't':
+        return tuple(values.tolist())
+    elif kind == 'd':
+        values = values.astype(int)
+        points = {}
+        index = 0
+        while index < values.size:
+            tracker, count = values[index:index+2].tolist()
+            start = index + 2
+            index = start + 2 * count
+            points[str(tracker)] = values[start:index].reshape(-1, 2)
+        return points
+    raise ValueError("Unknown binary reply kind: {}".format(kind))
+
 
 class Client(Socket):
     """Child class of socket.socket which includes register operations.
@@ -47,6 +164,36 @@ class Client(Socket):
      (By default, it is set to blocking mode).
     :type timeout: int or float
 
+    **Batches**
+
+    Several register operations can be queued with *queue_read* and
+    *queue_write*, and then sent together with *flush_queue*, which
+    matches the responses to the requests. Thus, a batch of N requests
+    costs a single round trip instead of N. The responses are expected
+    to be newline terminated, and the replies of the reads in the same
+    order as the reads. The messages given back after the writes, e.g.
+    'ACK ...', are told apart from the read replies by their content
+    (see *is_data_reply*), as they may never arrive. If *write_acks* is
+    True, they are waited for until the timeout. Otherwise, only the
+    messages already received are returned, and the ones arriving later
+    are skipped by the next reads.
+
+    All the reads, of text replies and of raw data, go through the same
+    reception buffer, so the data received in advance is not lost.
+
+    **Replies**
+
+    The text replies of the register reads are converted with
+    *parse_reply*. If *binary_replies* is True, *read_register* requests
+    instead a binary reply ('b,<register>' command), for FPGA designs
+    that support it. It starts with a 5 bytes header, containing the
+    kind of value and the payload length, and it is converted with
+    *parse_binary_reply*. The batches always use text replies.
+
+    The *read_stats* dictionary contains the statistics of the last
+    call to *read_into*: received 'bytes', number of 'recv_calls',
+    elapsed 'seconds' and 'bytes_per_second'.
+
     The class has 2 dictionaries, _REGISTERS and _COMMANDS, that contain
     all the valid commands that can be sent to the FPGA and the declared
     registers inside it. When interacting with the FPGA, can only be 
@@ -86,7 +233,8 @@ class Client(Socket):
                  'GET_COLOR_IMAGE': 'D',
                  'GET_NEW_FRAME': 'S'}
 
-    def __init__(self, buffer_size=2048, timeout=2.0):
+    def __init__(self, buffer_size=2048, timeout=2.0, write_acks=True,
+                 binary_replies=False):
         """Class constructor. Set attributes, inheritance and logger."""
         # Initializes parent class
         Socket.__init__(self, family=socket.AF_INET, type=socket.SOCK_STREAM)
@@ -94,6 +242,19 @@ class Client(Socket):
         self.ip = ''
         self.port = None
         self.buffer_size = buffer_size
+        self.binary_replies = binary_replies
+        # Queued requests of the next batch, and received data not consumed.
+        self.write_acks = write_acks
+        self._queue = []
+        self._pending = ''
+        # Reusable buffer for the received frames, and reading statistics.
+        self._frame_buffer = np.empty(0, dtype=np.uint8)
+        self.read_stats = {
+            'bytes': 0,
+            'recv_calls': 0,
+            'seconds': 0.0,
+            'bytes_per_second': 0.0,
+        }
         # Call parent method for setting the timeout
         self.settimeout(timeout)
 
@@ -125,6 +286,7 @@ class Client(Socket):
         logger.info('Started TCP client with IP: {} and PORT:{}.'.format(
                 self.ip, self.port))
         # Empty the data buffer, as it contains the 'welcome message'.
+        self._pending = ''
         self.recv(self.buffer_size)
 
     def read_data(self, size):
@@ -135,24 +297,79 @@ class Client(Socket):
         :return: A data concatenation of all packages read from the 
          input buffer.
         """
-        bytes = 0
-        packages = []
+        data = bytearray(size)
+        received = self.read_into(data)
+        del data[received:]
+        return bytes(data)
+
+    def read_into(self, buffer, size=None):
+        """Read the incoming data directly into a writable buffer.
+
+        The socket writes the data in place, without intermediate
+        strings. Every read requests all the remaining bytes, so the
+        number of calls only depends on how the data arrives.
+
+        :param buffer: writable object supporting the buffer protocol,
+         e.g. a bytearray or a uint8 numpy array.
+        :param int size: number of bytes to be read. By default, the
+         length of the buffer.
+        :return: number of bytes actually read.
+        :rtype: int
+        """
+        view = memoryview(buffer)
+        if size is None:
+            size = len(view)
+        # Start with the data already received.
+        received = min(size, len(self._pending))
+        view[:received] = self._pending[:received]
+        self._pending = self._pending[received:]
+        recv_calls = 0
+        start_time = time.time()
         # Do not stop reading new packages until target 'size' is reached.
-        while bytes < size:
+        while received < size:
             try:
-                received_package = self.recv(self.buffer_size)
+                nbytes = self.recv_into(view[received:size])
             except socket.timeout:
-                amount = 100 * float(bytes) / size
+                amount = 100 * float(received) / size
                 logger.warn('Stopped data acquisition with {:.2f}% '
                             'of the data acquired'.format(amount))
                 break
-            bytes += len(received_package)
-            packages.append(received_package)
-        logger.debug('Received {} bytes of {} ({:.2f}%)'.format(
-                bytes, size, (100 * float(bytes) / size)))
-        # Concatenate all the packages in a unique variable
-        data = ''.join(packages)
-        return data
+            recv_calls += 1
+            # Zero bytes are received when the connection is closed.
+            if not nbytes:
+                logger.warn('Connection closed during data acquisition')
+                break
+            received += nbytes
+        seconds = time.time() - start_time
+        self.read_stats['bytes'] = received
+        self.read_stats['recv_calls'] = recv_calls
+        self.read_stats['seconds'] = seconds
+        self.read_stats['bytes_per_second'] = (received / seconds if seconds
+                                               else 0.0)
+        logger.debug('Received {} bytes of {} in {} calls'.format(
+                received, size, recv_calls))
+        return received
+
+    def read_array(self, shape):
+        """Read an array of bytes, e.g. an image, of the given shape.
+
+        The data is received into a buffer that is reused between calls,
+        and only reallocated when a bigger array is requested. Thus, the
+        returned array is a view of the buffer, that is overwritten on
+        the next call. If less data than expected is received, the rest
+        of the array is set to 0.
+
+        :param tuple shape: shape of the output array.
+        :return: received data.
+        :rtype: numpy.array(dtype=uint8)
+        """
+        size = int(np.prod(shape))
+        if self._frame_buffer.size < size:
+            self._frame_buffer = np.empty(size, dtype=np.uint8)
+        received = self.read_into(self._frame_buffer, size)
+        if received < size:
+            self._frame_buffer[received:size] = 0
+        return self._frame_buffer[:size].reshape(shape)
 
     def write_command(self, command, clean_buffer=False):
         """Send a command to the TCP/IP client.
@@ -168,10 +385,9 @@ class Client(Socket):
         self.send('{}\n'.format(data))
         message = "EMPTY BUFFER"
         if clean_buffer:
-            try:
-                message = self.recv(self.buffer_size)
-            except socket.timeout:
-                pass
+            lines = self._read_lines(1)
+            if lines:
+                message = lines[0]
         return message
 
     def read_register(self, regkey):
@@ -179,18 +395,24 @@ class Client(Socket):
 
         :param str regkey: register identifier
         :return: the content of the register
-        :rtype: int or list
+        :rtype: int, tuple or dict
         """
         reg = self._REGISTERS[regkey]
+        if self.binary_replies:
+            self.send('b,{}\n'.format(reg))
+            self._skip_write_messages()
+            header = self.read_data(_BINARY_HEADER.size)
+            if len(header) < _BINARY_HEADER.size:
+                raise socket.timeout('Incomplete binary reply header')
+            kind, length = _BINARY_HEADER.unpack(header)
+            return parse_binary_reply(kind, self.read_data(length))
         self.send('r,{}\n'.format(reg))
-        try:
-            result = self.recv(self.buffer_size)
-        except socket.error as (code, msg):
-            # Ignore system (user) interrupts and finish the buffer reading.
-            if code != errno.EINTR:
-                raise
-        # Convert the string input into a valid value e.g. list or int
-        formatted_result = ast.literal_eval(result)
+        # Read the whole reply line, as it may arrive in several packages.
+        lines, _ = self._read_replies(1, 0)
+        if not lines:
+            raise socket.timeout('No reply to the register read')
+        # Convert the string input into a valid value e.g. tuple or int
+        formatted_result = parse_reply(lines[0])
         return formatted_result
 
     def write_register(self, regkey, value):
@@ -206,8 +428,174 @@ class Client(Socket):
         self.send('w,{},{}\n'.format(reg, value))
         # Sometimes an ACK message is returned. It has to be checked for
         # cleaning the buffer.
-        try:
-            message = self.recv(self.buffer_size)
-        except socket.timeout:
-            message = "EMPTY BUFFER"
-        return message
+        _, messages = self._read_replies(0, 1)
+        return messages[0] if messages else "EMPTY BUFFER"
+
+    def queue_read(self, regkey):
+        """Queue a register read, to be sent on the next *flush_queue*.
+
+        :param str regkey: register identifier.
+        :return: index of the read result in the *flush_queue* output.
+        :rtype: int
+        """
+        reg = self._REGISTERS[regkey]
+        self._queue.append(('r', 'r,{}\n'.format(reg)))
+        return len(self._queue) - 1
+
+    def queue_write(self, regkey, value):
+        """Queue a register write, to be sent on the next *flush_queue*.
+
+        :param str regkey: register identifier that will be written.
+        :param value: data that will be written to the register. It will
+         be converted to a string before sending.
+        :return: index of the write message in the *flush_queue* output.
+        :rtype: int
+        """
+        reg = self._REGISTERS[regkey]
+        self._queue.append(('w', 'w,{},{}\n'.format(reg, value)))
+        return len(self._queue) - 1
+
+    def flush_queue(self):
+        """Send all the queued requests at once and get their responses.
+
+        The requests are joined and sent in a single write. Then, the
+        replies of the reads are assigned to them in order, and the
+        messages given back after the writes to the writes. If the
+        timeout expires before getting every reply, the remaining reads
+        are None. The writes without message get 'EMPTY BUFFER', as
+        *write_register*.
+
+        :return: the content of every queued read, and the message given
+         back after every queued write, in the order they were queued.
+        :rtype: list
+        """
+        requests = self._queue
+        self._queue = []
+        if not requests:
+            return []
+        self.sendall(''.join(command for _, command in requests))
+        reads = sum(1 for kind, _ in requests if kind == 'r')
+        writes = len(requests) - reads if self.write_acks else 0
+        lines, messages = self._read_replies(reads, writes)
+        lines = iter(lines)
+        messages = iter(messages)
+        results = []
+        for kind, _ in requests:
+            if kind == 'r':
+                line = next(lines, None)
+                if line is not None:
+                    line = parse_reply(line)
+                results.append(line)
+            else:
+                results.append(next(messages, "EMPTY BUFFER"))
+        return results
+
+    def read_available(self):
+        """Receive a package and get the complete lines received.
+
+        It has to be called when the socket is readable, so that the
+        reading does not block. The data after the last line is kept for
+        the next reads.
+
+        :return: the complete lines, including their newline character.
+        :rtype: list
+        :raises IOError: if the connection was closed.
+        """
+        package = self.recv(self.buffer_size)
+        if not package:
+            raise IOError('Connection closed by {}'.format(self.ip))
+        data = self._pending + package
+        end = data.rfind('\n') + 1
+        self._pending = data[end:]
+        return data[:end].splitlines(True)
+
+    def _receive(self):
+        """Append a new package to the data received not consumed.
+
+        :return: False if the timeout expired or the connection was
+         closed, True otherwise.
+        :rtype: bool
+        """
+        while True:
+            try:
+                package = self.recv(self.buffer_size)
+            except socket.timeout:
+                return False
+            except socket.error as (code, msg):
+                # Ignore system (user) interrupts and read again.
+                if code != errno.EINTR:
+                    raise
+                continue
+            if not package:
+                logger.warn('Connection closed while reading responses')
+                return False
+            self._pending += package
+            return True
+
+    def _read_replies(self, reads, writes):
+        """Read the replies of a number of reads and writes.
+
+        The lines are classified with *is_data_reply*. The write
+        messages received before the last read reply are returned too,
+        even if *writes* is 0, so they are not taken as read replies.
+
+        :param int reads: number of read replies to be waited for.
+        :param int writes: number of write messages to be waited for.
+        :return: the read replies and the write messages received, in
+         order, before the timeout expired.
+        :rtype: (list, list)
+        """
+        lines = []
+        messages = []
+        while len(lines) < reads or len(messages) < writes:
+            end = self._pending.find('\n')
+            if end < 0:
+                if not self._receive():
+                    logger.warn('Received {} of {} responses'.format(
+                            len(lines) + len(messages), reads + writes))
+                    break
+                continue
+            line = self._pending[:end+1]
+            self._pending = self._pending[end+1:]
+            if is_data_reply(line):
+                lines.append(line)
+            else:
+                messages.append(line)
+        return lines, messages
+
+    def _skip_write_messages(self):
+        """Skip the write messages received before a binary reply."""
+        while True:
+            if not self._pending and not self._receive():
+                return
+            if self._pending[0] in _BINARY_KINDS:
+                return
+            end = self._pending.find('\n')
+            if end < 0:
+                if not self._receive():
+                    return
+                continue
+            self._pending = self._pending[end+1:]
+
+    def _read_lines(self, count):
+        """Read a number of newline terminated messages.
+
+        The data received after the last line is kept for the next call.
+
+        :param int count: number of lines to be read.
+        :return: the lines read, including their newline character. It
+         may contain less than *count* lines if the timeout expired.
+        :rtype: list
+        """
+        lines = []
+        while len(lines) < count:
+            end = self._pending.find('\n')
+            if end >= 0:
+                lines.append(self._pending[:end+1])
+                self._pending = self._pending[end+1:]
+                continue
+            if not self._receive():
+                logger.warn('Received {} of {} responses'.format(len(lines),
+                                                                 count))
+                break
+        return lines
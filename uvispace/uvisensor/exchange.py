@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+"""This module contains classes for exchanging data between workers.
+
+The workers are the threads, or the processes, of *multiplecamera*.
+
+A *SnapshotBuffer* holds the latest value published by a single writer
+thread. Every publication creates a new *Snapshot*, numbered with a
+sequence number and stamped with the monotonic time when its data was
+captured (by default, the publishing time), and replaces the previous
+one with a single reference assignment, which is atomic in CPython.
+Thus, the readers get the latest snapshot without taking locks, and
+without copying the data. The buffer also keeps the last few snapshots,
+so a reader that is slower than the writer may still get all of them.
+
+The published data must be treated as immutable: the writer creates new
+objects for every publication, and the readers do not modify them.
+
+A *SnapshotReader* keeps the sequence number of the last snapshot read,
+in order to detect the stale snapshots (already read) and the skipped
+ones (published and replaced before being read, or dropped from the
+recent ones).
+
+When the writer and the readers run in different processes, the
+snapshots are sent through ZeroMQ sockets. A *SocketSender* replaces the
+buffer on the writer side, and a *SocketReceiver* on the reader side.
+Each message contains the sequence number and timestamp of the
+snapshot, followed by its encoded data. The triangles measured by the
+cameras are encoded as compact records of *MEASUREMENT_DTYPE*, with
+*encode_triangles*, while any other data is pickled.
+
+The tracker ids, that identify the UGVs in every camera, are allocated
+by a single *IdAllocator* shared by all the cameras, so that the UGVs
+first detected by different cameras get different ids.
+"""
+# Standard libraries
+import collections
+import cPickle as pickle
+import multiprocessing
+import struct
+# Third party libraries
+import numpy as np
+import zmq
+# Local libraries
+from geometry import TriangleBatch
+from scheduler import monotonic
+
+# Published value, with its sequence number and monotonic capture time.
+Snapshot = collections.namedtuple('Snapshot', 'sequence timestamp data')
+
+# Header of the socket messages: sequence number and capture time.
+_HEADER = struct.Struct('<Qd')
+# Record of a measured triangle. When it was not detected, its vertices
+# are zero.
+MEASUREMENT_DTYPE = np.dtype([('robot_id', '<i4'),
+                              ('detected', '?'),
+                              ('vertices', '<f4', (3, 2))])
+
+
+def encode_triangles(triangles):
+    """Encode the triangles measured by a camera as compact records.
+
+    :param dict triangles: *geometry.Triangle* objects in global
+     cartesian coordinates, or None if not detected, indexed by the
+     string of their integer tracker id.
+    :return: raw bytes of an array of *MEASUREMENT_DTYPE* records.
+    :rtype: str
+    """
+    records = np.zeros(len(triangles), dtype=MEASUREMENT_DTYPE)
+    for record, key in zip(records, sorted(triangles)):
+        record['robot_id'] = int(key)
+        if triangles[key] is not None:
+            record['detected'] = True
+            record['vertices'] = triangles[key].vertices
+    return records.tostring()
+
+
+def decode_triangles(payload):
+    """Decode the records created by *encode_triangles*.
+
+    :param str payload: raw bytes of the records.
+    :return: dictionary of *geometry.Triangle* objects, or None if not
+     detected, indexed by the string of their tracker id.
+    :rtype: dict
+    """
+    records = np.frombuffer(payload, dtype=MEASUREMENT_DTYPE)
+    triangles = dict.fromkeys(str(robot_id)
+                              for robot_id in records['robot_id'])
+    detected = records[records['detected']]
+    batch = TriangleBatch(detected['vertices'], isglobal=True,
+                          cartesian=True)
+    for robot_id, triangle in zip(detected['robot_id'], batch):
+        triangles[str(robot_id)] = triangle
+    return triangles
+
+
+class SnapshotBuffer(object):
+    """Latest values published by a single writer.
+
+    :param data: initial value, with sequence number 0.
+    :param int size: number of recent snapshots kept.
+    """
+
+    def __init__(self, data=None, size=4):
+        """Class constructor. Set the initial snapshot."""
+        self.size = size
+        # Tuple of the recent snapshots, oldest first, replaced at once.
+        self._recent = (Snapshot(0, monotonic(), data),)
+
+    def publish(self, data, timestamp=None):
+        """Replace the current snapshot by a new one with the given data.
+
+        Only one thread may publish in each buffer.
+
+        :param data: new value. It must not be modified afterwards.
+        :param float timestamp: monotonic time when the data was
+         captured. By default, the current time.
+        :return: the published snapshot.
+        :rtype: Snapshot
+        """
+        if timestamp is None:
+            timestamp = monotonic()
+        snapshot = Snapshot(self._recent[-1].sequence + 1, timestamp, data)
+        self._recent = (self._recent + (snapshot,))[-self.size:]
+        return snapshot
+
+    def latest(self):
+        """Get the latest published snapshot."""
+        return self._recent[-1]
+
+    def recent(self):
+        """Get the recent snapshots, oldest first.
+
+        :rtype: tuple
+        """
+        return self._recent
+
+
+class SnapshotReader(object):
+    """Reader of a *SnapshotBuffer* keeping track of the sequence numbers.
+
+    The *stats* dictionary counts the 'new' snapshots read, the 'stale'
+    reads, that got an already read snapshot, and the 'skipped'
+    snapshots, that were never read.
+
+    :param buffer: *SnapshotBuffer* object to be read.
+    """
+
+    def __init__(self, buffer):
+        """Class constructor. Set attributes."""
+        self.buffer = buffer
+        self.sequence = buffer.latest().sequence
+        self.stats = {
+            'new': 0,
+            'stale': 0,
+            'skipped': 0,
+        }
+
+    def read(self):
+        """Get the latest snapshot and check if it is a new one.
+
+        :return: the latest snapshot, and the number of snapshots skipped
+         since the previous read, or -1 if the snapshot is stale.
+        :rtype: (Snapshot, int)
+        """
+        snapshot = self.buffer.latest()
+        if snapshot.sequence == self.sequence:
+            self.stats['stale'] += 1
+            return snapshot, -1
+        skipped = snapshot.sequence - self.sequence - 1
+        self.sequence = snapshot.sequence
+        self.stats['new'] += 1
+        self.stats['skipped'] += skipped
+        return snapshot, skipped
+
+    def read_new(self):
+        """Get all the snapshots published since the previous read.
+
+        Only the recent snapshots still kept by the buffer are returned.
+        The older ones are counted as skipped.
+
+        :return: the new snapshots, oldest first, and the number of
+         snapshots skipped since the previous read, or -1 if there are
+         no new snapshots.
+        :rtype: (list, int)
+        """
+        recent = self.buffer.recent()
+        if recent[-1].sequence == self.sequence:
+            self.stats['stale'] += 1
+            return [], -1
+        snapshots = [snapshot for snapshot in recent
+                     if snapshot.sequence > self.sequence]
+        skipped = recent[-1].sequence - self.sequence - len(snapshots)
+        self.sequence = recent[-1].sequence
+        self.stats['new'] += len(snapshots)
+        self.stats['skipped'] += skipped
+        return snapshots, skipped
+
+
+class SocketSender(object):
+    """Writer side of a snapshot buffer shared between processes.
+
+    It has the *publish* method of *SnapshotBuffer*, but the snapshots
+    are sent through a ZeroMQ socket to a *SocketReceiver*.
+
+    :param socket: connected ZeroMQ PUSH socket.
+    :param encoder: function converting the published data into bytes.
+     By default, the data is pickled.
+    """
+
+    def __init__(self, socket, encoder=None):
+        """Class constructor. Set attributes."""
+        self.socket = socket
+        self.encoder = encoder or (
+                lambda data: pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+        self.sequence = 0
+
+    def publish(self, data, timestamp=None):
+        """Send a new snapshot with the given data.
+
+        The message is dropped if it can not be queued without blocking.
+
+        :param data: new value.
+        :param float timestamp: monotonic time when the data was
+         captured. By default, the current time.
+        :return: the published snapshot.
+        :rtype: Snapshot
+        """
+        if timestamp is None:
+            timestamp = monotonic()
+        self.sequence += 1
+        snapshot = Snapshot(self.sequence, timestamp, data)
+        message = _HEADER.pack(snapshot.sequence, snapshot.timestamp)
+        try:
+            self.socket.send(message + self.encoder(data), zmq.NOBLOCK)
+        except zmq.Again:
+            pass
+        return snapshot
+
+
+class SocketReceiver(object):
+    """Reader side of a snapshot buffer shared between processes.
+
+    It has the *latest* and *recent* methods of *SnapshotBuffer*, so it
+    can be read by a *SnapshotReader*. Every call drains the queued
+    messages, and decodes the last *size* ones. The timestamps are
+    comparable with *monotonic*, as its clock is shared by all the
+    processes.
+
+    :param socket: bound ZeroMQ PULL socket.
+    :param decoder: function converting the received bytes into data.
+     By default, the data is unpickled.
+    :param data: initial value, with sequence number 0.
+    :param int size: number of recent snapshots kept.
+    """
+
+    def __init__(self, socket, decoder=None, data=None, size=4):
+        """Class constructor. Set the initial snapshot."""
+        self.socket = socket
+        self.decoder = decoder or pickle.loads
+        self.size = size
+        self._recent = (Snapshot(0, monotonic(), data),)
+
+    def latest(self):
+        """Get the latest snapshot received."""
+        return self.recent()[-1]
+
+    def recent(self):
+        """Get the recent snapshots received, oldest first.
+
+        :rtype: tuple
+        """
+        # The older messages would be dropped, so they are not decoded.
+        messages = collections.deque(maxlen=self.size)
+        while self.socket.poll(0):
+            messages.append(self.socket.recv())
+        if messages:
+            received = []
+            for message in messages:
+                sequence, timestamp = _HEADER.unpack_from(message)
+                received.append(Snapshot(sequence, timestamp, self.decoder(
+                        message[_HEADER.size:])))
+            self._recent = (self._recent + tuple(received))[-self.size:]
+        return self._recent
+
+
+class IdAllocator(object):
+    """Allocator of the tracker ids of the whole fleet of UGVs.
+
+    The next id is kept in shared memory, so the allocator can be used
+    by the camera threads, and by the camera worker processes forked
+    after its creation.
+
+    :param int first: first id allocated.
+    """
+
+    def __init__(self, first=1):
+        """Class constructor. Create the shared counter."""
+        self._next = multiprocessing.Value('i', first)
+
+    def allocate(self, count):
+        """Reserve a number of consecutive ids.
+
+        :param int count: number of ids.
+        :return: the ids, never allocated before.
+        :rtype: list
+        """
+        with self._next.get_lock():
+            first = self._next.value
+            self._next.value += count
+        return range(first, first + count)
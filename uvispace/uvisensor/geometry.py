@@ -3,47 +3,88 @@
 
 The operations are done in the 2-D space
 It works with 2-D shapes represented by arrays. Thus, the calculations
-are based on matrix operations and linear algebra. 
+are based on matrix operations and linear algebra.
+
+The triangles are stored as records of *TRIANGLE_DTYPE*, that keep the
+vertices and every quantity derived from them in a single contiguous
+block. A *TriangleBatch* holds the records of several triangles in one
+array and transforms all of them at once, while a *Triangle* is a view
+of a single record. Thus, the triangles of a batch share its memory.
 """
 # Third party libraries
 import numpy as np
+# Local libraries
+import projection
+
+# Record of a triangle. The 'pose' field contains the base midpoint
+# coordinates and the orientation angle, and the 'flags' field contains
+# the isglobal, cartesian, posed and windowed flags. The last 2 are set
+# while the pose and the window are valid.
+TRIANGLE_DTYPE = np.dtype([('vertices', '<f4', (3, 2)),
+                           ('barycenter', '<f4', (2,)),
+                           ('pose', '<f4', (3,)),
+                           ('sides', '<f4', (3,)),
+                           ('window', '<f4', (2, 2)),
+                           ('base_index', '<i4'),
+                           ('scale', '<f8'),
+                           ('flags', '?', (4,))])
+# Indexes of the 'flags' field.
+_GLOBAL, _CARTESIAN, _POSED, _WINDOWED = range(4)
+# View of the absolute coordinates of a record, i.e. the vertices, the
+# barycenter and the base midpoint, as 5 contiguous points.
+_POINTS_DTYPE = np.dtype({'names': ['points'],
+                          'formats': [('<f4', (5, 2))],
+                          'offsets': [0],
+                          'itemsize': TRIANGLE_DTYPE.itemsize})
 
 
 class Triangle(object):
     """Class for dealing with geometric operations referred to triangles.
 
-    An instance of the class represents an isosceles triangle in a 
+    An instance of the class represents an isosceles triangle in a
     2-D space, with the 2 equal sides being bigger than the base one.
 
-    :param np.array(shape=3x2) vertices: vertices coordinates of the 
+    The triangle is a view of a record of *TRIANGLE_DTYPE*. The pose
+    and the window are computed when first needed, and kept until the
+    vertices change. Hence, the vertices have to be modified through
+    the methods or by assigning the *vertices* attribute, and not in
+    place.
+
+    :param np.array(shape=3x2) vertices: vertices coordinates of the
      triangle object.
-    :param bool isglobal: Flag that indicates if the coordinate system 
-     refers to the 4-quadrant system (global) or to a local quadrant 
+    :param bool isglobal: Flag that indicates if the coordinate system
+     refers to the 4-quadrant system (global) or to a local quadrant
      system.
-    :param bool cartesian: This flag indicates if the coordinates are 
-     referred to a cartesian system [x,y] instead of the images typical 
+    :param bool cartesian: This flag indicates if the coordinates are
+     referred to a cartesian system [x,y] instead of the images typical
      standard [row. column] = [y,x]
     """
 
+    __slots__ = ('_records', '_points', '_vertices', '_barycenter', '_pose',
+                 '_sides', '_window', '_flags', '_window_args')
+
     def __init__(self, vertices, isglobal=False, cartesian=False):
         """Triangle class constructor."""
-        if len(vertices) is not 3:
+        if len(vertices) != 3:
             raise ValueError("Expected an array with 3 vertices")
-        self.vertices = vertices.astype(np.float32)
-        # These flags indicate the coordinates system that is being used
-        self.isglobal = isglobal
-        self.cartesian = cartesian
-        # The barycenter X is equal to the sum of the X coordinates divided by 3
-        self.barycenter = self.vertices.sum(axis=0) / 3
-        self.sides = np.zeros([3])
-        # base_index is the identifier for the base side in 'sides' array.
-        self.base_index = None
-        self.midpoint = np.array([])
-        self.angle = None
-        self.window = np.array([])
-        self.contours = []
-        # Scale ratio for converting pixel coordinates to millimetres.
-        self._scale = 1
+        self._bind(np.zeros(1, dtype=TRIANGLE_DTYPE))
+        self._records['scale'] = 1
+        self._flags[_GLOBAL] = isglobal
+        self._flags[_CARTESIAN] = cartesian
+        self.vertices = vertices
+
+    def _bind(self, records):
+        """Set the record of the triangle, i.e. a 1-element array."""
+        self._records = records
+        self._points = records.view(_POINTS_DTYPE)['points'][0]
+        self._vertices = records['vertices'][0]
+        self._barycenter = records['barycenter'][0]
+        self._pose = records['pose'][0]
+        self._sides = records['sides'][0]
+        self._window = records['window'][0]
+        self._flags = records['flags'][0]
+        # Arguments of the last get_window call.
+        self._window_args = None
 
     def __str__(self):
         return "Triangle\n{}".format(self.vertices)
@@ -51,276 +92,289 @@ class Triangle(object):
     def __repr__(self):
         return "Triangle\n{}".format(self.vertices)
 
+    def __getstate__(self):
+        return self._records, self._window_args
+
+    def __setstate__(self, state):
+        self._bind(state[0])
+        self._window_args = state[1]
+
+    def copy(self):
+        """Get a triangle with a copy of the record of this one."""
+        triangle = Triangle.__new__(Triangle)
+        triangle._bind(self._records.copy())
+        triangle._window_args = self._window_args
+        return triangle
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    @property
+    def vertices(self):
+        """Coordinates of the 3 vertices, as a 3x2 float32 array."""
+        return self._vertices
+
+    @vertices.setter
+    def vertices(self, vertices):
+        self._vertices[...] = vertices
+        # The barycenter is the mean point of the 3 vertices.
+        self._barycenter[...] = self._vertices.sum(axis=0) / 3
+        self._flags[_POSED] = False
+        self._flags[_WINDOWED] = False
+
+    @property
+    def barycenter(self):
+        """Mean point of the vertices."""
+        return self._barycenter
+
+    @property
+    def isglobal(self):
+        """True if the coordinates refer to the global system."""
+        return bool(self._flags[_GLOBAL])
+
+    @isglobal.setter
+    def isglobal(self, isglobal):
+        self._flags[_GLOBAL] = isglobal
+
+    @property
+    def cartesian(self):
+        """True if the coordinates are [x,y] instead of [row, column]."""
+        return bool(self._flags[_CARTESIAN])
+
+    @cartesian.setter
+    def cartesian(self, cartesian):
+        self._flags[_CARTESIAN] = cartesian
+        self._flags[_POSED] = False
+
+    @property
+    def sides(self):
+        """Lengths of the 3 sides, indexed as their opposite vertices."""
+        self.get_pose()
+        return self._sides
+
+    @property
+    def base_index(self):
+        """Index of the minor side, and of the vertex opposite to it."""
+        self.get_pose()
+        return int(self._records['base_index'][0])
+
+    @property
+    def midpoint(self):
+        """Coordinates of the midpoint of the base side."""
+        self.get_pose()
+        return self._pose[:2]
+
+    @property
+    def angle(self):
+        """Orientation angle of the triangle, in radians."""
+        self.get_pose()
+        return self._pose[2]
+
+    @property
+    def window(self):
+        """Window calculated by the last *get_window* call, if valid."""
+        if not self._flags[_WINDOWED]:
+            return np.array([])
+        return self._window
+
     def local2global(self, offsets, K=None, image2cartesian=True):
         """Convert Triangle coordinates to the global coordinates system.
 
         The function performs 2 transformations:
 
-        * Obtains the 4-quadrant coordinates. The input is a coordinate 
-          for a 1-quadrant system, and the output corresponds to the 
+        * Obtains the 4-quadrant coordinates. The input is a coordinate
+          for a 1-quadrant system, and the output corresponds to the
           4-quadrant system.
         * Move y-axis origin. Initially, for a given image the origin
-          is placed at its top. However, for the used system the origin 
+          is placed at its top. However, for the used system the origin
           is placed at the middle of the 4 quadrants.
 
         If indicated, the coordinates system will be transformed to the
         cartesian one. This is recommended, as the image system does not
         make sense for a space with origin in the middle.
 
-        Only absolute coordinates shall be transformed. Lengths and 
+        Only absolute coordinates shall be transformed. Lengths and
         angles are invariant to the coordinates origin.
 
-        Finally, a scale ratio *K* will be applied to the coordinates. 
+        Finally, a scale ratio *K* will be applied to the coordinates.
         The coordinates will be directly multiplied by the ratio.
 
+        The record is converted in place, including the pose if it was
+        calculated.
+
         :param offsets: column and row offsets between the local and the
           global systems.
         :type offsets: list[int, int]
         :param K: Scale ratio to be applied to the points coordinates.
         :type K: positive int or float
-        :param bool image2cartesian: If True, a conversion from image 
-         coordinate system to cartesian system is performed. Thus, the 
+        :param bool image2cartesian: If True, a conversion from image
+         coordinate system to cartesian system is performed. Thus, the
          output will be of the form of [x,y] instead of [row,column].
         :raises ValueError: if the scale ratio is negative.
         """
-        if self.isglobal:
-            return
-        # Assess K and assign value to 'scale' attribute if it is valid.
-        if K is None:
-            K = self._scale
-        elif K <= 0:
-            raise ValueError("The scale ratio K must be greater than 0")
-        else:
-            self._scale = K
-        self.vertices[:,0] = offsets[0] - self.vertices[:,0]
-        self.vertices[:,1] -= offsets[1]
-        self.vertices *= self._scale
-        self.barycenter[0] = offsets[0] - self.barycenter[0]
-        self.barycenter[1] -= offsets[1]
-        self.barycenter *= self._scale
-        # If the pose was not previously calculated,
-        # a ValueError is caught and ignored.
-        try:
-            self.midpoint[0] = offsets[0] - self.midpoint[0]
-            self.midpoint[1] -= offsets[1]
-            self.midpoint *= self._scale
-        except IndexError:
-            pass
-        if image2cartesian:
-            # Convert the vertices coordinates
-            tmp = np.copy(self.vertices[:,0])
-            self.vertices[:,0] = self.vertices[:,1]
-            self.vertices[:,1] = tmp
-            # Convert the barycenter coordinates
-            tmp = np.copy(self.barycenter[0])
-            self.barycenter[0] = self.barycenter[1]
-            self.barycenter[1] = tmp
-            # Convert the midpoint coordinates
-            try:
-                tmp = np.copy(self.midpoint[0])
-                self.midpoint[0] = self.midpoint[1]
-                self.midpoint[1] = tmp
-            except IndexError:
-                pass
-            self.cartesian = True
-        self.isglobal = True
+        self._convert(offsets, K, image2cartesian, True)
 
     def global2local(self, offsets, K=None, cartesian2image=True):
         """Convert Triangle coordinates to the local coordinates system.
-        
-        Only absolute coordinates shall be transformed. Lengths and 
+
+        Only absolute coordinates shall be transformed. Lengths and
         angles are invariant to the coordinate origin.
-    
+
         :param offsets: column and row offsets between the local and the
           global systems.
         :type offsets: list[int, int]
         :param K: Scale ratio to be applied to the points coordinates.
         :type K: positive int or float
-        :param bool cartesian2image: If True, a conversion from 
-         cartesian coordinates system to image system is performed. 
-         Thus, the  output will be of the form of [row,column] instead 
+        :param bool cartesian2image: If True, a conversion from
+         cartesian coordinates system to image system is performed.
+         Thus, the  output will be of the form of [row,column] instead
          of [x,y].
-        :raises ValueError: if the scale ratio is negative.         
+        :raises ValueError: if the scale ratio is negative.
         """
-        if not self.isglobal:
+        self._convert(offsets, K, cartesian2image, False)
+
+    def _convert(self, offsets, K, swap, to_global):
+        """Convert the record between the local and global systems."""
+        flags = self._flags
+        if flags[_GLOBAL] == to_global:
             return
-        # Assess K and assign value to 'scale' attribute if it is valid.
-        if K is None:
-            K = self._scale
-        elif K <= 0:
-            raise ValueError("The scale ratio K must be greater than 0")
+        scale = self._records['scale']
+        # Assess K and assign value to the 'scale' field if it is valid.
+        if K is not None:
+            if K <= 0:
+                raise ValueError("The scale ratio K must be greater than 0")
+            scale[0] = K
+        # Convert the vertices, the barycenter and the base midpoint.
+        _convert_points(self._points, offsets, scale[0], swap, to_global)
+        if to_global:
+            self._sides *= scale[0]
         else:
-            self._scale = K
-        if cartesian2image:
-            # Convert the vertices coordinates
-            tmp = np.copy(self.vertices[:,0])
-            self.vertices[:,0] = self.vertices[:,1]
-            self.vertices[:,1] = tmp
-            # Convert the barycenter coordinates
-            tmp = np.copy(self.barycenter[0])
-            self.barycenter[0] = self.barycenter[1]
-            self.barycenter[1] = tmp
-            # Convert the midpoint coordinates
-            try:
-                tmp = np.copy(self.midpoint[0])
-                self.midpoint[0] = self.midpoint[1]
-                self.midpoint[1] = tmp
-            except IndexError:
-                pass
-            self.cartesian = False
-        self.vertices /= self._scale
-        self.vertices[:,0] = offsets[0] - self.vertices[:,0]
-        self.vertices[:,1] += offsets[1]
-        self.barycenter /= self._scale
-        self.barycenter[0] = offsets[0] - self.barycenter[0]
-        self.barycenter[1] += offsets[1]
-        # If the pose was not previously calculated,
-        # a ValueError is catched and ignored.
-        try:
-            self.midpoint /= self._scale
-            self.midpoint[0] = offsets[0] - self.midpoint[0]
-            self.midpoint[1] += offsets[1]
-        except IndexError:
-            pass
-        self.isglobal = False
+            self._sides /= scale[0]
+        if swap:
+            # The angle is invariant to the conversion.
+            flags[_CARTESIAN] = to_global
+        else:
+            flags[_POSED] = False
+        flags[_WINDOWED] = False
+        flags[_GLOBAL] = to_global
 
     def get_pose(self):
         """Return triangle's angle and base midpoint, given its vertices.
 
         The coordinates of 3 vertices defining the triangle are used,
         packed in a single 3x2 array. This method assumes that the
-        triangle is isosceles and the 2 equal sides are bigger than 
+        triangle is isosceles and the 2 equal sides are bigger than
         the different one, called base.
 
-        The following attributes are updated:
+        The pose is calculated only once, until the vertices change.
+        Besides, the following attributes are available:
 
         * self.sides : array containing the lengths of the 3 sides.
         * self.base_index : array index of the minor side. This is also
           the index of the vertex between the 2 mayor sides, as vertices
           indexes are the indexes of their opposite sides.
 
-        :return: [X,Y] coordinate of 
-         the midpoint of the triangle's base side and orientation angle 
-         of the triangle. It is the resulting angle between the 
-         horizontal axis and the segment that goes from the triangle's 
-         midpoint to the frontal vertex. It is expressed in radians, in 
+        :return: [X,Y] coordinate of
+         the midpoint of the triangle's base side and orientation angle
+         of the triangle. It is the resulting angle between the
+         horizontal axis and the segment that goes from the triangle's
+         midpoint to the frontal vertex. It is expressed in radians, in
          the range [-pi, pi].
         :rtype: float32, float32, float32
         """
-        vertices = self.vertices.astype(np.float32)
+        pose = self._pose
+        if self._flags[_POSED]:
+            return pose[0], pose[1], pose[2]
+        vertices = self._vertices
+        sides = self._sides
         # Calculate the length of the sides i.e. the Euclidean distance
-        self.sides[0] = np.linalg.norm(vertices[2] - vertices[1])
-        self.sides[1] = np.linalg.norm(vertices[0] - vertices[2])
-        self.sides[2] = np.linalg.norm(vertices[1] - vertices[0])
+        sides[0] = np.linalg.norm(vertices[2] - vertices[1])
+        sides[1] = np.linalg.norm(vertices[0] - vertices[2])
+        sides[2] = np.linalg.norm(vertices[1] - vertices[0])
         # If 2 sides are equal, the common vertex is the front one and
         # The base midpoint is calculated with the other 2.
-        self.base_index = np.argmin(self.sides)
-        self.midpoint = (vertices[self.base_index-1]
-                         + vertices[self.base_index-2]) / 2
+        base_index = np.argmin(sides)
+        self._records['base_index'] = base_index
+        pose[:2] = (vertices[base_index-1] + vertices[base_index-2]) / 2
         # Calculus of the x and y distance between the midpoint and the vertex
         # opposite to the base side.
-        if self.cartesian:
-            x, y = vertices[self.base_index] - self.midpoint
+        if self._flags[_CARTESIAN]:
+            x, y = vertices[base_index] - pose[:2]
         else:
             # The array 'y'(rows) counts downwards, contrary to cartesian system
-            row, col = vertices[self.base_index] - self.midpoint
+            row, col = vertices[base_index] - pose[:2]
             x, y = col, -row
-        self.angle = np.arctan2(y, x)
-        return self.midpoint[0], self.midpoint[1], self.angle
+        pose[2] = np.arctan2(y, x)
+        self._flags[_POSED] = True
+        return pose[0], pose[1], pose[2]
 
     def get_window(self, min_value, max_value, k=1.25):
         """Get the coordinates of a rectangle window around the triangle.
-        
-        At first, the barycenter of the triangle is calculated. Then, 
-        the window is calculated as a square, being its sides' length  
-        *k* times the triangle's longest side length and being its 
-        center the triangle's barycenter. The output is stored in the 
+
+        At first, the barycenter of the triangle is calculated. Then,
+        the window is calculated as a square, being its sides' length
+        *k* times the triangle's longest side length and being its
+        center the triangle's barycenter. The output is stored in the
         *self.window* variable
 
-        :param min_value: value or values of the minimum allowed 
+        :param min_value: value or values of the minimum allowed
          coordinates.
-        :param max_value: value or values of the maximum allowed 
+        :param max_value: value or values of the maximum allowed
          coordinates.
-        :param k: relative size between the window and the triangle 
-         base. It should be bigger than 1. As bigger as it gets, the 
+        :param k: relative size between the window and the triangle
+         base. It should be bigger than 1. As bigger as it gets, the
          bigger the window will be.
         :type min_value: int or np.array[int,int]
         :type max_value: int or np.array[int,int]
         :type k: int or float
-        :return: array representing a square parallel to the horizontal 
+        :return: array representing a square parallel to the horizontal
          coordinates axe. The first row contains the X and Y minimum
-         values of the square, and the second row contains its X and Y 
+         values of the square, and the second row contains its X and Y
          maximum values.
         :rtype: 2x2 np.array
         """
-        distance = self.sides.max() * k
-        window = np.array([self.barycenter - distance,
-                           self.barycenter + distance])
-        # Create 2 arrays of booleans: the first indicating if any value in each
-        # axis is greater than max_value, and the second if any value in each
-        # axis is lower than min_value.
-        outbounds = [np.any(window - max_value > 0, axis=0),
-                     np.any(window - min_value < 0, axis=0)]
-        # Third condition array, when none of the previous ones is fulfilled.
-        inbounds = np.all(np.invert(outbounds), axis=0)
-        condlist = np.vstack([outbounds, inbounds])
-        # Subtract to each axis the greatest distance from one of its pixels
-        # to the maximum allowed. Idem for the minimum values.
-        max_clipped = window - np.max(window - max_value, axis=0)
-        min_clipped = window + np.max(min_value - window, axis=0)
-        choicelist = [max_clipped, min_clipped, window]
-        # Obtain the final array getting elements from each of the 3 values
-        # arrays, depending on the conditions values.
-        self.window = np.select(condlist, choicelist)
-        return self.window
+        args = (min_value, max_value, k)
+        if not (self._flags[_WINDOWED] and self._window_args is not None
+                and all(np.array_equal(new, old) for new, old
+                        in zip(args, self._window_args))):
+            self.get_pose()
+            self._window[...] = _get_windows(self._barycenter[np.newaxis],
+                                             self._sides.max(), *args)[0]
+            self._flags[_WINDOWED] = True
+            self._window_args = args
+        return self._window
 
     def homography(self, H):
         """Perform an homography operation to the Triangle vertices.
 
-        The homography is a geometrical transformation that obtains the 
-        projection of certain points from a plain to another. 
+        The homography is a geometrical transformation that obtains the
+        projection of certain points from a plain to another.
         *self.vertices* variable is updated
 
         :param H: Homography matrix.
         :type H: np.array(shape=3x3)
         :return: the new vertices coordinates values.
         """
-        points = np.copy(self.vertices)
-        # Loop for performing the homography to every 2-D vertex' coordinates.
-        for index, row in enumerate(points):
-            # Append '1' to the point vector and perform a matrix product with H
-            operand = np.hstack([row, 1])
-            product = np.dot(H, operand)
-            new_point = product[0:2] / product[2]
-            points[index] = new_point
-        self.vertices = np.copy(points)
-        return self.vertices
+        self.vertices = projection.project_points(self._vertices, H)
+        return self._vertices
 
     def inverse_homography(self, H):
         """Perform an inverse homography operation to the vertices.
 
-        Get :math:`X_u` from the equation 
-        :math:`(w \\cdot X) = H \\cdot Y`.
-
-        First of all, get :math:`\\frac{1}{w \\cdot Y}` using least 
-        squares method. Then, extracts :math:`\\frac{1}{w}` from the 
-        column matrix, with the hypothesis that :math:`Y_{11} = 1`.
+        Get :math:`Y` from the equation
+        :math:`(w \\cdot X) = H \\cdot Y`, i.e. apply the inverse of
+        the homography matrix to the vertices. The inverse is computed
+        only once for every matrix, see *projection.get_projection*.
 
         :param H: Homography matrix.
         :type H: np.array(shape=3x3)
         :return: the new vertices coordinates values.
         """
-        points = np.copy(self.vertices)
-        # Loop for performing the homography to every 2-D vertex' coordinates.
-        for index, row in enumerate(points):
-            # Append '1' to the point vector and perform a matrix product with H
-            operand = np.hstack([row, 1])
-            # Use least squares method to get Y from X=H.Y
-            product = np.linalg.lstsq(H, operand)[0]
-            new_point = product[0:2] / product[2]
-            points[index] = new_point
-        self.vertices = np.copy(points)
-        return self.vertices
+        self.vertices = projection.get_projection(H).backward(self._vertices)
+        return self._vertices
 
     def in_borders(self, limits, tolerance=150):
         """Evaluate if vertices are near a 4-sides polygon perimeter.
@@ -330,7 +384,8 @@ class Triangle(object):
         given 2-D space, defined by an irregular 4-sides polygon.
 
         :param limits: Array containing the coordinates of the 4 points
-         defining the borders of the polygon.
+         defining the borders of the polygon, or a *BorderRegion*. In
+         the latter case, the tolerance of the region is used.
         :param tolerance: Maximum allowed distance (mm) to the limits 
          to be considered within the borders region.
         :type limits: iterable of length 4
@@ -339,19 +394,79 @@ class Triangle(object):
          inside the given polygon
         :rtype: bool
         """
-        for index in range(len(limits)):
-            # Define a segment with 2 limit points of the quadrant.
-            seg = Segment(limits[index], limits[index - 1])
-            # Evaluate each vertex of the triangle.
-            for vertex in self.vertices:
-                # Get the distance in mm to the segment.
-                dist = seg.distance2point(vertex)
-                # Evaluate if the vertex is closer than the tolerance.
-                if dist < tolerance:
-                    return True
-        # If any of the vertices wasn't near to any of the segments
-        # return False.
-        return False
+        if not isinstance(limits, BorderRegion):
+            limits = BorderRegion(limits, tolerance)
+        return bool(limits.in_borders(self._vertices).any())
+
+
+class BorderRegion(object):
+    """Borders region of one or several 4-sides polygons.
+
+    A point is in the borders region of a polygon when its distance to
+    any of the polygon sides is less than the tolerance. The vectors and
+    lengths of the sides are calculated on instantiation, so that the
+    distances of many points to every polygon are evaluated at once.
+
+    The sides are the segments between each limit point and the previous
+    one, as in *Triangle.in_borders*.
+
+    :param limits: Array containing the coordinates of the 4 points
+     defining each polygon e.g. the space of each camera.
+    :type limits: np.array(shape=4x2) or np.array(shape=Cx4x2)
+    :param tolerance: Maximum allowed distance (mm) to the limits to be
+     considered within the borders region.
+    :type tolerance: int or float
+    """
+
+    def __init__(self, limits, tolerance=150):
+        """BorderRegion class constructor."""
+        self.limits = np.array(limits, dtype=np.float64).reshape(-1, 4, 2)
+        self.tolerance = tolerance
+        # Initial point of each side, vector to its final point, and its
+        # squared length.
+        self._starts = self.limits[:, np.newaxis]
+        self._vectors = np.roll(self.limits, 1, axis=1)[:, np.newaxis] \
+            - self._starts
+        self._squared_lengths = (self._vectors ** 2).sum(axis=-1)
+
+    def __len__(self):
+        return len(self.limits)
+
+    def distances(self, points):
+        """Get the distances of points to the perimeter of the polygons.
+
+        The distance to each side is the one to its point nearest to the
+        target point. It is obtained projecting the target point on the
+        side, and clipping the projection to the side ends.
+
+        :param points: coordinates of N points.
+        :type points: np.array(shape=Nx2)
+        :return: distance of each point to the perimeter of each polygon.
+        :rtype: np.array(shape=NxC)
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(1, -1, 1, 2)
+        relative = points - self._starts
+        # Relative position of the projection of the points on each side.
+        position = np.clip((relative * self._vectors).sum(axis=-1)
+                           / self._squared_lengths, 0, 1)
+        relative -= position[..., np.newaxis] * self._vectors
+        distances = np.sqrt((relative ** 2).sum(axis=-1)).min(axis=-1)
+        return distances.T
+
+    def in_borders(self, vertices):
+        """Evaluate if triangles are in the borders region of the polygons.
+
+        :param vertices: vertices coordinates of N triangles.
+        :type vertices: np.array(shape=Nx3x2)
+        :return: matrix whose element [n, c] is True if any vertex of the
+         Nth triangle is in the borders region of the Cth polygon.
+        :rtype: np.array(shape=NxC, dtype=bool)
+        """
+        vertices = np.asarray(vertices).reshape(-1, 3, 2)
+        distances = self.distances(vertices.reshape(-1, 2))
+        near = (distances < self.tolerance).reshape(len(vertices), 3,
+                                                    len(self.limits))
+        return near.any(axis=1)
 
 
 class Segment(object):
@@ -414,3 +529,237 @@ class Segment(object):
             # Pythagoras theorem for getting the leg of a right-angled triangle.
             distance = np.sqrt((vector2 ** 2).sum() - projection ** 2)
         return distance
+
+
+class TriangleBatch(object):
+    """Records of several triangles, transformed all at once.
+
+    The methods are equivalent to the *Triangle* ones, but every record
+    is processed with the same vectorized operations. The triangles
+    obtained by indexing or iterating the batch are views of its
+    records.
+
+    :param vertices: vertices coordinates of N triangles.
+    :type vertices: np.array(shape=Nx3x2)
+    :param bool isglobal: Flag that indicates if the coordinate system
+     refers to the 4-quadrant system (global).
+    :param bool cartesian: Flag that indicates if the coordinates are
+     referred to a cartesian system [x,y].
+    """
+
+    __slots__ = ('records',)
+
+    def __init__(self, vertices, isglobal=False, cartesian=False):
+        """TriangleBatch class constructor."""
+        self.records = _new_records(vertices, isglobal, cartesian)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.records)
+        if not 0 <= index < len(self.records):
+            raise IndexError("Triangle index out of range")
+        triangle = Triangle.__new__(Triangle)
+        triangle._bind(self.records[index:index+1])
+        return triangle
+
+    def __iter__(self):
+        for index in range(len(self.records)):
+            yield self[index]
+
+    @property
+    def vertices(self):
+        """Coordinates of the vertices, as a Nx3x2 float32 array."""
+        return self.records['vertices']
+
+    def local2global(self, offsets, K=None, image2cartesian=True):
+        """Convert the local triangles to the global coordinates system.
+
+        See *Triangle.local2global*.
+        """
+        _convert(self.records, offsets, K, image2cartesian, True)
+
+    def global2local(self, offsets, K=None, cartesian2image=True):
+        """Convert the global triangles to the local coordinates system.
+
+        See *Triangle.global2local*.
+        """
+        _convert(self.records, offsets, K, cartesian2image, False)
+
+    def get_poses(self):
+        """Get the poses of the triangles, see *Triangle.get_pose*.
+
+        :return: the [X, Y, angle] pose of each triangle.
+        :rtype: np.array(shape=Nx3)
+        """
+        _update_poses(self.records)
+        return self.records['pose']
+
+    def get_windows(self, min_value, max_value, k=1.25):
+        """Get the windows of the triangles, see *Triangle.get_window*.
+
+        :rtype: np.array(shape=Nx2x2)
+        """
+        _update_poses(self.records)
+        self.records['window'] = _get_windows(
+                self.records['barycenter'], self.records['sides'].max(axis=1),
+                min_value, max_value, k)
+        self.records['flags'][:, _WINDOWED] = True
+        return self.records['window']
+
+    def homography(self, H):
+        """Perform an homography operation to the vertices.
+
+        :param H: Homography matrix.
+        :type H: np.array(shape=3x3)
+        :return: the new vertices coordinates values.
+        """
+        _set_vertices(self.records,
+                      projection.project_points(self.vertices, H))
+        return self.vertices
+
+    def inverse_homography(self, H):
+        """Perform an inverse homography operation to the vertices.
+
+        :param H: Homography matrix.
+        :type H: np.array(shape=3x3)
+        :return: the new vertices coordinates values.
+        """
+        _set_vertices(self.records,
+                      projection.get_projection(H).backward(self.vertices))
+        return self.vertices
+
+
+def _new_records(vertices, isglobal, cartesian):
+    """Create the records of an array of triangles vertices."""
+    vertices = np.asarray(vertices, dtype=np.float32)
+    if not vertices.size:
+        vertices = vertices.reshape(0, 3, 2)
+    if vertices.ndim != 3 or vertices.shape[1:] != (3, 2):
+        raise ValueError("Expected arrays with 3 vertices")
+    records = np.zeros(len(vertices), dtype=TRIANGLE_DTYPE)
+    records['scale'] = 1
+    records['flags'][:, _GLOBAL] = isglobal
+    records['flags'][:, _CARTESIAN] = cartesian
+    _set_vertices(records, vertices)
+    return records
+
+
+def _set_vertices(records, vertices):
+    """Set the vertices of the records and invalidate the pose."""
+    records['vertices'] = vertices
+    # The barycenter X is equal to the sum of the X coordinates divided by 3
+    records['barycenter'] = records['vertices'].sum(axis=1) / 3
+    records['flags'][:, _POSED] = False
+    records['flags'][:, _WINDOWED] = False
+
+
+def _convert(records, offsets, K, swap, to_global):
+    """Convert the records between the local and global systems.
+
+    The records already in the target system are not modified.
+    """
+    flags = records['flags']
+    selected = flags[:, _GLOBAL] != to_global
+    if not selected.any():
+        return
+    # Assess K and assign value to the 'scale' field if it is valid.
+    if K is not None:
+        if K <= 0:
+            raise ValueError("The scale ratio K must be greater than 0")
+        records['scale'][selected] = K
+    scale = records['scale'][selected]
+    # Convert the vertices, the barycenter and the base midpoint.
+    points = records.view(_POINTS_DTYPE)['points']
+    values = points[selected]
+    _convert_points(values, offsets, scale[:, np.newaxis, np.newaxis], swap,
+                    to_global)
+    points[selected] = values
+    sides = records['sides'][selected]
+    if to_global:
+        sides *= scale[:, np.newaxis]
+    else:
+        sides /= scale[:, np.newaxis]
+    records['sides'][selected] = sides
+    if swap:
+        # The angle is invariant to the conversion.
+        flags[selected, _CARTESIAN] = to_global
+    else:
+        flags[selected, _POSED] = False
+    flags[selected, _WINDOWED] = False
+    flags[selected, _GLOBAL] = to_global
+
+
+def _convert_points(points, offsets, scale, swap, to_global):
+    """Convert in place points between the local and global systems.
+
+    :param points: coordinates of the points, in the last axis.
+    :param scale: scale ratio, broadcastable to the points.
+    """
+    if to_global:
+        points[..., 0] = offsets[0] - points[..., 0]
+        points[..., 1] -= offsets[1]
+        points *= scale
+        if swap:
+            points[...] = points[..., ::-1].copy()
+    else:
+        if swap:
+            points[...] = points[..., ::-1].copy()
+        points /= scale
+        points[..., 0] = offsets[0] - points[..., 0]
+        points[..., 1] += offsets[1]
+
+
+def _update_poses(records):
+    """Calculate the poses of the records whose pose is not valid."""
+    flags = records['flags']
+    selected = ~flags[:, _POSED]
+    if not selected.any():
+        return
+    vertices = records['vertices'][selected]
+    # Calculate the length of the sides i.e. the Euclidean distance
+    sides = np.sqrt(((vertices[:, [2, 0, 1]] - vertices[:, [1, 2, 0]]) ** 2)
+                    .sum(axis=2))
+    # If 2 sides are equal, the common vertex is the front one and
+    # The base midpoint is calculated with the other 2.
+    base_index = sides.argmin(axis=1)
+    rows = np.arange(len(vertices))
+    pose = np.empty((len(vertices), 3), dtype=np.float32)
+    pose[:, :2] = (vertices[rows, base_index - 1]
+                   + vertices[rows, base_index - 2]) / 2
+    # Calculus of the x and y distance between the midpoint and the vertex
+    # opposite to the base side.
+    first, second = (vertices[rows, base_index] - pose[:, :2]).T
+    # The array 'y'(rows) counts downwards, contrary to cartesian system
+    cartesian = flags[selected, _CARTESIAN]
+    x = np.where(cartesian, first, second)
+    y = np.where(cartesian, second, -first)
+    pose[:, 2] = np.arctan2(y, x)
+    records['sides'][selected] = sides
+    records['base_index'][selected] = base_index
+    records['pose'][selected] = pose
+    flags[selected, _POSED] = True
+
+
+def _get_windows(barycenters, lengths, min_value, max_value, k):
+    """Calculate the windows around triangles, see *Triangle.get_window*.
+
+    :param barycenters: barycenters of N triangles.
+    :type barycenters: np.array(shape=Nx2)
+    :param lengths: longest side of each triangle.
+    :return: the windows of the triangles.
+    :rtype: np.array(shape=Nx2x2)
+    """
+    distance = np.reshape(lengths, (-1, 1)) * k
+    windows = np.stack([barycenters - distance, barycenters + distance],
+                       axis=1)
+    # Subtract to each axis the greatest distance from one of its pixels
+    # to the maximum allowed. Otherwise, add the greatest distance from
+    # the minimum allowed.
+    over = (windows - max_value).max(axis=1)
+    under = (min_value - windows).max(axis=1)
+    windows -= np.where(over > 0, over, 0)[:, np.newaxis]
+    windows += np.where((over <= 0) & (under > 0), under, 0)[:, np.newaxis]
+    return windows
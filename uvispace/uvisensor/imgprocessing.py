@@ -37,7 +37,6 @@ import sys
 import cv2
 import numpy as np
 import skimage.measure
-import skimage.morphology
 # Local libraries
 import geometry
 
@@ -50,6 +49,14 @@ except ImportError:
              "set. Run the environment .sh script at the project root folder.")
 logger = logging.getLogger("sensor")
 
+# Bit position of each color component in the thresholds registers.
+_COMPONENT_SHIFTS = {'red': 20, 'green': 10, 'blue': 0}
+# Distortion models, indexed by their (kx, ky, shape) parameters.
+_DISTORTION_MODELS = {}
+# Prefilters of the contours candidates to be triangles.
+MIN_TRIANGLE_AREA = 8
+MAX_TRIANGLE_COMPACTNESS = 0.75
+
 
 class Image(object):
     """Class with image processing methods oriented to UGV detection.
@@ -57,68 +64,139 @@ class Image(object):
     :param np.array image: original grey scale image.   
     :param list contours: each element is an Mx2 array containing M 
      points defining a closed contour.
+    :param list rois: regions of interest where the shapes are expected
+     to be found, e.g. the windows of the last detected triangles. Each
+     element is a 2x2 array, whose first row contains the minimum row
+     and column of the region, and its second row the maximum ones.
+     There is one region per tracked UGV, before merging the
+     overlapping ones.
+
+    The detected triangles are stored in the *vertices* attribute, an
+    Nx3x2 array. The *triangles* attribute contains them as
+    *geometry.Triangle* instances, that are only created when accessed.
+    The *contour_indexes* attribute contains the index of the contour
+    of each triangle.
     """
 
-    def __init__(self, image, contours=[]):
+    def __init__(self, image, contours=[], rois=None):
         """
         Image class constructor. Set image and contours attributes.
         """
         self.image = image
         self._binarized = None
+        self.vertices = np.empty((0, 3, 2))
+        self.contour_indexes = np.empty(0, dtype=int)
         self.triangles = []
         self.contours = contours
+        self.rois = []
+        # Number of UGVs expected inside the regions of interest.
+        self.tracked = 0
+        if rois is not None:
+            self.set_rois(rois)
+
+    @property
+    def triangles(self):
+        """List of *geometry.Triangle* instances of the detected shapes.
+
+        The triangles are views of a single *geometry.TriangleBatch*.
+        """
+        if self._triangles is None:
+            self._triangles = list(geometry.TriangleBatch(self.vertices))
+        return self._triangles
+
+    @triangles.setter
+    def triangles(self, triangles):
+        self._triangles = triangles
+
+    def set_rois(self, rois):
+        """Set the regions of interest for the contours extraction.
+
+        Overlapping regions are merged into their bounding box, so that
+        a shape lying on both is only detected once. The regions are
+        rounded outwards to integer pixels and clipped to the image.
+
+        :param list rois: 2x2 arrays with the minimum and maximum row
+         and column of each region.
+        :return: the merged and clipped regions.
+        :rtype: list
+        """
+        max_coords = np.array(self.image.shape[:2]) - 1
+        windows = []
+        for roi in rois:
+            window = np.array(roi, dtype=np.float64)
+            window = np.vstack([np.floor(window[0]), np.ceil(window[1])])
+            windows.append(np.clip(window, 0, max_coords).astype(int))
+        self.tracked = len(windows)
+        self.rois = _merge_windows(windows)
+        return self.rois
+
+    def find_contours(self, level=200, full_frame=False):
+        """Get the contours of the shapes in the binarized image.
 
-    def binarize(self, thresholds):
+        The *Marching Cubes Algorithm* is only run inside the regions
+        of interest, unless there is none or *full_frame* is True.
+
+        :param float level: value along which the contours are found.
+        :param bool full_frame: if True, the regions of interest are
+         ignored and the whole image is scanned.
+        :return: each element is an Mx2 array containing M points of a
+         closed contour, in whole image coordinates.
+        :rtype: list
+        """
+        if full_frame or not self.rois:
+            return skimage.measure.find_contours(self._binarized, level)
+        max_coords = np.array(self._binarized.shape) - 1
+        contours = []
+        for window in self.rois:
+            (min_row, min_col), (max_row, max_col) = window
+            roi = self._binarized[min_row:max_row+1, min_col:max_col+1]
+            # Borders of the region that are not borders of the image.
+            inner_min = window[0] > 0
+            inner_max = window[1] < max_coords
+            for cnt in skimage.measure.find_contours(roi, level):
+                cnt += (min_row, min_col)
+                # Open contours end on the region borders. If it is not an
+                # image border, the shape is only partially seen. Discard it.
+                ends = cnt[[0, -1]]
+                if (not np.array_equal(ends[0], ends[1]) and
+                        (np.any((ends == window[0]) & inner_min) or
+                         np.any((ends == window[1]) & inner_max))):
+                    continue
+                contours.append(cnt)
+        return contours
+
+    def binarize(self, thresholds, binarizer=None):
         """Get a binarized image from a grey image given the thresholds.
-        
-        The input image can only have one dimension. This method is 
+
+        The input image can only have one dimension. This method is
         intended to work with 3-component threshold values stored in a
-        single 30-bit register:
-        
-            * *register[0 to 10]* : red component thresholds
-            * *register[10 to 20]* : green component thresholds
-            * *register[10 to 30]* : blue component thresholds
-            
-        The raw binary image contains a lot of noise. As it is very low
-        around the triangles, masks around them are used to get rid of 
-        the noise in the rest of the image.
-
-        :param [int or float, int or float] thresholds : minimum and 
-         maximum values between whom the image intensity values will be
-         accepted as 1 (rescaled to 255). Values greater than the 
-         maximum and smaller than the minimum will be truncated to 0.
-        
-        :return bin_image: Image of the same size as the input image 
-         with only 255 or 0 values (Equivalent to 1 and 0), according 
-         to the input threshold values.
+        single 30-bit register. See :func:`decode_thresholds` for the
+        register layout.
+
+        The heavy lifting is done by a :class:`Binarizer` instance. When
+        processing a video stream, the same *binarizer* should be passed
+        for every frame, so that the thresholds are only decoded when
+        they change and the work buffers are reused between frames.
+
+        :param [int, int] thresholds: minimum and maximum values of the
+         threshold registers. Pixels with intensity values between the
+         red component of both will be accepted as 1 (rescaled to 255).
+         Values greater than the maximum and smaller than the minimum
+         will be truncated to 0.
+        :param binarizer: engine used for the binarization. If None, a
+         new one is instantiated for the current image.
+        :type binarizer: Binarizer
+
+        :return bin_image: Image of the same size as the input image
+         with only 255 or 0 values (Equivalent to 1 and 0), according
+         to the input threshold values. It is a buffer owned by the
+         binarizer, and it is overwritten on its next call.
         :rtype: binary numpy.array(shape=MxN)
         """
-        # Obtain the thresholds in base 2 and get the red component slice.
-        th_min = bin(thresholds[0])
-        th_max = bin(thresholds[1])
-        red_c = (th_min[-30:-20], th_max[-30:-20])
-        # Why is it necessary to divide by 4??
-        thr_min = int(red_c[0], 2) / 4
-        thr_max = int(red_c[1], 2) / 4
-        logger.debug("Thresholding between {} and {}"
-                     .format(thr_min, thr_max))
-        # The first binary approach is obtained evaluating 2 thresholds
-        raw_binarized = cv2.inRange(self.image, thr_min, thr_max)
-        # A simple erosion gets rid of the whole noise. Dilating the eroded
-        # image several times provides an acceptable ROI for the binary mask.
-        kernel = np.ones((5, 5), np.uint8)
-        erosion = cv2.erode(raw_binarized, kernel, iterations=1)
-        kernel = np.ones((5, 5), np.uint8)
-        dilate = cv2.dilate(erosion, kernel, iterations=5)
-        mask = dilate / 255
-        filtered = raw_binarized * mask
-        # Eliminate holes inside the detected shapes
-        labels = skimage.morphology.label(filtered)
-        label_count = np.bincount(labels.ravel())
-        # Detect the background pixels, assuming they are majority in the image.
-        background = np.argmax(label_count)
-        self._binarized = filtered
-        self._binarized[labels != background] = 255
+        if binarizer is None:
+            binarizer = Binarizer(self.image.shape)
+        binarizer.set_thresholds(thresholds)
+        self._binarized = binarizer.binarize(self.image)
         logger.debug("Image binarization finished")
         return self._binarized
 
@@ -138,27 +216,30 @@ class Image(object):
 
            r  &= [(X_d - C_x)^2 + (Y_d - C_y)^2] / [(C_x^2 + C_y^2) * 2]
         
+        The correction is done by a :class:`DistortionModel`, shared by
+        all the images with the same parameters and shape. Thus, the
+        contours and the whole image corrections are consistent.
+
+        When the whole image is corrected, *self.image* and the binarized
+        image (if any) are replaced by their undistorted versions.
+
         :param float kx: X-Axe Distortion coefficient of the lens.
         :param float ky: Y-Axe Distortion coefficient of the lens.
         :param bool only_contours: Specify if the correction is to be 
          applied to the whole image or only to the contours.
         """
-        # Calculate the image center as the middle point of the width and height
-        center = np.array(self.image.shape) / 2
+        model = get_distortion_model(kx, ky, self.image.shape)
         # If contours is an empty list, algorithm is not outperformed.
         if only_contours and self.contours:
-            for index, cnt in enumerate(self.contours):
-                distance = cnt - center
-                # Calculate the r distance. First numerator and then denominator
-                r = (distance ** 2).sum(axis=1).astype(np.float)
-                r /= (center ** 2).sum() * 2
-                coeffs = np.array([r*ky, r*kx]).transpose() + 1
-                corrected = distance * coeffs + center
-                self.contours[index] = corrected
+            self.contours = model.correct_contours(self.contours)
         elif not only_contours:
-            pass
+            self.image = model.correct_image(self.image)
+            if self._binarized is not None:
+                # Nearest neighbour interpolation keeps the image binary.
+                self._binarized = model.correct_image(
+                        self._binarized, interpolation=cv2.INTER_NEAREST)
 
-    def get_shapes(self, tolerance=8, get_contours=True):
+    def get_shapes(self, tolerance=8, get_contours=True, full_frame=False):
         """Get the shapes' vertices in the binarized image.
 
         Update the *self.triangles* attribute.
@@ -179,31 +260,424 @@ class Image(object):
          Algorithm* is applied to the binarized image. Specifically set 
          to False when the binarization algorithm is implemented in the 
          external device (i.e. the FPGA).
+        :param bool full_frame: if True, the regions of interest are
+         ignored and the whole image is scanned.
         :return: vertices of the N shapes detected on the
          image. each element contains an Mx2 *np.rray* with the 
          coordinates of the M vertices of the shape.
         :rtype: list
         """
+        self.get_vertices(tolerance, get_contours, full_frame)
+        return self.triangles
+
+    def get_vertices(self, tolerance=8, get_contours=True, full_frame=False):
+        """Get the vertices of the triangles in the binarized image.
+
+        Equivalent to *get_shapes*, but the *geometry.Triangle* instances
+        are not created.
+
+        When regions of interest are set, the contours are only looked
+        for inside them. If less triangles than tracked UGVs are found,
+        it is assumed that an UGV was lost, and the whole image is
+        scanned. The UGVs entering the image are not found inside the
+        regions, so the caller has to request a full frame scan
+        periodically.
+
+        :param float tolerance: tolerance of the polygon approximation.
+        :param bool get_contours: specify if the contours have to be
+         obtained from the binarized image.
+        :param bool full_frame: if True, the regions of interest are
+         ignored and the whole image is scanned.
+        :return: vertices of the N triangles detected on the image.
+        :rtype: numpy.array(shape=Nx3x2)
+        """
         logger.debug("Getting the shapes' vertices in the image")
         # Obtain a list with all the contours in the image, separating each
         # shape in a different element of the list
         if get_contours:
-            self.contours = skimage.measure.find_contours(self._binarized, 200)
-        self.triangles = []
-        # Get the vertices of each shape in the image.
-        for cnt in self.contours:
-            coords = skimage.measure.approximate_polygon(cnt, tolerance)
-            max_coords = np.array(self.image.shape) - 1
-            # Sometimes, the initial vertex is repeatead at the end.
-            # Thus, if len is 3 and vertex is NOT repeated, it is a triangle
-            if len(coords) == 3 and (not np.array_equal(coords[0], coords[-1])):
-                triangle = geometry.Triangle(
-                        np.clip(coords, [0,0], max_coords))
-                self.triangles.append(triangle)
-            # If len is 4 and vertex IS repeated, it is a triangle
-            if len(coords) == 4 and np.array_equal(coords[0], coords[-1]):
-                triangle = geometry.Triangle(np.clip(coords[1:],
-                                                     [0,0], max_coords))
-                self.triangles.append(triangle)
-            logger.debug("A {}-vertices shape was found".format(len(coords)))
-        return self.triangles
+            self.contours = self.find_contours(full_frame=full_frame)
+        max_coords = np.array(self.image.shape[:2]) - 1
+        self.vertices, self.contour_indexes = classify_triangles(
+                self.contours, max_coords, tolerance, return_indexes=True)
+        # Merged regions may hide the loss of one of their UGVs, so the
+        # triangles are compared with the number of tracked UGVs.
+        if (get_contours and not full_frame and self.rois
+                and len(self.vertices) < self.tracked):
+            logger.debug("UGV lost inside the ROIs. Scanning the whole image")
+            self.contours = self.find_contours(full_frame=True)
+            self.vertices, self.contour_indexes = classify_triangles(
+                    self.contours, max_coords, tolerance, return_indexes=True)
+        # The Triangle instances will be created on demand.
+        self.triangles = None
+        return self.vertices
+
+
+def classify_triangles(contours, max_coords, tolerance=8,
+                       min_area=MIN_TRIANGLE_AREA,
+                       max_compactness=MAX_TRIANGLE_COMPACTNESS,
+                       return_indexes=False):
+    """Get the vertices of the contours that approximate a triangle.
+
+    The area and perimeter of all the contours are obtained at once.
+    Only the contours big enough and not too compact (a triangle is far
+    from being round, unlike reflections) are approximated with the
+    *Ramer-Douglas-Peucker Algorithm*, whose result is a triangle if it
+    has 3 vertices.
+
+    The compactness is the isoperimetric quotient,
+    :math:`4 \\pi A / P^2`. It is 1 for a circle, and at most 0.6 for a
+    triangle, with the equilateral one.
+
+    :param list contours: each element is an Mx2 array containing M
+     points defining a contour.
+    :param max_coords: maximum allowed [row, column] coordinates. The
+     vertices are clipped between 0 and these values.
+    :type max_coords: numpy.array[int, int]
+    :param float tolerance: tolerance of the polygon approximation.
+    :param float min_area: minimum area, in pixels, of the candidates.
+    :param float max_compactness: maximum compactness of the candidates.
+    :param bool return_indexes: if True, the indexes of the contours of
+     the triangles are returned as well.
+    :return: vertices of the N triangles found, and optionally the
+     index of the contour of each one.
+    :rtype: numpy.array(shape=Nx3x2) or (numpy.array(shape=Nx3x2),
+     numpy.array(shape=N))
+    """
+    # Original index of each one of the contours that are not empty.
+    nonempty = [index for index, cnt in enumerate(contours) if len(cnt)]
+    contours = [contours[index] for index in nonempty]
+    vertices = []
+    indexes = []
+    if not contours:
+        return _triangles_output(vertices, indexes, max_coords,
+                                 return_indexes)
+    lengths = np.array([len(cnt) for cnt in contours])
+    starts = np.zeros(len(contours), dtype=int)
+    starts[1:] = np.cumsum(lengths)[:-1]
+    points = np.concatenate(contours).astype(np.float64, copy=False)
+    # Index of the following point of each one, closing every contour.
+    following = np.arange(1, len(points) + 1)
+    following[starts + lengths - 1] = starts
+    segments = points[following] - points
+    # Shoelace formula for the area, and sum of the segments perimeter.
+    cross = points[:, 0] * segments[:, 1] - points[:, 1] * segments[:, 0]
+    areas = np.abs(np.add.reduceat(cross, starts)) / 2
+    perimeters = np.add.reduceat(np.hypot(segments[:, 0], segments[:, 1]),
+                                 starts)
+    candidates = areas >= min_area
+    candidates[candidates] = (4 * np.pi * areas[candidates]
+                              / perimeters[candidates] ** 2) <= max_compactness
+    logger.debug("{} of {} contours discarded before the polygon "
+                 "approximation".format(len(contours) - candidates.sum(),
+                                        len(contours)))
+    # Get the vertices of each candidate shape in the image.
+    for index in np.flatnonzero(candidates):
+        coords = skimage.measure.approximate_polygon(contours[index],
+                                                     tolerance)
+        # Sometimes, the initial vertex is repeatead at the end.
+        # Thus, if len is 3 and vertex is NOT repeated, it is a triangle
+        if len(coords) == 3 and (not np.array_equal(coords[0], coords[-1])):
+            vertices.append(coords)
+            indexes.append(nonempty[index])
+        # If len is 4 and vertex IS repeated, it is a triangle
+        if len(coords) == 4 and np.array_equal(coords[0], coords[-1]):
+            vertices.append(coords[1:])
+            indexes.append(nonempty[index])
+        logger.debug("A {}-vertices shape was found".format(len(coords)))
+    return _triangles_output(vertices, indexes, max_coords, return_indexes)
+
+
+def _triangles_output(vertices, indexes, max_coords, return_indexes):
+    """Format the output of *classify_triangles*."""
+    if vertices:
+        vertices = np.clip(np.array(vertices, dtype=np.float64), 0,
+                           max_coords)
+    else:
+        vertices = np.empty((0, 3, 2))
+    if return_indexes:
+        return vertices, np.array(indexes, dtype=int)
+    return vertices
+
+
+def _merge_windows(windows):
+    """Merge the overlapping windows into their bounding boxes.
+
+    :param list windows: 2x2 arrays with the minimum and maximum
+     coordinates of each window.
+    :return: windows with no overlap between them.
+    :rtype: list
+    """
+    merged = []
+    for window in windows:
+        window = window.copy()
+        # Absorb every merged window overlapping with the current one. The
+        # grown window may overlap with previously absorbed ones, so the
+        # scan is repeated until there are no more changes.
+        overlap = True
+        while overlap:
+            overlap = False
+            for index, other in enumerate(merged):
+                if (np.all(window[0] <= other[1])
+                        and np.all(other[0] <= window[1])):
+                    window[0] = np.minimum(window[0], other[0])
+                    window[1] = np.maximum(window[1], other[1])
+                    del merged[index]
+                    overlap = True
+                    break
+        merged.append(window)
+    return merged
+
+
+def get_distortion_model(kx, ky, shape):
+    """Get the distortion model for the given parameters and shape.
+
+    The models are cached, so their correction maps are only computed
+    once for every (kx, ky, shape) combination.
+
+    :param float kx: X-Axe Distortion coefficient of the lens.
+    :param float ky: Y-Axe Distortion coefficient of the lens.
+    :param shape: shape of the images. Only the rows and columns are
+     considered.
+    :return: the model for the given parameters.
+    :rtype: DistortionModel
+    """
+    key = (kx, ky, tuple(shape[:2]))
+    try:
+        model = _DISTORTION_MODELS[key]
+    except KeyError:
+        model = DistortionModel(*key)
+        _DISTORTION_MODELS[key] = model
+    return model
+
+
+def decode_thresholds(thresholds, component='red'):
+    """Extract a color component from the FPGA thresholds registers.
+
+    Each threshold register packs the values of the 3 color components
+    in a single 30-bit word, with 10 bits per component:
+
+        * *register[20 to 30]* : red component threshold
+        * *register[10 to 20]* : green component threshold
+        * *register[0 to 10]* : blue component threshold
+
+    The FPGA works with 10-bit pixel intensities, while the grey images
+    sent to the host have 8 bits per pixel. Thus, the component values
+    are divided by 4 in order to fit the grey scale range.
+
+    :param [int, int] thresholds: minimum and maximum registers.
+    :param str component: 'red', 'green' or 'blue'.
+    :return: minimum and maximum 8-bit thresholds of the component.
+    :rtype: (int, int)
+    :raises KeyError: if the component is not valid.
+    """
+    shift = _COMPONENT_SHIFTS[component]
+    th_min = ((int(thresholds[0]) >> shift) & 0x3FF) >> 2
+    th_max = ((int(thresholds[1]) >> shift) & 0x3FF) >> 2
+    return th_min, th_max
+
+
+class Binarizer(object):
+    """Binarization engine for a stream of equally shaped grey images.
+
+    All the intermediate images are stored in uint8 buffers that are
+    allocated when the first frame arrives, and reused afterwards. The
+    thresholds are only decoded when a new configuration is set.
+
+    The binarization consists of the following stages:
+
+    * A raw binary image is obtained evaluating the 2 thresholds.
+    * The raw image contains a lot of noise. As it is very low around
+      the triangles, an erosion gets rid of the whole noise, and
+      dilating the eroded image several times provides a mask around
+      the triangles that is applied to the raw image.
+    * The holes inside the detected shapes are filled. The background
+      connected to the image borders is flood filled, and the pixels
+      that remain unfilled are the holes.
+
+    :param shape: rows and columns of the images to be binarized.
+    :type shape: (int, int)
+    :param int kernel_size: side length of the morphological kernel.
+    :param int iterations: number of dilations applied for the mask.
+    """
+
+    def __init__(self, shape=None, kernel_size=5, iterations=5):
+        """Binarizer class constructor. Allocate work buffers."""
+        self._kernel = np.ones((kernel_size, kernel_size), np.uint8)
+        self._iterations = iterations
+        self._thresholds = None
+        self.th_min = 0
+        self.th_max = 0
+        self.shape = None
+        if shape is not None:
+            self._allocate(shape)
+
+    def _allocate(self, shape):
+        """Allocate the work buffers for images of the given shape."""
+        rows, cols = shape[0], shape[1]
+        self.shape = (rows, cols)
+        self._raw = np.zeros(self.shape, np.uint8)
+        self._eroded = np.zeros(self.shape, np.uint8)
+        self._mask = np.zeros(self.shape, np.uint8)
+        self._holes = np.zeros(self.shape, np.uint8)
+        self._output = np.zeros(self.shape, np.uint8)
+        # The flood fill buffer has a 1-pixel frame of background pixels,
+        # so the whole background is connected to the seed point.
+        self._flood = np.zeros((rows + 2, cols + 2), np.uint8)
+        self._flood_inner = self._flood[1:-1, 1:-1]
+
+    def set_thresholds(self, thresholds):
+        """Decode the thresholds registers, if they changed.
+
+        :param [int, int] thresholds: minimum and maximum registers.
+        """
+        thresholds = tuple(thresholds)
+        if thresholds == self._thresholds:
+            return
+        self.th_min, self.th_max = decode_thresholds(thresholds)
+        self._thresholds = thresholds
+        logger.debug("Thresholding between {} and {}"
+                     .format(self.th_min, self.th_max))
+
+    def binarize(self, image):
+        """Binarize a grey image with the current thresholds.
+
+        :param image: grey scale image.
+        :type image: numpy.array(shape=MxN, dtype=uint8)
+        :return: binary image with only 255 or 0 values. It is an
+         internal buffer, that is overwritten on the next call.
+        :rtype: numpy.array(shape=MxN, dtype=uint8)
+        """
+        if self.shape != image.shape[:2]:
+            self._allocate(image.shape)
+        cv2.inRange(image, self.th_min, self.th_max, dst=self._raw)
+        cv2.erode(self._raw, self._kernel, dst=self._eroded, iterations=1)
+        cv2.dilate(self._eroded, self._kernel, dst=self._mask,
+                   iterations=self._iterations)
+        cv2.bitwise_and(self._raw, self._mask, dst=self._output)
+        # Flood the background from the frame, and restore the frame after.
+        self._flood_inner[...] = self._output
+        cv2.floodFill(self._flood, None, (0, 0), 255)
+        self._flood[0, :] = 0
+        self._flood[-1, :] = 0
+        self._flood[:, 0] = 0
+        self._flood[:, -1] = 0
+        # Not flooded pixels are either shapes or holes inside them.
+        cv2.bitwise_not(self._flood_inner, dst=self._holes)
+        cv2.bitwise_or(self._output, self._holes, dst=self._output)
+        return self._output
+
+
+class DistortionModel(object):
+    """Barrel distortion model of a camera lens.
+
+    The model follows the equations of *Image.correct_distortion*. The
+    constants of the equations are computed on instantiation. The maps
+    for correcting whole images are computed the first time they are
+    needed, and reused afterwards.
+
+    The maps are obtained inverting the correction equations, as the
+    value of every undistorted pixel is taken from its distorted
+    position. The inversion is solved with fixed-point iterations, that
+    converge fast as the distortion coefficients are small.
+
+    :param float kx: X-Axe Distortion coefficient of the lens.
+    :param float ky: Y-Axe Distortion coefficient of the lens.
+    :param shape: rows and columns of the images.
+    :type shape: (int, int)
+    """
+
+    def __init__(self, kx, ky, shape):
+        """DistortionModel class constructor."""
+        self.kx = kx
+        self.ky = ky
+        self.shape = tuple(shape[:2])
+        # The image center is the middle point of the width and height.
+        self.center = np.array(self.shape) // 2
+        self._r_denominator = float((self.center ** 2).sum() * 2)
+        # Coefficients of the [row, column] coordinates.
+        self._coeffs = np.array([ky, kx]) / self._r_denominator
+        self._maps = None
+
+    def correct_points(self, points):
+        """Get the undistorted coordinates of an array of points.
+
+        :param points: [row, column] coordinates of N points.
+        :type points: numpy.array(shape=Nx2)
+        :return: undistorted coordinates of the points.
+        :rtype: numpy.array(shape=Nx2)
+        """
+        distance = points - self.center
+        r = (distance ** 2).sum(axis=1).reshape(-1, 1)
+        return distance * (r * self._coeffs + 1) + self.center
+
+    def correct_contours(self, contours):
+        """Get the undistorted coordinates of several contours at once.
+
+        The contours are concatenated into a single buffer, that is
+        corrected in place with one vectorized pass. The output contours
+        are views of that buffer.
+
+        :param list contours: each element is an Mx2 array containing
+         the [row, column] coordinates of M points.
+        :return: undistorted contours, in the same order.
+        :rtype: list
+        """
+        if not len(contours):
+            return []
+        points = np.concatenate(contours).astype(np.float64, copy=False)
+        # The concatenation is already a copy, so it can be used as buffer.
+        points -= self.center
+        r = np.einsum('ij,ij->i', points, points).reshape(-1, 1)
+        factors = r * self._coeffs
+        factors += 1
+        points *= factors
+        points += self.center
+        corrected = []
+        start = 0
+        for cnt in contours:
+            stop = start + len(cnt)
+            corrected.append(points[start:stop])
+            start = stop
+        return corrected
+
+    def get_maps(self, iterations=20, precision=0.01):
+        """Get the maps for undistorting whole images with *cv2.remap*.
+
+        :param int iterations: maximum number of fixed-point iterations.
+        :param float precision: maximum coordinates change, in pixels,
+         for considering the iterations converged.
+        :return: maps in the fixed-point format of *cv2.remap*.
+        :rtype: (numpy.array, numpy.array)
+        """
+        if self._maps is not None:
+            return self._maps
+        undistorted = np.indices(self.shape, np.float64)
+        undistorted -= self.center.reshape(2, 1, 1)
+        distorted = undistorted.copy()
+        coeffs = self._coeffs.reshape(2, 1, 1)
+        for _ in range(iterations):
+            r = (distorted ** 2).sum(axis=0)
+            previous = distorted
+            distorted = undistorted / (r * coeffs + 1)
+            if np.abs(distorted - previous).max() < precision:
+                break
+        distorted += self.center.reshape(2, 1, 1)
+        # cv2 expects the column (x) and row (y) maps.
+        self._maps = cv2.convertMaps(distorted[1].astype(np.float32),
+                                     distorted[0].astype(np.float32),
+                                     cv2.CV_16SC2)
+        return self._maps
+
+    def correct_image(self, image, interpolation=cv2.INTER_LINEAR, dst=None):
+        """Get the undistorted version of an image.
+
+        :param image: image with the shape of the model.
+        :type image: numpy.array
+        :param int interpolation: *cv2* interpolation method.
+        :param dst: optional array where the output is written.
+        :type dst: numpy.array
+        :return: undistorted image.
+        :rtype: numpy.array
+        """
+        map1, map2 = self.get_maps()
+        return cv2.remap(image, map1, map2, interpolation, dst=dst)
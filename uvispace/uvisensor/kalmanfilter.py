@@ -20,11 +20,74 @@ Relevant documentation:
 
 * `<http://biorobotics.ri.cmu.edu/papers/sbp_papers/integrated3
   /kleeman_kalman_basics.pdf>`_
+
+The filters are linear by default. In the extended mode (EKF), the
+state equation is the one of a unicycle vehicle, and the covariance is
+propagated with its Jacobian, i.e. the uncertainty of the heading is
+transferred to the position. Besides, the heading residuals and states
+are wrapped to the [-pi, pi) interval, so that a measurement close to
+pi and a prediction close to -pi are not considered 2*pi apart.
+
+The filter only keeps the current state and covariance matrices. The
+history of predictions, states and measurements is optionally recorded
+in preallocated ring buffers, so that the memory and the time of every
+step are constant during long runs.
 """
 # Third party libraries
 import numpy as np
 
 
+def wrap_angle(angle):
+    """Wrap angles to the [-pi, pi) interval.
+
+    :param angle: angle or array of angles, in radians.
+    :return: the equivalent angles in the [-pi, pi) interval.
+    """
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+class History(object):
+    """Ring buffer with the last values of a vector variable.
+
+    The memory is allocated on instantiation. When the buffer is full,
+    every new value overwrites the oldest one.
+
+    :param int dim: number of elements of the variable.
+    :param int length: maximum number of values kept.
+    """
+
+    def __init__(self, dim, length):
+        """History class constructor. Allocate the buffer."""
+        if length < 1:
+            raise ValueError("The history length must be positive")
+        self._values = np.zeros([length, dim])
+        # Number of values appended since the creation.
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, len(self._values))
+
+    def append(self, value):
+        """Record a new value, overwriting the oldest one if full.
+
+        :param value: new value of the variable.
+        :type value: np.array(shape = (dim x 1))
+        """
+        self._values[self.count % len(self._values)] = value.ravel()
+        self.count += 1
+
+    def get_values(self):
+        """Get the recorded values, from the oldest to the latest.
+
+        :return: a copy of the values, one per row.
+        :rtype: np.array(shape = (N x dim))
+        """
+        if self.count <= len(self._values):
+            return self._values[:self.count].copy()
+        end = self.count % len(self._values)
+        return np.vstack((self._values[end:], self._values[:end]))
+
+
 class Kalman(object):
     """Class for implementing a linear Kalman Filter.
 
@@ -34,9 +97,18 @@ class Kalman(object):
 
     The noise distributions can be changed before the update
     stage, and the Kalman gain will vary accordingly.
+
+    :param int var_dim: number of state variables.
+    :param int input_dim: number of control variables.
+    :param int history: number of steps whose predictions, states and
+     measurements are recorded, or None for not recording them. The
+     oldest steps are overwritten.
+    :param bool extended: if True, run the extended Kalman filter of a
+     unicycle vehicle. Only valid with the default dimensions.
     """
 
-    def __init__(self, var_dim=3, input_dim=2):
+    def __init__(self, var_dim=3, input_dim=2, history=None,
+                 extended=False):
         """Initialize the Kalman filter instance
 
         The matrices present in the algorithm's main formulas are the
@@ -70,20 +142,37 @@ class Kalman(object):
          method**, that will merge the predicted position with the one
          given by the sensors.
         """
+        if extended and (var_dim, input_dim) != (3, 2):
+            raise ValueError("The extended filter needs 3 variables "
+                             "(x, y, theta) and 2 inputs (speeds)")
         self._variables_dim = var_dim
         self._input_dim = input_dim
+        self.extended = extended
         self._step = 0
         # Measurement equation matrix.
-        self.measurements = np.zeros([var_dim, 1])
+        self._measurement = np.zeros([var_dim, 1])
         self._H = np.eye(var_dim)
         self.observation_noise = np.zeros([var_dim, 1])
         # Actual and predicted states vectors.
-        self.states = np.zeros([var_dim, 1])
-        self.pred_states = np.zeros([var_dim, 1])
-        # State equation matrices.
+        self._state = np.zeros([var_dim, 1])
+        self._pred_state = np.zeros([var_dim, 1])
+        # Optional history of the predictions, states and measurements,
+        # starting with the initial values.
+        self.history = None
+        if history is not None:
+            self.history = {
+                'pred_states': History(var_dim, history),
+                'states': History(var_dim, history),
+                'measurements': History(var_dim, history),
+            }
+            self._record('pred_states', self._pred_state)
+            self._record('states', self._state)
+            self._record('measurements', self._measurement)
+        # State equation matrices. B, and F on the extended mode, are
+        # updated in place on every step.
         self._F = np.eye(var_dim)
-        self.B = np.array([[np.cos(self.states[2]), 0], 
-                           [np.sin(self.states[2]), 0],
+        self.B = np.array([[np.cos(self._state[2, 0]), 0],
+                           [np.sin(self._state[2, 0]), 0],
                            [0, 1]])
         # Actual and predicted states covariance matrices. Initially very high.
         self._P = np.eye(var_dim) * np.array([1000**2, 1000**2, 2*np.pi**2])
@@ -94,6 +183,35 @@ class Kalman(object):
         # Kalman gain.
         self._K = np.ones([var_dim, var_dim])
 
+    def _record(self, name, value):
+        """Append a value to a history buffer, if it is enabled."""
+        if self.history is not None:
+            self.history[name].append(value)
+
+    def _get_history(self, name, latest):
+        """Get the recorded values of a variable, as columns.
+
+        If the history is disabled, only the latest value is returned.
+        """
+        if self.history is None:
+            return latest.copy()
+        return self.history[name].get_values().T
+
+    @property
+    def states(self):
+        """Filtered states, one per column, from the oldest one."""
+        return self._get_history('states', self._state)
+
+    @property
+    def pred_states(self):
+        """Predicted states, one per column, from the oldest one."""
+        return self._get_history('pred_states', self._pred_state)
+
+    @property
+    def measurements(self):
+        """Measurements, one per column, from the oldest one."""
+        return self._get_history('measurements', self._measurement)
+
     def set_prediction_noise(self, noise):
         """Set the prediction noise matrix to the given values
 
@@ -195,6 +313,17 @@ class Kalman(object):
         not affect on the new position (x,y) of the object, as the time
         is considered small enough between iterations.
 
+        On the extended mode, F is the Jacobian of the state equation,
+        evaluated with the previous state and the current input, and the
+        predicted heading is wrapped:
+
+        .. math::
+
+            F = \\begin{bmatrix}
+                1 & 0 & -v \\cdot \\Delta t \\cdot sin(\\theta) \\\\
+                0 & 1 & v \\cdot \\Delta t \\cdot cos(\\theta) \\\\
+                0 & 0 & 1 \\end{bmatrix}
+
         :param ext_input: values of the control variables.
         :type ext_input: np.array(shape = (input_dim x 1))
         :param float delta_t: time step between the current iteration
@@ -202,13 +331,23 @@ class Kalman(object):
         :return: The predicted state means, and the predicted covariance
          matrix.
         """
-        self.B = delta_t * np.array([[np.cos(self.states[2,-1]), 0], 
-                                     [np.sin(self.states[2,-1]), 0],
-                                     [0, 1]])
-        # The array has to be reshaped in order to obtain a column vector.
-        previous_state = self.states[:,-1].reshape([self._variables_dim,1])
-        pred_state = np.dot(self._F, previous_state) + np.dot(self.B, ext_input)
-        self.pred_states = np.hstack((self.pred_states, pred_state))
+        theta = self._state[2, 0]
+        self.B[0, 0] = delta_t * np.cos(theta)
+        self.B[1, 0] = delta_t * np.sin(theta)
+        self.B[2, 1] = delta_t
+        if self.extended:
+            # The state equation is not linear on theta, so x(t+1|t) is
+            # obtained with F=I, and then F is set to its Jacobian.
+            pred_state = self._state + np.dot(self.B, ext_input)
+            pred_state[2, 0] = wrap_angle(pred_state[2, 0])
+            linear_step = ext_input[0, 0] * delta_t
+            self._F[0, 2] = -linear_step * np.sin(theta)
+            self._F[1, 2] = linear_step * np.cos(theta)
+        else:
+            pred_state = (np.dot(self._F, self._state)
+                          + np.dot(self.B, ext_input))
+        self._pred_state = pred_state
+        self._record('pred_states', pred_state)
         # Predict the new covariances matrix.
         self._pred_P = np.dot(np.dot(self._F, self._P), np.transpose(self._F))
         self._pred_P += self._Q
@@ -237,16 +376,22 @@ class Kalman(object):
         other variables, on the value of the process and measurement
         noises.
 
+        On the extended mode, the heading residual and the filtered
+        heading are wrapped to the [-pi, pi) interval.
+
         :param measurement: value of the sensors input.
         :type measurement: np.array(shape = (var_dim x 1))
         :return: The filtered state means, and the filtered
          covariance matrix.
         """
-        pred_state = self.pred_states[:,-1].reshape([self._variables_dim,1])
+        pred_state = self._pred_state
         # Estimated value of the measurement and its error.
         pred_measure = np.dot(self._H, pred_state)
         meas_error = measurement - pred_measure
-        self.measurements = np.hstack((self.measurements, measurement))
+        if self.extended:
+            meas_error[2, 0] = wrap_angle(meas_error[2, 0])
+        self._measurement = measurement
+        self._record('measurements', measurement)
         # Innovation (or residual) covariance, and its inverse.
         S = np.dot(np.dot(self._H, self._pred_P), 
                    np.transpose(self._H)) + self._R
@@ -256,5 +401,231 @@ class Kalman(object):
         # Get the updated state mean and covariance matrix.
         self._P = self._pred_P - np.dot(np.dot(self._K, self._H), self._pred_P)
         state = pred_state + np.dot(self._K, meas_error)
-        self.states = np.hstack((self.states, state))
+        if self.extended:
+            state[2, 0] = wrap_angle(state[2, 0])
+        self._state = state
+        self._record('states', state)
         return (state, self._P)
+
+
+class KalmanBank(object):
+    """Class for implementing the Kalman filters of a fleet of vehicles.
+
+    Each filter has 3 state variables (x, y, theta) and 2 control
+    variables (linear and angular speeds), as the *Kalman* objects with
+    the default dimensions, and its own noise matrices. The states and
+    covariance matrices of the N filters are stacked in arrays of shape
+    (N x 3 x 1) and (N x 3 x 3), and each stage is run for all of them
+    with a single vectorized call.
+
+    The equations are the ones of the *Kalman* class, but the Kalman
+    gain is obtained solving a linear system instead of inverting S.
+
+    :param int size: initial number of filters.
+    :param bool extended: if True, run the extended Kalman filters of
+     unicycle vehicles, see *Kalman*.
+    """
+
+    def __init__(self, size=0, extended=False):
+        """Initialize the bank, with *size* filters."""
+        self.extended = extended
+        # Measurement and state equation matrices. On the extended mode,
+        # F is replaced by the Jacobian of each filter on every step.
+        self._H = np.eye(3)
+        self._F = np.eye(3)
+        # Actual and predicted states vectors, and control matrices.
+        self.states = np.zeros([0, 3, 1])
+        self.pred_states = np.zeros([0, 3, 1])
+        self.B = np.zeros([0, 3, 2])
+        # Actual and predicted states covariance matrices, and state and
+        # measurement noise covariance matrices.
+        self._P = np.zeros([0, 3, 3])
+        self._pred_P = np.zeros([0, 3, 3])
+        self._Q = np.zeros([0, 3, 3])
+        self._R = np.zeros([0, 3, 3])
+        self.add(size)
+
+    def __len__(self):
+        return len(self.states)
+
+    def add(self, count=1):
+        """Append new filters, with the initial values of *Kalman*.
+
+        :param int count: number of filters to append.
+        :return: index of the first new filter.
+        :rtype: int
+        """
+        index = len(self)
+        new = np.zeros([count, 3, 1])
+        self.states = np.concatenate((self.states, new))
+        self.pred_states = np.concatenate((self.pred_states, new))
+        B = np.zeros([count, 3, 2])
+        B[:, 0, 0] = 1
+        B[:, 2, 1] = 1
+        self.B = np.concatenate((self.B, B))
+        # Initially, very high covariances.
+        P = np.diag([1000**2, 1000**2, 2*np.pi**2])
+        noise = np.diag([100**2, 100**2, (5*np.pi/180)**2])
+        self._P = np.concatenate((self._P, np.tile(P, (count, 1, 1))))
+        self._pred_P = np.concatenate((self._pred_P,
+                                       np.zeros([count, 3, 3])))
+        self._Q = np.concatenate((self._Q, np.tile(noise, (count, 1, 1))))
+        self._R = np.concatenate((self._R, np.tile(noise, (count, 1, 1))))
+        return index
+
+    def save(self):
+        """Get the current states and covariance matrices of the filters.
+
+        The arrays are replaced, and not modified, by the next stages, so
+        they can be used to *restore* the filters afterwards.
+
+        :return: the state means and the covariance matrices.
+        :rtype: (np.array(shape = (N x 3 x 1)), np.array(shape = (N x 3 x 3)))
+        """
+        return (self.states, self._P)
+
+    def restore(self, saved):
+        """Set the states and covariance matrices obtained with *save*.
+
+        :param saved: the state means and the covariance matrices.
+        """
+        self.states, self._P = saved
+
+    def set_prediction_noise(self, noise, index=None):
+        """Set the prediction noise matrices of some filters.
+
+        See *Kalman.set_prediction_noise*. Besides, a different noise
+        can be given for each filter: a list of N uncorrelated noises,
+        or an array of N matrices.
+
+        :param noise: new values for the process noise.
+        :type noise: 3 length list or tuple, or a list of N of them; or a
+         np.array(shape = (3x3)) or np.array(shape = (Nx3x3))
+        :param index: index, indexes or boolean mask of the filters to
+         be updated. By default, all of them.
+        :return: the process noise matrices of the updated filters.
+        """
+        return self._set_noise(self._Q, noise, index)
+
+    def set_measurement_noise(self, noise, index=None):
+        """Set the measurement noise matrices of some filters.
+
+        See *Kalman.set_measurement_noise* and *set_prediction_noise*.
+
+        :param noise: new values for the measurement noise.
+        :param index: index, indexes or boolean mask of the filters to
+         be updated. By default, all of them.
+        :return: the measurement noise matrices of the updated filters.
+        """
+        return self._set_noise(self._R, noise, index)
+
+    def _set_noise(self, matrices, noise, index):
+        """Set the noise matrices of the filters selected by *index*."""
+        if index is None:
+            index = slice(None)
+        # Routine for a list or tuple input, that results on diagonal
+        # matrices.
+        if type(noise) in (list, tuple):
+            noise = np.asarray(noise, dtype=float)
+            if noise.shape[-1] != 3:
+                raise ValueError("noise length is different to variables dim")
+            noise = noise[..., np.newaxis] * np.eye(3)
+        elif type(noise) is np.ndarray:
+            if noise.shape[-2:] != (3, 3):
+                raise ValueError("one dimension is different to variables dim")
+        else:
+            raise ValueError("Input must be an array, tuple or list")
+        matrices[index] = noise
+        return matrices[index]
+
+    def predict(self, inputs, delta_t):
+        """Estimate the new states of all the filters.
+
+        See *Kalman.predict*.
+
+        :param inputs: values of the control variables of each filter.
+        :type inputs: np.array(shape = (N x 2 x 1))
+        :param delta_t: time step since the previous iteration, for all
+         the filters or for each one.
+        :type delta_t: float or np.array(shape = N)
+        :return: The predicted state means, and the predicted covariance
+         matrices.
+        """
+        inputs = np.reshape(inputs, [len(self), 2, 1])
+        theta = self.states[:, 2, 0]
+        cos = np.cos(theta)
+        sin = np.sin(theta)
+        self.B[:, 0, 0] = delta_t * cos
+        self.B[:, 1, 0] = delta_t * sin
+        self.B[:, 2, 1] = delta_t
+        if self.extended:
+            self.pred_states = self.states + np.matmul(self.B, inputs)
+            self.pred_states[:, 2, 0] = wrap_angle(self.pred_states[:, 2, 0])
+            # Jacobians of the state equation of every filter.
+            linear_step = inputs[:, 0, 0] * delta_t
+            F = np.empty([len(self), 3, 3])
+            F[:] = self._F
+            F[:, 0, 2] = -linear_step * sin
+            F[:, 1, 2] = linear_step * cos
+        else:
+            F = self._F
+            self.pred_states = (np.matmul(F, self.states)
+                                + np.matmul(self.B, inputs))
+        # Predict the new covariances matrices.
+        self._pred_P = np.matmul(np.matmul(F, self._P),
+                                 np.swapaxes(F, -1, -2))
+        self._pred_P += self._Q
+        return (self.pred_states, self._pred_P)
+
+    def update(self, measurements, mask=None):
+        """Merge the measurements and the predictions of the filters.
+
+        See *Kalman.update*. The filters excluded by the mask, e.g. the
+        ones of vehicles not detected on this iteration, keep the
+        predicted state and covariance matrix.
+
+        :param measurements: value of the sensors input of each filter.
+         The values of the filters excluded by *mask* are ignored.
+        :type measurements: np.array(shape = (N x 3 x 1))
+        :param mask: boolean array, True for the filters to be updated.
+         By default, all of them.
+        :type mask: np.array(shape = N)
+        :return: The filtered state means, and the filtered covariance
+         matrices.
+        """
+        measurements = np.reshape(measurements, [len(self), 3, 1])
+        if mask is None or np.all(mask):
+            self.states, self._P = self._merge(
+                    self.pred_states, self._pred_P, measurements, self._R)
+            return (self.states, self._P)
+        # Only the selected filters are merged, and the other ones keep
+        # their predictions.
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            self.states = self.pred_states
+            self._P = self._pred_P
+            return (self.states, self._P)
+        states = self.pred_states.copy()
+        P = self._pred_P.copy()
+        states[rows], P[rows] = self._merge(
+                self.pred_states[rows], self._pred_P[rows],
+                measurements[rows], self._R[rows])
+        self.states = states
+        self._P = P
+        return (self.states, self._P)
+
+    def _merge(self, pred_state, pred_P, measurement, R):
+        """Get the filtered states and covariance matrices of a stack."""
+        # Innovation (or residual) covariance.
+        S = np.matmul(np.matmul(self._H, pred_P), self._H.T) + R
+        # Kalman gain, from S.K' = H.P as S and P are symmetric.
+        K = np.linalg.solve(S, np.matmul(self._H, pred_P)).transpose(0, 2, 1)
+        meas_error = measurement - np.matmul(self._H, pred_state)
+        if self.extended:
+            meas_error[:, 2, 0] = wrap_angle(meas_error[:, 2, 0])
+        # Get the updated state means and covariance matrices.
+        state = pred_state + np.matmul(K, meas_error)
+        if self.extended:
+            state[:, 2, 0] = wrap_angle(state[:, 2, 0])
+        P = pred_P - np.matmul(np.matmul(K, self._H), pred_P)
+        return state, P
@@ -6,6 +6,17 @@ Options
 
 - -s / --save2file: The data collected by the cameras will be stored in
 a spreadsheet and in a text file.
+- -l / --loop: All the cameras are polled from a single thread, with an
+event loop, instead of using a thread per camera.
+- -p / --processes: Each camera is handled by a worker process, instead
+of a thread, so that the processing of the cameras is not serialized by
+the interpreter lock.
+- -c <folder> / --config=<folder>: Folder containing the configuration
+files of the cameras, e.g. the ones written by the cameras simulator
+*resources/sim_cameras.py*. By default, './resources/config'.
+- -r <folder> / --record=<folder>: The times and poses measured for each
+UGV are recorded in a memory-mapped file of the folder, 'ugv<id>.dat',
+instead of being kept only in memory. See the *recorder* module.
 
 ------------------------------------------------------------------------
 
@@ -22,17 +33,26 @@ different threads are managed and indexed in a list called *threads*:
 * A final thread is in charge of merging the information obtained at
   each FPGA thread and obtain global UGVs' positions.
 
+With the --loop option, the 4 camera threads are replaced by a single
+thread, which polls every FPGA concurrently with an event loop.
+
+With the --processes option, each CameraThread routine runs in the main
+thread of its own worker process. The measurements are sent to the data
+fusion thread as compact records, and the orders are sent back, through
+ZeroMQ ipc sockets.
+
 NOTE: The proper way to end the program is to press 'Q', as the terminal
 prompt indicates during execution. If the Keyboard Interrupt is used
 instead, it will probably corrupt the TCP/IP socket and the FPGAs will
 have to be reset.
 """
 # Standard libraries
-import copy
 import getopt
 import glob
 import logging
+import multiprocessing
 import os
+import signal
 import sys
 import threading
 import time
@@ -42,7 +62,12 @@ import numpy as np
 import zmq
 # Local libraries
 from resources import dataprocessing
-import kalmanfilter
+import cameraloop
+import cameramodel
+import exchange
+import geometry
+import scheduler
+import timeline
 import videosensor
 
 try:
@@ -52,6 +77,8 @@ except ImportError:
     # Exit program if the settings module can't be found.
     sys.exit("Can't find settings module. Maybe environment variables are not"
              "set. Run the environment .sh script at the project root folder.")
+import messages
+import recorder
 logger = logging.getLogger('sensor')
 
 
@@ -63,17 +90,30 @@ class CameraThread(threading.Thread):
     configuration. Then it enters an endless loop until *end_event*
     flag is raised. At each iteration, when possible, reads the FPGA
     register containing triangles location, processes the data and
-    writes it to the global shared variable *triangles*.
-
-    :param triangles: Dictionary where each element is an instance
-     of *geometry.Triangle*. It is a global variable for sharing the
-     information of different triangles detected in the camera space.
-     Each triangle has a UNIQUE key identifier. It is used for
-     writing and sending to other threads the triangle elements.
-
-    :param ntriangles: READ ONLY dictionary of the same type and shape
-     as *triangles*. It contains the triangles detected by other cameras
-     that are inside the borders region of the current camera's space.
+    publishes the detected triangles in the *measurements* buffer.
+
+    :param measurements: *exchange.SnapshotBuffer* object where a new
+     dictionary is published at every cycle. Each element is an
+     instance of *geometry.Triangle*, or None if the tracker did not
+     find it, with a UNIQUE key identifier. The published dictionaries
+     are never modified afterwards.
+
+    :param orders: READ ONLY *exchange.SnapshotBuffer* object where the
+     *DataFusionThread* publishes dictionaries with 3 elements:
+
+     * 'triangles': dictionary of the same type and shape as the
+       measurements. It contains the triangles detected by other
+       cameras that are inside the borders region of the current
+       camera's space.
+     * 'inborders': dictionary whose elements indicate if the
+       corresponding triangle is located within the borders region of
+       current camera's space.
+     * 'reset_flags': dictionary of boolean elements. They are set to
+       True when its corresponding triangle exits the current camera's
+       space.
+
+     Their keys have an univocal correspondence with the key
+     identifiers of the measurements.
 
     :param begin_event: *threading.Event* object that is set to True
      when the FPGA is configured and the thread begins the main loop.
@@ -81,121 +121,191 @@ class CameraThread(threading.Thread):
     :param end_event: *threading.Event* object that is set to True
      when the execution has to end.
 
-    :param condition: *threading.Condition* object for synchronizing
-     R/W operations on shared variables i.e. *triangles, inborders*.
-
-    :param inborders: READ ONLY dictionary whose elements indicate if
-     the corresponding triangle is located within the borders region
-     of current camera's space. Its keys have an univocal correspondence
-     with the key identifiers of the *triangles* dictionary.
-
-    :param reset_flag: READ ONLY dictionary of boolean elements. They
-     are set to True when its corresponding triangle exits the current
-     camera's space.
-
     :param name: String that provides the name of the thread.
 
     :param conf_file: String containing the relative path to the
      configuration file of the camera.
+
+    :param tracker_ids: *exchange.IdAllocator* object shared by all the
+     cameras, which gives the ids of the triangles found on set up. By
+     default, the camera has its own allocator.
     """
 
-    def __init__(self, triangles, ntriangles, begin_event, end_event,
-                 condition, inborders, reset_flag, name=None, conf_file=''):
+    def __init__(self, measurements, orders, begin_event, end_event,
+                 name=None, conf_file='', tracker_ids=None):
         """Class constructor method."""
         threading.Thread.__init__(self, name=name)
         self.image = []
         self.cycletime = 0.02
         # Initialize TCP/IP connection and start FPGA operation.
         self.camera = videosensor.camera_startup(conf_file)
+        self.tracker_ids = tracker_ids or exchange.IdAllocator()
         # Synchronization variables
         self.begin_event = begin_event
         self.end_event = end_event
-        self.condition = condition
-        # Global and local dictionaries for writing the detected triangles.
-        self.triangles = triangles
-        self._triangles = copy.copy(self.triangles)
-        # Global and local dictionaries for reading the new triangles.
-        self.ntriangles = ntriangles
-        self._ntriangles = copy.copy(self.ntriangles)
-        # Global and local flags indicating if the UGVs are in borders region.
-        self.inborders = inborders
-        self._inborders = copy.copy(self.inborders)
-        # Global flag indicating if ROI tracker has to be reset.
-        self.reset_flag = reset_flag
-        self._reset_flag = copy.copy(self.reset_flag)
+        # Buffer for publishing the detected triangles.
+        self.measurements = measurements
+        # Reader of the orders, and latest orders received: new triangles,
+        # flags indicating if the UGVs are in borders region and flags
+        # indicating if ROI tracker has to be reset.
+        self._orders = exchange.SnapshotReader(orders)
+        self._ntriangles = {}
+        self._inborders = {}
+        self._reset_flag = {}
 
     def run(self):
         """Main routine of the CameraThread."""
-        # Look for shapes in whole image and configure trackers.
-        self.image, _ = videosensor.set_tracker(self.camera)
-        self.begin_event.set()
-        while not self.end_event.isSet():
-            # Start the cycle timer
-            cycle_start_time = time.time()
-            # Sync operations. Read global variables and update local ones.
-            self.condition.acquire()
-            self._inborders.update(self.inborders)
-            self._ntriangles.update(self.ntriangles)
-            self._reset_flag.update(self.reset_flag)
-            self.condition.release()
-            #
-            # Get CARTESIAN coordinates of the 8 contour points in tracker.
-            # The code ONLY tracks the UGV with id=1.
-            #
-            try:
-                locations = self.camera.get_register('ACTUAL_LOCATION')['1']
-            except KeyError:
-                #
-                # Set a new tracker if the inborders flag is raised and
-                # The corresponding tracker is empty (if KeyError).
-                #
-                if self._inborders['1']:
-                    # Apply inverse homography and transform global to local.
-                    self._ntriangles['1'].inverse_homography(self.camera._H)
-                    self._ntriangles['1'].global2local(self.camera.offsets, K=4)
-                    # get window and set tracker
-                    self.image.triangles = [self._ntriangles['1']]
-                    videosensor.set_tracker(self.camera, self.image)
-                continue
-            # Scale the contours obtained according to the FPGA to image ratio.
-            contours = np.array(locations) / self.camera._scale
-            # Convert from Cartesian to Image coordinates
-            tmp = np.copy(contours[:,0])
-            contours[:,0] = contours[:,1]
-            contours[:,1] = tmp
-            self.image.contours = [contours]
-            # Correct barrel distortion.
-            self.image.correct_distortion()
-            # Obtain 3 vertices from the contours
-            shapes = self.image.get_shapes(get_contours=False)
-            # If triangles are detected, calculate coordinates.
-            if len(shapes):
-                self._triangles['1'] = shapes[0]
-                # Obtain global cartesian coordinates with a scale ratio 4:1.
-                self._triangles['1'].local2global(self.camera.offsets, K=4)
-                self._triangles['1'].homography(self.camera._H)
-            # If any triangle is detected, indicate it writing a None variable.
-            else:
-                self._triangles['1'] = None
-            # Free the ROI tracker if corresponding flag was raised
-            if self._reset_flag['1']:
-                self.camera.set_register('FREE_TRACKER', '1')
-                logger.info('{} TRACKER FREED'.format(self.name))
-                self._reset_flag = {'1': False}
-                self._triangles.pop('1', None)
-            # Sync operations. Write to global variables.
-            self.condition.acquire()
-            if self._triangles.has_key('1'):
-                self.triangles.update(self._triangles)
-            else:
-                self.triangles.clear()
-            self.condition.release()
-            # Sleep the rest of the cycle
-            while (time.time() - cycle_start_time) < self.cycletime:
-                pass
+        self.setup()
+        timer = scheduler.PeriodicTimer(self.cycletime, self.name)
+        # Sleep until the next cycle, or until the end event is set.
+        while not timer.wait(self.end_event):
+            # The locations are captured when they are requested.
+            timestamp = scheduler.monotonic()
+            self.cycle(self.camera.get_register('ACTUAL_LOCATION'),
+                       timestamp)
         logger.debug('shutting down {}'.format(self.name))
+        timer.report()
         self.camera.disconnect_client()
 
+    def setup(self):
+        """Look for shapes in whole image and configure trackers.
+
+        The ids of the trackers are unique in the whole fleet, as they
+        are the keys of the UGVs in the *DataFusionThread*.
+        """
+        image = videosensor.get_image(self.camera)
+        self.image, _ = videosensor.set_tracker(
+                self.camera, image,
+                self.tracker_ids.allocate(len(image.triangles)))
+        self.begin_event.set()
+
+    def cycle(self, trackers, timestamp=None):
+        """Process the locations read from the trackers of the camera.
+
+        :param dict trackers: content of the 'ACTUAL_LOCATION' register,
+         with the points of the contour of each tracked shape.
+        :param float timestamp: monotonic time when the register was
+         requested. By default, the time of the publication.
+        """
+        # Apply the orders of the DataFusionThread, if new ones arrived.
+        orders, skipped = self._orders.read()
+        if skipped >= 0:
+            self._ntriangles = orders.data['triangles']
+            self._inborders = orders.data['inborders']
+            self._reset_flag = orders.data['reset_flags']
+        #
+        # Set a new tracker for every UGV whose inborders flag is raised
+        # and whose tracker is empty.
+        #
+        new_ids = [key for key, inborders in self._inborders.items()
+                   if inborders and key not in trackers
+                   and key in self._ntriangles]
+        if new_ids:
+            new_triangles = []
+            for key in new_ids:
+                # Transform a copy, as the published triangle is shared.
+                triangle = self._ntriangles[key].copy()
+                # Apply inverse homography and transform global to local.
+                triangle.inverse_homography(self.camera._H)
+                triangle.global2local(self.camera.offsets,
+                                      K=self.camera.model.K)
+                new_triangles.append(triangle)
+            # get windows and set trackers
+            self.image.triangles = new_triangles
+            videosensor.set_tracker(self.camera, self.image,
+                                    [int(key) for key in new_ids])
+        if not trackers:
+            return
+        #
+        # Get CARTESIAN coordinates of the contour points of every tracker,
+        # and process all of them at once.
+        #
+        keys = sorted(trackers)
+        # Scale the contours obtained according to the FPGA to image ratio,
+        # and convert from Cartesian to Image coordinates.
+        self.image.contours = [np.asarray(trackers[key])[:, ::-1]
+                               / self.camera._scale for key in keys]
+        # Correct barrel distortion.
+        self.image.correct_distortion(*self.camera.model.distortion)
+        # Obtain 3 vertices from the contours
+        self.image.get_vertices(get_contours=False)
+        # Obtain global cartesian coordinates of all the triangles at once,
+        # with the scale ratio of the model, i.e. 4:1.
+        batch = geometry.TriangleBatch(self.image.vertices)
+        batch.local2global(self.camera.offsets, K=self.camera.model.K)
+        batch.homography(self.camera._H)
+        # If a triangle is not detected in a tracker, indicate it writing a
+        # None variable.
+        triangles = dict.fromkeys(keys)
+        for index, triangle in zip(self.image.contour_indexes, batch):
+            triangles[keys[index]] = triangle
+        # Free the ROI trackers whose corresponding flags were raised
+        for key, reset in self._reset_flag.items():
+            if reset:
+                self.camera.set_register('FREE_TRACKER', key)
+                logger.info('{} TRACKER {} FREED'.format(self.name, key))
+                triangles.pop(key, None)
+        self._reset_flag = {}
+        # Publish the new measurement, that will not be modified anymore.
+        self.measurements.publish(triangles, timestamp)
+
+
+class CameraLoopThread(threading.Thread):
+    """Child class of threading.Thread for polling all the cameras.
+
+    It runs the work of several *CameraThread* objects, which are not
+    started. At first, their FPGAs are set up one after another. Then, a
+    *cameraloop.PollingLoop* requests the trackers locations to every
+    camera concurrently from this single thread, and each reply is
+    processed by the *cycle* method of its CameraThread. The register
+    writes of the cycles, e.g. new or freed trackers, are queued on the
+    pollers, so they do not block the loop while waiting for their ACK
+    messages.
+
+    :param camera_threads: List of *CameraThread* objects.
+
+    :param end_event: *threading.Event* object that is set to True
+     when the execution has to end.
+
+    :param name: String that provides the name of the thread.
+    """
+
+    def __init__(self, camera_threads, end_event, name='Cameras Loop'):
+        """Class constructor method."""
+        threading.Thread.__init__(self, name=name)
+        self.camera_threads = camera_threads
+        self.end_event = end_event
+
+    def run(self):
+        """Main routine of the CameraLoopThread."""
+        for camera_thread in self.camera_threads:
+            camera_thread.setup()
+        pollers = []
+        for camera_thread in self.camera_threads:
+            poller = cameraloop.LocationPoller(camera_thread.camera._client,
+                                               None, camera_thread.cycletime)
+            poller.callback = self._get_callback(camera_thread, poller)
+            camera_thread.camera.write_queue = poller.queue_write
+            pollers.append(poller)
+        cameraloop.PollingLoop(pollers).run(self.end_event)
+        for camera_thread, poller in zip(self.camera_threads, pollers):
+            logger.debug('shutting down {}. Polling statistics: {}'.format(
+                    camera_thread.name, poller.stats))
+            camera_thread.camera.write_queue = None
+            camera_thread.camera.disconnect_client()
+
+    @staticmethod
+    def _get_callback(camera_thread, poller):
+        """Get a function processing the replies of a camera's poller.
+
+        The replies that can not be matched to their request, after a
+        timeout, have no capture time, and they are published with the
+        processing time.
+        """
+        def callback(trackers):
+            camera_thread.cycle(trackers, poller.capture_time)
+        return callback
+
 
 class DataFusionThread(threading.Thread):
     """Child class of threading.Thread for merging and processing data.
@@ -213,21 +323,30 @@ class DataFusionThread(threading.Thread):
       it is True.
     - Merge the information obtained in all the cameras.
 
-    :param triangles: READ ONLY List containing N dictionaries, where
-     N is the number of Camera threads. Each dictionary element is the
-     set of coordinates of an UGV inside the Nth camera.
-
-    :param ntriangles: WRITE N-len list of the same type and shape as
-     *triangles*, for exchanging triangles information between
-     *CameraThreads*.
-
-    :param conditions: List containing N *threading.Condition* objects.
-     They are used for synchronizing the *CameraThreads* and the
-     *DataFusionThread* when doing R/W operations on shared variables.
-
-    :param inborders: List containing N dictionaries. Each dictionary
-     element is a flag set to True when the UGV is within the Nth camera
-     borders region.
+    The measurements are read without locks, from the snapshot buffers
+    of the cameras, which keep the last few ones. Thus, the measurements
+    published by a camera during a single fusion cycle are not lost.
+    Every new measurement and speed set point is fused in the order of
+    its capture time, even if it is received late, as long as it is not
+    older than *window* seconds (see *timeline.FusionTimeline*).
+
+    Every UGV is identified by the key of its triangles, i.e. its
+    tracker id, and it is filtered independently. The ids are allocated
+    by an *exchange.IdAllocator* shared by all the cameras, and the
+    trackers that other cameras open for the UGV keep its id. Its pose
+    is published on the port UVISPACE_BASE_PORT_POSITION + id, and its
+    speed set points are read on the port UVISPACE_BASE_PORT_SPEED + id.
+    The state of the UGVs is stored in arrays, whose Nth element belongs
+    to the UGV with id *robot_ids[N]*.
+
+    :param measurements: READ ONLY List containing N
+     *exchange.SnapshotBuffer* objects, where N is the number of Camera
+     threads. Each one contains the latest dictionary published by the
+     Nth camera, whose elements are the triangles of the UGVs inside it.
+
+    :param orders: WRITE N-len list of *exchange.SnapshotBuffer* objects,
+     where the orders for each *CameraThread* are published. See the
+     *CameraThread* documentation for their content.
 
     :param quadrant_limits: List containing N 4x2 arrays. Each array
      contains the 4 points defining the working space of the Nth camera.
@@ -235,64 +354,104 @@ class DataFusionThread(threading.Thread):
     :param end_event: *threading.Event* object that is set to True when
      the *UserThread* detects an 'end' order from the user.
 
-    :param reset_flags: List containing N dictionaries whose entries are
-     flags set to True when a ROI tracker in specified FPGA to be reset.
+    :param save2file: if True, the recorded poses of every UGV are
+     analyzed and saved by *dataprocessing* at the end of the execution.
+
+    :param record_folder: folder where the poses of every UGV are
+     recorded, in memory-mapped files. By default, they are only kept
+     in memory.
 
     :param name: String containing the name of the current thread.
     """
 
-    def __init__(self, triangles, ntriangles, conditions, inborders,
-                 quadrant_limits, begin_events, end_event, reset_flags,
-                 save2file=False, name='Fusion Thread'):
+    def __init__(self, measurements, orders, quadrant_limits, begin_events,
+                 end_event, save2file=False, record_folder=None,
+                 name='Fusion Thread'):
         """
         Class constructor method
         """
         threading.Thread.__init__(self, name=name)
         self.cycletime = 0.02
+        self.window = 5 * self.cycletime
         self.quadrant_limits = quadrant_limits
-        self.step = 0
+        # Borders regions of all the cameras, evaluated at once.
+        self.borders = geometry.BorderRegion(quadrant_limits)
+        # Sockets of each UGV, and poller to listen for speed set points.
+        self.sockets = {}
+        self.poller = zmq.Poller()
+        # Synchronization variables
+        self.begin_events = begin_events
+        self.end_event = end_event
+        # Readers of the cameras measurements, and buffers for the orders.
+        self._measurements = [exchange.SnapshotReader(buffer)
+                              for buffer in measurements]
+        self.orders = orders
+        # Local lists. Can only be R/W by this thread.
+        self._triangles = [{} for _ in measurements]
+        self._ntriangles = [{} for _ in measurements]
+        self._inborders = [{} for _ in measurements]
+        self._reset_flags = [{} for _ in measurements]
+        # State of the UGVs: iterations counter and last measured pose.
+        self.robot_ids = []
+        self._slots = {}
+        self.steps = np.zeros(0, dtype=int)
+        self.poses = np.zeros((0, 3))
+        # Extended Kalman filters with 3 variables (x, y, theta) and 2
+        # inputs (linear and angular speeds), one per UGV, fed in time
+        # order. The process noise, calculated empirically, is given per
+        # second. units = (mm, mm, rad)^2
+        self.timeline = timeline.FusionTimeline(
+                window=self.window,
+                prediction_noise=np.array([3.5**2, 3.5**2, 0.015**2])
+                / self.cycletime,
+                unknown_noise=np.array([1000**2, 1000**2, 2*np.pi**2])
+                / self.cycletime,
+                measurement_noise=(50**2, 50**2, (2*np.pi/180)**2))
+        # Recorders of the historic values of each UGV: time and pose.
+        self.data_hist = {}
+        self.record_folder = record_folder
+        # Variable containing the initial reference time.
+        self.initial_time = 0
+        # Boolean to save data in spreadsheet and file text.
+        self.save2file = save2file
+
+    def add_robot(self, robot_id):
+        """Open the sockets and allocate the state of a new UGV.
+
+        :param str robot_id: identifier of the UGV.
+        :return: index of the UGV in the state arrays.
+        :rtype: int
+        """
         # Publishing socket instantiation.
         pose_publisher = zmq.Context.instance().socket(zmq.PUB)
         pose_publisher.bind("tcp://*:{}".format(
-                int(os.environ.get("UVISPACE_BASE_PORT_POSITION")) + 1))
-        # Open a subscribe socket and poller to listen for speed set points.
+                int(os.environ.get("UVISPACE_BASE_PORT_POSITION"))
+                + int(robot_id)))
+        # Open a subscribe socket to listen for speed set points.
         speed_subscriber = zmq.Context.instance().socket(zmq.SUB)
         speed_subscriber.setsockopt_string(zmq.SUBSCRIBE, u"")
         speed_subscriber.setsockopt(zmq.CONFLATE, True)
         speed_subscriber.connect("tcp://localhost:{}".format(
-                int(os.environ.get("UVISPACE_BASE_PORT_SPEED")) + 1))
-        # Store sockets in dictionary
-        self.poller = zmq.Poller()
+                int(os.environ.get("UVISPACE_BASE_PORT_SPEED"))
+                + int(robot_id)))
         self.poller.register(speed_subscriber, zmq.POLLIN)
-        self.sockets = {
+        # Store sockets in dictionary
+        self.sockets[robot_id] = {
             'pose_publisher': pose_publisher,
             'speed_subscriber': speed_subscriber,
         }
-        # Synchronization variables
-        self.conditions = conditions
-        self.begin_events = begin_events
-        self.end_event = end_event
-        # Shared lists. Can be accessed by other threads.
-        self.triangles = triangles
-        self.ntriangles = ntriangles
-        self.inborders = inborders
-        self.reset_flags = reset_flags
-        # Local lists. Can only be R/W by this thread.
-        self._triangles = copy.copy(self.triangles)
-        self._ntriangles = copy.copy(self.ntriangles)
-        self._inborders = copy.copy(self.inborders)
-        self._reset_flags = copy.copy(self.reset_flags)
-        # Array to save historic poses values. Initial values set to 0.
-        self.data_hist = np.array([0., 0., 0., 0.]).reshape(1,4)
-        # Variable containing the initial reference time.
-        self.initial_time = 0
-        # Kalman filter instance with 3 variables (x, y, theta)
-        # and 2 inputs (linear and angular speeds).
-        self.kalman = kalmanfilter.Kalman(var_dim=3, input_dim=2)
-        # Set the process noise, calculated empirically. units = (mm, mm, rad)^2
-        self.kalman.set_prediction_noise((3.5**2, 3.5**2, 0.015**2))
-        # Boolean to save data in spreadsheet and file text.
-        self.save2file = save2file
+        slot = self.timeline.add()
+        self.robot_ids.append(robot_id)
+        self._slots[robot_id] = slot
+        self.steps = np.append(self.steps, 0)
+        self.poses = np.vstack((self.poses, np.zeros(3)))
+        filename = None
+        if self.record_folder is not None:
+            filename = os.path.join(self.record_folder,
+                                    'ugv{}.dat'.format(robot_id))
+        self.data_hist[robot_id] = recorder.Recorder(4, filename=filename)
+        logger.info("Tracking the UGV with id {}".format(robot_id))
+        return slot
 
     def run(self):
         """Main routine of the DataFusionThread."""
@@ -301,159 +460,259 @@ class DataFusionThread(threading.Thread):
             event.wait()
         # Set the reference time at this point.
         self.initial_time = time.time()
-        triangle = []
-        speeds = None
-        publish_time = None
-        while not self.end_event.isSet():
-            # Start the cycle timer
-            cycle_start_time = time.time()
-            # Loop with N iterations, being N the number of camera threads.
-            for index, condition in enumerate(self.conditions):
-                # Threads synchronized instructions.
-                condition.acquire()
-                # Read shared variables and store in local ones
-                self._triangles[index].update(self.triangles[index])
-                self._reset_flags[index].update(self.reset_flags[index])
-                condition.release()
-                #
-                # Evaluate if the triangle is in the borders regions.
-                #
-                if self._triangles[index]:
-                    # Check that the element is not of None type.
-                    if self._triangles[index]['1']:
-                        triangle = self._triangles[index]['1']
-                        # Evaluate if triangle is in borders region.
-                        self._inborders[index]['1'] = triangle.in_borders(
-                                self.quadrant_limits[index])
-                    # If dictionary element is None, skip to next camera.
-                    else:
-                        continue
-                # If the element is void, skip to next camera.
-                else:
-                    continue
-                #
-                # The following instructions will only be executed if a triangle
-                # is detected in the scanned CameraThread (with id 'index').
-                #
-                # Check in the other quadrants if the triangle is in borders.
-                #
-                for index2, quadrant in enumerate(self.quadrant_limits):
+        timer = scheduler.PeriodicTimer(self.cycletime, self.name)
+        # Sleep until the next cycle, or until the end event is set.
+        while not timer.wait(self.end_event):
+            # Cameras whose orders have to be published, and new
+            # measurements.
+            updated = set()
+            new = []
+            # Read the measurements published since the last cycle,
+            # without locks nor copies. The borders are checked with the
+            # latest one of each camera.
+            for index, reader in enumerate(self._measurements):
+                measurements, skipped = reader.read_new()
+                if skipped > 0:
+                    logger.debug("Skipped {} measurements of Camera{}".format(
+                            skipped, index))
+                if measurements:
+                    self._triangles[index] = measurements[-1].data
+                new.extend(measurements)
+            # Every UGV detected in each CameraThread (with id 'index').
+            # Trackers returning None values are skipped.
+            detections = [(index, key, triangle)
+                          for index, triangles in enumerate(self._triangles)
+                          for key, triangle in triangles.items()
+                          if triangle is not None]
+            # Evaluate at once if the triangles are in the borders region of
+            # every quadrant.
+            inborders = self.borders.in_borders(
+                    [triangle.vertices for _, _, triangle in detections])
+            for (index, key, triangle), flags in zip(detections, inborders):
+                self._inborders[index][key] = bool(flags[index])
+                updated.add(index)
+                # Update the orders of the other quadrants.
+                for index2 in range(len(self.quadrant_limits)):
                     # Do not run the function for the current quadrant.
                     if index2 == index:
                         continue
-                    self._inborders[index2]['1'] = triangle.in_borders(
-                            self.quadrant_limits[index2])
-                    # Update triangles[index2] if there is not any tracker
-                    # initialized and UGV is within borders of the Camera.
-                    if (self._inborders[index2]['1']
-                            and not self._triangles[index2]):
-                        self._ntriangles[index2]['1'] = copy.copy(triangle)
-                        self._reset_flags[index2]['1'] = False
-                        logger.info("New triangle in Camera{}".format(index2))
-                    # If the UGV is not in borders, but a tracker is set and is
-                    # returning None values, it has to be reset.
-                    elif (not self._inborders[index2]['1']
-                          and self._triangles[index2].get('1', False) is None):
-                        self._reset_flags[index2]['1'] = True
-                        self._ntriangles[index2].pop('1', None)
-                    # If the UGV is not in borders and any tracker was detected,
-                    # the reset flag has to be cleared.
-                    elif (not self._inborders[index2]['1']
-                          and self._triangles[index2].get('1', False) is False):
-                        self._reset_flags[index2]['1'] = False
-                        self._ntriangles[index2].pop('1', None)
-                    # Sync operations. Write to global variables
-                    self.conditions[index2].acquire()
-                    self.ntriangles[index2].update(self._ntriangles[index2])
-                    self.inborders[index2].update(self._inborders[index2])
-                    self.reset_flags[index2].update(self._reset_flags[index2])
-                    self.conditions[index2].release()
-            # TODO merge the content of every dictionary in triangle
-            # Calculate the time between iterations, for the Kalman prediction.
-            if publish_time:
-                delta_t = time.time() - publish_time
-            else:
-                delta_t = 0
-            # Boolean for updating the Kalman measurement noise.
-            detected_triangle = False
-            # Scan for detected triangle and process it.
-            for element in self._triangles:
-                if '1' in element:
-                    if element['1'] is not None:
-                        detected_triangle = True
-                        triangle = copy.copy(element['1'])
-            # The triangle is void at initialization, before it is detected for
-            # the first time. If this is the case, ignore the rest of the loop.
-            if not triangle:
-                continue
-            if speeds:
-                inputs = np.array([speeds['linear'], speeds['angular']])
-                inputs = inputs.reshape(2,1)
-                # Multiply the difference time by the number of steps that were
-                # missed. This should be reflected as well in the noise.
-                delta_t *= (1 + self.step - speeds['step'])
-                self.kalman.set_prediction_noise((3.5**2, 3.5**2, 0.015**2))
-            else:
-                inputs = np.array([0, 0])
-                delta_t = 0.02
-                self.kalman.set_prediction_noise((1000**2, 1000**2, 2*np.pi**2))
-            prediction, _ = self.kalman.predict(inputs, delta_t)
-            # Increment the iterations counter.
-            self.step += 1
-            # Update the measured pose only if a triangle was detected.
-            if detected_triangle:
-                pose = triangle.get_pose()
-                logger.info("Detected triangle at {}mm and {} radians."
-                            "".format(pose[0:2], pose[2]))
-                # Set the measurement noise to the cameras error, calculated
-                # empirically.
-                camera_noise = (50**2, 50**2, (2*np.pi/180)**2)
-            # Set a very high measurement noise if the triangle is not detected.
-            else:
-                camera_noise = (1000**2, 1000**2, 2*np.pi**2)
-            self.kalman.set_measurement_noise(camera_noise)
-            # Time since first triangle, in milliseconds.
-            diff_time = (time.time()-self.initial_time) * 1000
-            # Temporary array to save time and pose in meters.
-            new_data = np.array([diff_time, pose[0], pose[1],
-                                 pose[2]]).astype(np.float64)
-            # Matrix of floats to save data.
-            self.data_hist = np.vstack((self.data_hist, new_data))
-            pose_array = np.array(pose).reshape(3,1)
-            new_state, _ = self.kalman.update(pose_array)
-            pose_list = new_state.reshape(3).tolist()
-            pose_msg = {'x': pose_list[0], 'y': pose_list[1],
-                        'theta': pose_list[2], 'step': self.step}
-            self.sockets['pose_publisher'].send_json(pose_msg)
-            publish_time = time.time()
+                    self._update_borders(index2, key, triangle,
+                                         bool(flags[index2]))
+                    updated.add(index2)
+            # Publish copies of the orders, as the local ones are modified.
+            for index in updated:
+                self.orders[index].publish({
+                    'triangles': dict(self._ntriangles[index]),
+                    'inborders': dict(self._inborders[index]),
+                    'reset_flags': dict(self._reset_flags[index]),
+                })
+            # Add the detections of every new measurement, with its capture
+            # time. Stale measurements are not new detections.
+            detected = np.zeros(len(self.robot_ids), dtype=bool)
+            for measurement in new:
+                slots = []
+                for robot_id, triangle in measurement.data.items():
+                    if triangle is None:
+                        continue
+                    slot = self._slots.get(robot_id)
+                    if slot is None:
+                        slot = self.add_robot(robot_id)
+                        detected = np.append(detected, False)
+                    detected[slot] = True
+                    self.poses[slot] = triangle.get_pose()
+                    slots.append(slot)
+                if slots and not self.timeline.add_poses(
+                        measurement.timestamp, slots, self.poses[slots]):
+                    logger.debug("Dropped a measurement {:.3f}s old".format(
+                            scheduler.monotonic() - measurement.timestamp))
+            # Filter and publish the pose of every UGV detected at least once.
+            self.update_robots(detected)
             logger.debug("Triangles at: {}".format(self._triangles))
             # Allow to poll only during the remaining cycle time.
-            polling_time = self.cycletime - (time.time()-cycle_start_time)
-            # Subtract another amount of time for doing the other routines.
+            polling_time = timer.remaining()
             logger.debug("polling {}s".format(polling_time))
-            events = dict(self.poller.poll(polling_time))
-            if (self.sockets['speed_subscriber'] in events
-                    and events[self.sockets['speed_subscriber']] == zmq.POLLIN):
-                speeds = self.sockets['speed_subscriber'].recv_json()
-                logger.debug("Received new speed set point: {}".format(speeds))
-            else:
-                # Set speeds to None in order to ignore Kalman prediction step.
-                speeds = None
-                logger.debug("Not received any speed set point from navigator")
-            # Sleep the rest of the cycle.
-            while (time.time() - cycle_start_time) < self.cycletime:
-                pass
+            # The poll timeout is given in milliseconds.
+            events = dict(self.poller.poll(polling_time * 1000))
+            for slot, robot_id in enumerate(self.robot_ids):
+                subscriber = self.sockets[robot_id]['speed_subscriber']
+                if events.get(subscriber) == zmq.POLLIN:
+                    speeds = messages.recv(subscriber, messages.SPEED)
+                    logger.debug("Received new speed set point for UGV {}: "
+                                 "{}".format(robot_id, speeds))
+                    # The set points without sending time are fused with
+                    # the reception time.
+                    timestamp = (speeds.get('timestamp')
+                                 or scheduler.monotonic())
+                    self.timeline.add_speeds(slot, timestamp,
+                                             speeds['linear'],
+                                             speeds['angular'])
+        logger.debug("Fusion statistics: {}".format(self.timeline.stats))
+        timer.report()
+        # Flush the recorded files. The data remains available.
+        for history in self.data_hist.values():
+            history.close()
         if self.save2file:
-            # Delete first row data (row of zeros).
-            self.data_hist = self.data_hist[1:, :]
-            # Save historic data containing poses and times.
-            dataprocessing.process_data(self.data_hist, save_analyzed=True,
-                                        save2master=True)
+            # Save historic data containing poses and times of each UGV. The
+            # recorded rows are analyzed without copying them.
+            for robot_id in self.robot_ids:
+                dataprocessing.process_data(self.data_hist[robot_id].data,
+                                            save_analyzed=True,
+                                            save2master=True)
         # Cleanup resources
-        for socket in self.sockets:
-            self.sockets[socket].close()
+        for sockets in self.sockets.values():
+            for socket in sockets.values():
+                socket.close()
         return
 
+    def _update_borders(self, index, key, triangle, inborders):
+        """Update the orders of a camera for a triangle of another one.
+
+        :param int index: index of the camera whose orders are updated.
+        :param str key: identifier of the triangle.
+        :param triangle: triangle detected by another camera.
+        :type triangle: geometry.Triangle
+        :param bool inborders: True if the triangle is in the borders
+         region of the camera.
+        """
+        self._inborders[index][key] = inborders
+        # Update ntriangles[index] if there is not any tracker initialized
+        # for the UGV and it is within borders of the Camera.
+        if inborders and key not in self._triangles[index]:
+            # The published measurements are not modified anymore, so
+            # the triangle is shared instead of copied.
+            self._ntriangles[index][key] = triangle
+            self._reset_flags[index][key] = False
+            logger.info("New triangle {} in Camera{}".format(key, index))
+        # If the UGV is not in borders, but a tracker is set and is
+        # returning None values, it has to be reset.
+        elif (not inborders
+              and self._triangles[index].get(key, False) is None):
+            self._reset_flags[index][key] = True
+            self._ntriangles[index].pop(key, None)
+        # If the UGV is not in borders and any tracker was detected,
+        # the reset flag has to be cleared.
+        elif not inborders and key not in self._triangles[index]:
+            self._reset_flags[index][key] = False
+            self._ntriangles[index].pop(key, None)
+
+    def update_robots(self, detected):
+        """Estimate the current poses of all the UGVs and publish them.
+
+        :param detected: boolean array, True for the UGVs detected on
+         this cycle.
+        :type detected: np.array(shape=N)
+        """
+        if not self.robot_ids:
+            return
+        states = self.timeline.estimate(scheduler.monotonic())
+        # Increment the iterations counters.
+        self.steps += 1
+        # Time since first triangle, in milliseconds.
+        diff_time = (time.time()-self.initial_time) * 1000
+        for slot, robot_id in enumerate(self.robot_ids):
+            pose = self.poses[slot]
+            if detected[slot]:
+                logger.info("Detected triangle {} at {}mm and {} radians."
+                            "".format(robot_id, pose[0:2], pose[2]))
+            # Record the time and the last measured pose.
+            self.data_hist[robot_id].append((diff_time, pose[0], pose[1],
+                                             pose[2]))
+            pose_list = states[slot].reshape(3).tolist()
+            pose_msg = {'x': pose_list[0], 'y': pose_list[1],
+                        'theta': pose_list[2], 'step': int(self.steps[slot])}
+            messages.send(self.sockets[robot_id]['pose_publisher'],
+                          messages.POSE, pose_msg)
+
+
+def run_camera_process(conf_file, name, begin_event, end_event, endpoints,
+                       tracker_ids):
+    """Main routine of a camera worker process.
+
+    It runs a *CameraThread* routine in the main thread of the process.
+    Its measurements and orders are exchanged with the *DataFusionThread*
+    through ZeroMQ sockets, instead of snapshot buffers.
+
+    :param conf_file: String containing the relative path to the
+     configuration file of the camera.
+
+    :param name: String that provides the name of the camera.
+
+    :param begin_event: *multiprocessing.Event* object that is set to
+     True when the FPGA is configured.
+
+    :param end_event: *multiprocessing.Event* object that is set to True
+     when the execution has to end.
+
+    :param endpoints: tuple with the addresses of the measurements and
+     the orders sockets, bound by the main process.
+
+    :param tracker_ids: *exchange.IdAllocator* object shared by all the
+     cameras.
+    """
+    # The keyboard interrupts are handled by the main process.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # A new context, as the parent's one can not be used after forking.
+    context = zmq.Context()
+    measurements_socket = context.socket(zmq.PUSH)
+    measurements_socket.setsockopt(zmq.LINGER, 0)
+    measurements_socket.connect(endpoints[0])
+    orders_socket = context.socket(zmq.PULL)
+    orders_socket.connect(endpoints[1])
+    measurements = exchange.SocketSender(measurements_socket,
+                                         exchange.encode_triangles)
+    orders = exchange.SocketReceiver(orders_socket, data={
+            'triangles': {}, 'inborders': {}, 'reset_flags': {}}, size=1)
+    camera_thread = CameraThread(measurements, orders, begin_event,
+                                 end_event, name, conf_file, tracker_ids)
+    camera_thread.run()
+    measurements_socket.close()
+    orders_socket.close()
+    context.term()
+
+
+def start_camera_processes(conf_files, begin_events, end_event, tracker_ids):
+    """Start a worker process for each camera.
+
+    :param conf_files: list with the configuration files of the cameras.
+
+    :param begin_events: list with a *multiprocessing.Event* object for
+     each camera, set when its FPGA is configured.
+
+    :param end_event: *multiprocessing.Event* object that is set to True
+     when the execution has to end.
+
+    :param tracker_ids: *exchange.IdAllocator* object shared by all the
+     cameras.
+
+    :return: the worker processes, and the lists with the measurements
+     receivers and the orders senders of each camera.
+    :rtype: (list, list, list)
+    """
+    context = zmq.Context.instance()
+    processes = []
+    measurements = []
+    orders = []
+    for index, filename in enumerate(conf_files):
+        endpoints = tuple('ipc:///tmp/uvispace-{}-camera{}-{}'.format(
+                os.getpid(), index, kind)
+                for kind in ('measurements', 'orders'))
+        measurements_socket = context.socket(zmq.PULL)
+        measurements_socket.bind(endpoints[0])
+        orders_socket = context.socket(zmq.PUSH)
+        orders_socket.setsockopt(zmq.LINGER, 0)
+        orders_socket.bind(endpoints[1])
+        measurements.append(exchange.SocketReceiver(
+                measurements_socket, exchange.decode_triangles, {}))
+        orders.append(exchange.SocketSender(orders_socket))
+        processes.append(multiprocessing.Process(
+                target=run_camera_process,
+                args=(filename, 'Camera{}'.format(index), begin_events[index],
+                      end_event, endpoints, tracker_ids),
+                name='Camera{}'.format(index)))
+    for process in processes:
+        process.start()
+    return processes, measurements, orders
+
 
 class UserThread(threading.Thread):
     """Child class of threading.Thread for interacting with user.
@@ -483,15 +742,12 @@ class UserThread(threading.Thread):
         for event in self.begin_events:
             event.wait()
         logger.info("All cameras were initialized")
-        while not self.end_event.isSet():
-            # Start the cycle timer
-            cycle_start_time = time.time()
+        timer = scheduler.PeriodicTimer(self.cycletime, self.name)
+        # Sleep until the next cycle, or until the end event is set.
+        while not timer.wait(self.end_event):
             i = raw_input("Press 'Q' to stop the script... ")
             if i in ('q', 'Q'):
                 self.end_event.set()
-            # Sleep the rest of the cycle
-            while (time.time() - cycle_start_time) < self.cycletime:
-                pass
 
 
 def main():
@@ -502,10 +758,18 @@ def main():
     """
     # Main routine
     save2file = False
-    help_msg = ("Usage: multiplecamera.py [-s | --save2file],")
+    record_folder = None
+    loop = False
+    processes = False
+    conf_folder = "./resources/config"
+    help_msg = ("Usage: multiplecamera.py [-s | --save2file], [-l | --loop], "
+                "[-p | --processes], [-c <folder> | --config=<folder>], "
+                "[-r <folder> | --record=<folder>]")
     # This try/except clause forces to give the robot_id argument.
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "hs", ["save2file"])
+        opts, args = getopt.getopt(sys.argv[1:], "hslpc:r:",
+                                   ["save2file", "loop", "processes",
+                                    "config=", "record="])
     except getopt.GetoptError:
         print(help_msg)
     for opt, arg in opts:
@@ -514,49 +778,73 @@ def main():
             sys.exit()
         if opt in ("-s", "--save2file"):
             save2file = True
+        if opt in ("-l", "--loop"):
+            loop = True
+        if opt in ("-p", "--processes"):
+            processes = True
+        if opt in ("-c", "--config"):
+            conf_folder = arg
+        if opt in ("-r", "--record"):
+            record_folder = arg
     logger.info("BEGINNING MAIN EXECUTION")
-    # Get the relative path to all the config files stored in /config folder.
-    conf_files = glob.glob("./resources/config/*.cfg")
+    # Get the relative path to all the config files stored in the folder.
+    conf_files = glob.glob(os.path.join(conf_folder, "*.cfg"))
     conf_files.sort()
     threads = []
-    # A Condition object for each camera thread execution.
-    conditions = []
-    # Shared variable for storing triangles. Writeable only by CameraThreads.
-    triangles = [{}, {}, {}, {}]
-    # Shared variable for storing triangles. Writeable only by DataFusionThread.
-    ntriangles = [{}, {}, {}, {}]
-    # Shared variable for storing the presence of UGVs in borders regions.
-    inborders = [{'1': False}, {'1': False}, {'1': False}, {'1': False}]
-    # Shared variable flags indicating ROI trackers reset orders.
-    reset_flags = [{'1': False}, {'1': False}, {'1': False}, {'1': False}]
+    workers = []
+    # Buffers for the detected triangles. Published only by CameraThreads.
+    measurements = []
+    # Buffers for the new triangles, the presence of UGVs in borders regions
+    # and the ROI trackers reset orders. Published only by DataFusionThread.
+    orders = []
     # A begin event for each camera will be created
     begin_events = []
     end_event = threading.Event()
-    # New thread instantiation for each configuration file.
-    for index, filename in enumerate(conf_files):
-        conditions.append(threading.Condition())
-        begin_events.append(threading.Event())
-        threads.append(CameraThread(triangles[index], ntriangles[index],
-                                    begin_events[index], end_event,
-                                    conditions[index], inborders[index],
-                                    reset_flags[index],
-                                    'Camera{}'.format(index), filename))
     # List containing the points defining the space limits of each camera.
     quadrant_limits = []
-    for camera_thread in threads:
-        quadrant_limits.append(camera_thread.camera._limits)
+    # Ids of the trackers of the UGVs, unique in all the cameras.
+    tracker_ids = exchange.IdAllocator()
+    if processes:
+        # The events are shared with the worker processes.
+        end_event = multiprocessing.Event()
+        begin_events = [multiprocessing.Event() for _ in conf_files]
+        # The limits are read without connecting to the cameras.
+        for filename in conf_files:
+            quadrant_limits.append(
+                    cameramodel.load_camera_model(filename).limits)
+        workers, measurements, orders = start_camera_processes(
+                conf_files, begin_events, end_event, tracker_ids)
+    else:
+        # New thread instantiation for each configuration file.
+        for index, filename in enumerate(conf_files):
+            measurements.append(exchange.SnapshotBuffer({}))
+            orders.append(exchange.SnapshotBuffer({'triangles': {},
+                                                   'inborders': {},
+                                                   'reset_flags': {}},
+                                                  size=1))
+            begin_events.append(threading.Event())
+            threads.append(CameraThread(measurements[index], orders[index],
+                                        begin_events[index], end_event,
+                                        'Camera{}'.format(index), filename,
+                                        tracker_ids))
+            quadrant_limits.append(threads[index].camera._limits)
+    # Replace the camera threads by a single thread polling every camera.
+    if loop and not processes:
+        threads = [CameraLoopThread(threads, end_event)]
     # Thread for merging the data obtained at every CameraThread.
-    threads.append(DataFusionThread(triangles, ntriangles, conditions,
-                                    inborders, quadrant_limits, begin_events,
-                                    end_event, reset_flags, save2file))
+    threads.append(DataFusionThread(measurements, orders, quadrant_limits,
+                                    begin_events, end_event, save2file,
+                                    record_folder))
     # Thread for getting user input.
     threads.append(UserThread(begin_events, end_event))
     # start threads
     for thread in threads:
         thread.start()
-    # wait for threads to end
+    # wait for threads and worker processes to end
     for thread in threads:
         thread.join()
+    for worker in workers:
+        worker.join()
 
 
 if __name__ == '__main__':
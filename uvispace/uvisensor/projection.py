@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""This module contains the projections between the image and the world.
+
+A *Projection* applies the homography of a camera, and its inverse, to
+arrays of 2-D points of any length e.g. the vertices of a triangle, the
+points of a contour or a whole route. Every point of the array is
+projected at once, with a single matrix product.
+
+The inverse of each homography is computed only once. The projections
+are cached by *get_projection*, so that the triangles transformed with
+the same homography, e.g. the ones of the same camera, share it.
+"""
+# Third party libraries
+import numpy as np
+
+# Maximum number of cached projections. The cache is emptied when full.
+MAX_PROJECTIONS = 64
+# Projections cached by get_projection, indexed by the homography bytes.
+_PROJECTIONS = {}
+
+
+def project_points(points, H):
+    """Apply an homography to an array of 2-D points.
+
+    The points are converted to homogeneous coordinates, multiplied by
+    the homography and divided by their scale factor *w*:
+
+    .. math::
+
+       (w \\cdot X) = H \\cdot Y
+
+    :param points: coordinates of the points, with the 2 coordinates in
+     the last axis.
+    :type points: numpy.array(shape=...x2)
+    :param H: Homography matrix.
+    :type H: np.array(shape=3x3)
+    :return: the projected coordinates, with the shape of *points*.
+    :rtype: numpy.array(dtype=float64)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    flat = points.reshape(-1, 2)
+    # Equivalent to multiplying H by every [x, y, 1] column vector.
+    product = np.dot(flat, H[:, :2].T)
+    product += H[:, 2]
+    projected = product[:, :2] / product[:, 2:]
+    return projected.reshape(points.shape)
+
+
+class Projection(object):
+    """Homography of a camera and its inverse.
+
+    The arrays are read-only, as the projections are shared.
+
+    :param H: Homography matrix, from the first plane to the second.
+    :type H: np.array(shape=3x3)
+    :param inverse_H: inverse of *H*. It is computed if not given.
+    :type inverse_H: np.array(shape=3x3)
+    :raises numpy.linalg.LinAlgError: if the homography is singular.
+    """
+
+    def __init__(self, H, inverse_H=None):
+        """Projection class constructor."""
+        self.H = np.array(H, dtype=np.float64)
+        if inverse_H is None:
+            inverse_H = np.linalg.inv(self.H)
+        self.inverse_H = np.array(inverse_H, dtype=np.float64)
+        self.H.flags.writeable = False
+        self.inverse_H.flags.writeable = False
+
+    def forward(self, points):
+        """Project points from the first plane to the second one.
+
+        :param points: coordinates of the points, with the 2
+         coordinates in the last axis.
+        :type points: numpy.array(shape=...x2)
+        :return: the projected coordinates, with the shape of *points*.
+        """
+        return project_points(points, self.H)
+
+    def backward(self, points):
+        """Project points from the second plane to the first one.
+
+        :param points: coordinates of the points, with the 2
+         coordinates in the last axis.
+        :type points: numpy.array(shape=...x2)
+        :return: the projected coordinates, with the shape of *points*.
+        """
+        return project_points(points, self.inverse_H)
+
+
+def get_projection(H, inverse_H=None):
+    """Get the projection of an homography matrix.
+
+    The projections are cached, so the inverse of every homography is
+    only computed once.
+
+    :param H: Homography matrix.
+    :type H: np.array(shape=3x3)
+    :param inverse_H: inverse of *H*, if it is already known. It is only
+     used when the projection is not cached yet.
+    :type inverse_H: np.array(shape=3x3)
+    :rtype: Projection
+    :raises numpy.linalg.LinAlgError: if the homography is singular.
+    """
+    H = np.asarray(H, dtype=np.float64)
+    key = H.tostring()
+    try:
+        projection = _PROJECTIONS[key]
+    except KeyError:
+        projection = Projection(H, inverse_H)
+        if len(_PROJECTIONS) >= MAX_PROJECTIONS:
+            _PROJECTIONS.clear()
+        _PROJECTIONS[key] = projection
+    return projection
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""Benchmark of the per-frame latency of the image binarization.
+
+The legacy binarization algorithm, that decoded the thresholds and
+allocated its kernels and intermediate images on every frame, is
+compared against the *imgprocessing.Binarizer* engine.
+
+The synthetic frames contain several bright triangles (some of them
+with holes) over a noisy dark background.
+
+**Usage: bench_binarize.py [-n <frames>], [--frames=<frames>]**
+"""
+# Standard libraries
+import getopt
+import sys
+import timeit
+# Third party libraries
+import cv2
+import numpy as np
+import skimage.morphology
+# Local libraries
+try:
+    import uvisensor.imgprocessing as imgprocessing
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+# Thresholds registers of the first video sensor configuration file.
+THRESHOLDS = (551040525, 784051947)
+SHAPES = ((480, 640), (960, 1280))
+
+
+def legacy_binarize(image, thresholds):
+    """Binarization algorithm previous to the Binarizer engine."""
+    th_min = bin(thresholds[0])
+    th_max = bin(thresholds[1])
+    red_c = (th_min[-30:-20], th_max[-30:-20])
+    thr_min = int(red_c[0], 2) / 4
+    thr_max = int(red_c[1], 2) / 4
+    raw_binarized = cv2.inRange(image, thr_min, thr_max)
+    kernel = np.ones((5, 5), np.uint8)
+    erosion = cv2.erode(raw_binarized, kernel, iterations=1)
+    kernel = np.ones((5, 5), np.uint8)
+    dilate = cv2.dilate(erosion, kernel, iterations=5)
+    mask = dilate / 255
+    filtered = raw_binarized * mask
+    labels = skimage.morphology.label(filtered)
+    label_count = np.bincount(labels.ravel())
+    background = np.argmax(label_count)
+    filtered[labels != background] = 255
+    return filtered
+
+
+def synthetic_frame(shape, triangles=4, seed=0):
+    """Get a grey frame with bright triangles over a noisy background."""
+    random = np.random.RandomState(seed)
+    image = random.randint(0, 90, size=shape).astype(np.uint8)
+    side = shape[0] // 10
+    for index in range(triangles):
+        row = (index + 1) * shape[0] // (triangles + 1)
+        col = (index + 1) * shape[1] // (triangles + 1)
+        vertices = np.array([[col - side // 2, row + side],
+                             [col + side // 2, row + side],
+                             [col, row - side]], np.int32)
+        cv2.fillConvexPoly(image, vertices, 160)
+        # Every other triangle has a dark hole, as reflections produce.
+        if index % 2:
+            cv2.circle(image, (col, row + side // 2), side // 8, 10, -1)
+    return image
+
+
+def main():
+    frames = 100
+    help_msg = 'Usage: bench_binarize.py [-n <frames>], [--frames=<frames>]'
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:", ["frames="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--frames"):
+            frames = int(arg)
+    print("{:>10} {:>14} {:>14} {:>8}".format('shape', 'legacy (ms)',
+                                              'binarizer (ms)', 'speedup'))
+    for shape in SHAPES:
+        image = synthetic_frame(shape)
+        binarizer = imgprocessing.Binarizer(shape)
+        binarizer.set_thresholds(THRESHOLDS)
+        legacy = min(timeit.repeat(
+                lambda: legacy_binarize(image, THRESHOLDS),
+                number=frames, repeat=3)) * 1000 / frames
+        engine = min(timeit.repeat(
+                lambda: binarizer.binarize(image),
+                number=frames, repeat=3)) * 1000 / frames
+        print("{:>10} {:>14.3f} {:>14.3f} {:>7.1f}x".format(
+                '{}x{}'.format(shape[1], shape[0]), legacy, engine,
+                legacy / engine))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""Benchmark of the barrel distortion correction of the contours.
+
+The legacy correction, that looped over the contours and recomputed the
+equation constants for each one, is compared against the batched
+*imgprocessing.DistortionModel.correct_contours* method.
+
+Each contour has 8 points, as the ones returned by the FPGA trackers.
+
+**Usage: bench_distortion.py [-n <frames>], [--frames=<frames>]**
+"""
+# Standard libraries
+import getopt
+import sys
+import timeit
+# Third party libraries
+import numpy as np
+# Local libraries
+try:
+    import uvisensor.imgprocessing as imgprocessing
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+SHAPE = (486, 648)
+CONTOURS_PER_FRAME = (1, 4, 16)
+
+
+def legacy_correction(contours, shape, kx=0.035, ky=0.035):
+    """Contours correction previous to the DistortionModel class."""
+    center = np.array(shape) / 2
+    for index, cnt in enumerate(contours):
+        distance = cnt - center
+        r = (distance ** 2).sum(axis=1).astype(np.float)
+        r /= (center ** 2).sum() * 2
+        coeffs = np.array([r*ky, r*kx]).transpose() + 1
+        corrected = distance * coeffs + center
+        contours[index] = corrected
+    return contours
+
+
+def main():
+    frames = 10000
+    help_msg = 'Usage: bench_distortion.py [-n <frames>], [--frames=<frames>]'
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:", ["frames="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--frames"):
+            frames = int(arg)
+    model = imgprocessing.get_distortion_model(0.035, 0.035, SHAPE)
+    random = np.random.RandomState(0)
+    print("{:>9} {:>12} {:>12} {:>8}".format('contours', 'legacy (us)',
+                                             'batched (us)', 'speedup'))
+    for number in CONTOURS_PER_FRAME:
+        contours = [random.uniform(0, SHAPE[0], (8, 2))
+                    for _ in range(number)]
+        legacy = min(timeit.repeat(
+                lambda: legacy_correction(list(contours), SHAPE),
+                number=frames, repeat=3)) * 1e6 / frames
+        batched = min(timeit.repeat(
+                lambda: model.correct_contours(contours),
+                number=frames, repeat=3)) * 1e6 / frames
+        print("{:>9} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+                number, legacy, batched, legacy / batched))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""Comparison of the linear and the extended Kalman filters.
+
+As in *sim_kalman.py*, a UGV moves with constant linear and angular
+speeds, and its pose is measured with a gaussian noise. The UGV turns
+several times, so the measured heading jumps between pi and -pi. The
+trajectory is run with several fusion periods and rates of dropped
+frames (cycles without measurement), and for each filter it is printed:
+
+* the RMS errors of the filtered positions and headings.
+* the number of cycles until the errors remain below 100 mm and 5
+  degrees.
+* the mean time of a predict and update step.
+
+**Usage: bench_ekf.py [-t <seconds>], [--time=<seconds>],
+[-s <seed>], [--seed=<seed>]**
+"""
+# Standard libraries
+import getopt
+import sys
+import timeit
+# Third party libraries
+import numpy as np
+# Local libraries
+try:
+    import uvisensor.kalmanfilter as kalmanfilter
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+PERIODS = (0.02, 0.1, 0.2)
+DROP_RATES = (0, 0.3)
+# Speed set points: linear=100mm/s, angular=0.5rad/s.
+SPEEDS = np.array([[100.], [0.5]])
+# Initial pose of the UGV. The filters start at the origin.
+INITIAL_POSE = np.array([400., -300., 3.])
+# Sensors standard deviations, and process noise of a 20 ms cycle.
+SENSOR_NOISE = np.array([50., 50., 2*np.pi/180])
+PREDICTION_NOISE = np.array([3.5**2, 3.5**2, 0.015**2])
+# Errors below which the filter is considered converged.
+MAX_POSITION_ERROR = 100
+MAX_HEADING_ERROR = 5*np.pi/180
+
+
+def trajectory(period, duration, drop_rate, seed):
+    """Get the real poses, measurements and detections of a UGV.
+
+    The poses are obtained integrating exactly the arcs described by
+    the UGV between cycles.
+    """
+    random = np.random.RandomState(seed)
+    cycles = int(duration / period)
+    linear, angular = SPEEDS[:, 0]
+    poses = np.empty((cycles, 3))
+    pose = INITIAL_POSE.copy()
+    for cycle in range(cycles):
+        theta = pose[2] + angular * period
+        pose[0] += linear / angular * (np.sin(theta) - np.sin(pose[2]))
+        pose[1] -= linear / angular * (np.cos(theta) - np.cos(pose[2]))
+        pose[2] = theta
+        poses[cycle] = pose
+    measurements = poses + random.normal(0, SENSOR_NOISE, poses.shape)
+    # The triangles headings are given in the [-pi, pi) interval.
+    measurements[:, 2] = kalmanfilter.wrap_angle(measurements[:, 2])
+    detected = random.rand(cycles) >= drop_rate
+    return poses, measurements, detected
+
+
+def run_filter(kalman, period, measurements, detected):
+    """Filter the measurements and get the states and time per step."""
+    kalman.set_prediction_noise(tuple(PREDICTION_NOISE * period / 0.02))
+    kalman.set_measurement_noise(tuple(SENSOR_NOISE**2))
+    states = np.empty(measurements.shape)
+    start_time = timeit.default_timer()
+    for cycle, measurement in enumerate(measurements):
+        state, P = kalman.predict(SPEEDS, period)
+        if detected[cycle]:
+            state, P = kalman.update(measurement.reshape(3, 1))
+        else:
+            # Keep the prediction, as the fusion thread does.
+            kalman._state, kalman._P = state, P
+        states[cycle] = state.ravel()
+    step_time = (timeit.default_timer() - start_time) / len(measurements)
+    return states, step_time
+
+
+def get_errors(states, poses):
+    """Get the RMS errors and the cycles until the filter converged."""
+    position_errors = np.hypot(*(states[:, :2] - poses[:, :2]).T)
+    heading_errors = np.abs(kalmanfilter.wrap_angle(states[:, 2]
+                                                    - poses[:, 2]))
+    failed = np.flatnonzero((position_errors > MAX_POSITION_ERROR)
+                            | (heading_errors > MAX_HEADING_ERROR))
+    convergence = failed[-1] + 1 if len(failed) else 0
+    return (np.sqrt(np.mean(position_errors**2)),
+            np.degrees(np.sqrt(np.mean(heading_errors**2))), convergence)
+
+
+def main():
+    duration = 60
+    seed = 0
+    help_msg = ('Usage: bench_ekf.py [-t <seconds>], [--time=<seconds>], '
+                '[-s <seed>], [--seed=<seed>]')
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "ht:s:", ["time=", "seed="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-t", "--time"):
+            duration = float(arg)
+        elif opt in ("-s", "--seed"):
+            seed = int(arg)
+    print("{:>7} {:>5} {:>7} {:>10} {:>10} {:>8} {:>10}".format(
+            'period', 'drop', 'filter', 'pos (mm)', 'head (deg)',
+            'cycles', 'step (us)'))
+    for period in PERIODS:
+        for drop_rate in DROP_RATES:
+            poses, measurements, detected = trajectory(period, duration,
+                                                       drop_rate, seed)
+            for extended in (False, True):
+                kalman = kalmanfilter.Kalman(extended=extended)
+                states, step_time = run_filter(kalman, period, measurements,
+                                               detected)
+                errors = get_errors(states, poses)
+                print("{:>7} {:>5} {:>7} {:>10.1f} {:>10.1f} {:>8} "
+                      "{:>10.1f}".format(period, drop_rate,
+                                         'EKF' if extended else 'linear',
+                                         errors[0], errors[1], errors[2],
+                                         step_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Benchmark of the time per step of long Kalman filter runs.
+
+A single filter follows a UGV moving on a circle, with a prediction and
+an update per step, as the data fusion thread does at 50 Hz. The run is
+split in blocks of steps, and the mean time per step of every block is
+printed. The time is constant along the run, with the history disabled
+and with a ring buffer of the last steps.
+
+**Usage: bench_kalman.py [-n <steps>], [--steps=<steps>],
+[-b <blocks>], [--blocks=<blocks>], [-l <length>], [--history=<length>]**
+"""
+# Standard libraries
+import getopt
+import sys
+import timeit
+# Third party libraries
+import numpy as np
+# Local libraries
+try:
+    import uvisensor.kalmanfilter as kalmanfilter
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+TIME_STEP = 0.02
+
+
+def run_block(kalman, first_step, steps, inputs, noise):
+    """Run some filter steps and return the mean time per step."""
+    start_time = timeit.default_timer()
+    for step in range(first_step, first_step + steps):
+        angle = step * TIME_STEP * inputs[1, 0]
+        measurement = np.array([[1000 * np.sin(angle)],
+                                [1000 - 1000 * np.cos(angle)],
+                                [angle]]) + noise[step % len(noise)]
+        kalman.predict(inputs, TIME_STEP)
+        kalman.update(measurement)
+    return (timeit.default_timer() - start_time) / steps
+
+
+def main():
+    steps = 1000000
+    blocks = 10
+    length = 1000
+    help_msg = ('Usage: bench_kalman.py [-n <steps>], [--steps=<steps>], '
+                '[-b <blocks>], [--blocks=<blocks>], [-l <length>], '
+                '[--history=<length>]')
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:b:l:",
+                                   ["steps=", "blocks=", "history="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--steps"):
+            steps = int(arg)
+        elif opt in ("-b", "--blocks"):
+            blocks = int(arg)
+        elif opt in ("-l", "--history"):
+            length = int(arg)
+    # Linear speed of 100 mm/s on a circle of 1 m radius.
+    inputs = np.array([[100.], [0.1]])
+    noise = np.random.RandomState(0).normal(
+            0, [[50], [50], [0.03]], size=(1000, 3, 1))
+    block_steps = steps // blocks
+    print("{:>10} {:>16} {:>16}".format(
+            'steps', 'no history (us)', 'history (us)'))
+    kalmans = [kalmanfilter.Kalman(), kalmanfilter.Kalman(history=length)]
+    for kalman in kalmans:
+        kalman.set_prediction_noise((3.5**2, 3.5**2, 0.015**2))
+        kalman.set_measurement_noise((50**2, 50**2, 0.03**2))
+    for block in range(blocks):
+        times = [run_block(kalman, block * block_steps, block_steps, inputs,
+                           noise) * 1e6 for kalman in kalmans]
+        print("{:>10} {:>16.1f} {:>16.1f}".format(
+                (block + 1) * block_steps, *times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Benchmark of the Kalman filters of a fleet of UGVs.
+
+Every cycle, the data fusion thread predicts the pose of every UGV with
+its speed set points and merges it with the pose measured by the
+cameras. The cycle is run with a *Kalman* object per UGV, and with a
+single *KalmanBank* that masks the UGVs not detected on the cycle.
+
+**Usage: bench_kalman_bank.py [-n <cycles>], [--cycles=<cycles>]**
+"""
+# Standard libraries
+import getopt
+import sys
+import timeit
+# Third party libraries
+import numpy as np
+# Local libraries
+try:
+    import uvisensor.kalmanfilter as kalmanfilter
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+FLEETS = (1, 10, 100)
+TIME_STEP = 0.02
+PREDICTION_NOISE = (3.5**2, 3.5**2, 0.015**2)
+MEASUREMENT_NOISE = (50**2, 50**2, (2*np.pi/180)**2)
+
+
+def fleet_data(robots, cycles, seed=0):
+    """Get random speeds, measurements and detections of a fleet."""
+    random = np.random.RandomState(seed)
+    inputs = random.normal(0, [[100], [0.5]], size=(cycles, robots, 2, 1))
+    measurements = random.normal(0, 500, size=(cycles, robots, 3, 1))
+    detected = random.rand(cycles, robots) > 0.1
+    return inputs, measurements, detected
+
+
+def run_filters(robots, data):
+    """Run a cycle of every UGV with a Kalman object each."""
+    kalmans = [kalmanfilter.Kalman() for _ in range(robots)]
+    for inputs, measurements, detected in zip(*data):
+        for index, kalman in enumerate(kalmans):
+            kalman.set_prediction_noise(PREDICTION_NOISE)
+            kalman.predict(inputs[index], TIME_STEP)
+            if detected[index]:
+                kalman.set_measurement_noise(MEASUREMENT_NOISE)
+            else:
+                kalman.set_measurement_noise((1000**2, 1000**2,
+                                              2*np.pi**2))
+            kalman.update(measurements[index])
+
+
+def run_bank(robots, data):
+    """Run a cycle of all the UGVs at once with a KalmanBank."""
+    bank = kalmanfilter.KalmanBank(robots)
+    for inputs, measurements, detected in zip(*data):
+        bank.set_prediction_noise(PREDICTION_NOISE)
+        bank.predict(inputs, TIME_STEP)
+        bank.set_measurement_noise(MEASUREMENT_NOISE)
+        bank.update(measurements, mask=detected)
+
+
+def main():
+    cycles = 500
+    help_msg = 'Usage: bench_kalman_bank.py [-n <cycles>], [--cycles=<cycles>]'
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:", ["cycles="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--cycles"):
+            cycles = int(arg)
+    print("{:>6} {:>14} {:>14} {:>8}".format('UGVs', 'Kalman (us)',
+                                              'KalmanBank (us)', 'ratio'))
+    for robots in FLEETS:
+        data = fleet_data(robots, cycles)
+        times = []
+        for function in (run_filters, run_bank):
+            start_time = timeit.default_timer()
+            function(robots, data)
+            times.append((timeit.default_timer() - start_time) / cycles * 1e6)
+        print("{:>6} {:>14.1f} {:>14.1f} {:>8.1f}".format(
+                robots, times[0], times[1], times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""Benchmark of the messages of the pose and speed buses.
+
+First, the time for encoding and decoding a pose and a speed message is
+measured, with JSON and with the binary layouts of *messages*.
+
+Then, the chain of processes is reproduced over TCP: the main process
+publishes the poses, as *multiplecamera*, a *navigator* process decodes
+them and publishes a speed message for each one, and a *messenger*
+process decodes the speeds. The poses are published every given period,
+or as fast as possible with a period of 0. For each format, the number
+of speed messages received, the throughput and the median and 99th
+percentile of the latency from the pose publication to the speed
+reception are printed.
+
+**Usage: bench_messages.py [-n <messages>], [--messages=<messages>],
+[-p <seconds>], [--period=<seconds>]**
+"""
+# Standard libraries
+import getopt
+import multiprocessing
+import sys
+import time
+import timeit
+# Third party libraries
+import numpy as np
+import zmq
+# Local libraries
+try:
+    import messages
+    from uvisensor.scheduler import monotonic
+except ImportError:
+    # Exit program if the uvispace package can't be found.
+    sys.exit("Can't find messages module. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+POSE = {'x': 1520.25, 'y': -340.5, 'theta': 2.75, 'step': 42}
+SPEED = {'step': 42, 'timestamp': 1234.5625, 'linear': 250.0,
+         'angular': -0.5, 'sp_left': 160, 'sp_right': 94}
+# Time without messages after which the chain processes finish.
+IDLE_TIMEOUT = 1000
+
+
+def time_codec(binary, repeat=100000):
+    """Get the mean time, in microseconds, of a message round trip."""
+    elapsed = []
+    for topic, message in ((messages.POSE, POSE), (messages.SPEED, SPEED)):
+        elapsed.append(timeit.timeit(
+                lambda: messages.decode(messages.encode(topic, message,
+                                                        binary)),
+                number=repeat) / repeat * 1e6)
+    return elapsed
+
+
+def run_navigator(pose_port, speed_port, binary):
+    """Publish a speed message for every pose received."""
+    context = zmq.Context()
+    pose_subscriber = context.socket(zmq.SUB)
+    pose_subscriber.setsockopt_string(zmq.SUBSCRIBE, u"")
+    pose_subscriber.connect("tcp://localhost:{}".format(pose_port))
+    speed_publisher = context.socket(zmq.PUB)
+    speed_publisher.bind("tcp://*:{}".format(speed_port))
+    speed = dict(SPEED)
+    while pose_subscriber.poll(IDLE_TIMEOUT):
+        pose = messages.recv(pose_subscriber, messages.POSE)
+        speed['step'] = pose['step']
+        speed['timestamp'] = monotonic()
+        messages.send(speed_publisher, messages.SPEED, speed,
+                      binary=binary)
+    pose_subscriber.close(linger=0)
+    speed_publisher.close(linger=0)
+    context.term()
+
+
+def run_messenger(speed_port, ready, results):
+    """Record the reception time of every speed message."""
+    context = zmq.Context()
+    speed_subscriber = context.socket(zmq.SUB)
+    speed_subscriber.setsockopt_string(zmq.SUBSCRIBE, u"")
+    speed_subscriber.connect("tcp://localhost:{}".format(speed_port))
+    received = []
+    while speed_subscriber.poll(IDLE_TIMEOUT):
+        speed = messages.recv(speed_subscriber, messages.SPEED)
+        if not speed['step']:
+            # Messages sent until the chain is connected.
+            ready.set()
+            continue
+        received.append((speed['step'], monotonic()))
+    speed_subscriber.close(linger=0)
+    context.term()
+    results.send(received)
+
+
+def run_chain(count, period, binary, ports=(35900, 35901)):
+    """Publish the poses through the chain and get the speeds timing."""
+    context = zmq.Context()
+    pose_publisher = context.socket(zmq.PUB)
+    pose_publisher.bind("tcp://*:{}".format(ports[0]))
+    ready = multiprocessing.Event()
+    results, results_sender = multiprocessing.Pipe(False)
+    workers = [
+        multiprocessing.Process(target=run_navigator,
+                                args=(ports[0], ports[1], binary)),
+        multiprocessing.Process(target=run_messenger,
+                                args=(ports[1], ready, results_sender)),
+    ]
+    for worker in workers:
+        worker.start()
+    # The subscribers lose the messages sent before they are connected.
+    pose = dict(POSE, step=0)
+    while not ready.is_set():
+        messages.send(pose_publisher, messages.POSE, pose, binary=binary)
+        time.sleep(0.01)
+    time.sleep(0.1)
+    send_times = np.zeros(count + 1)
+    start_time = monotonic()
+    for step in range(1, count + 1):
+        pose['step'] = step
+        if period:
+            # Wait until the next cycle, without sleeping the last ms.
+            deadline = start_time + step * period
+            if deadline - monotonic() > 0.001:
+                time.sleep(deadline - monotonic() - 0.001)
+            while monotonic() < deadline:
+                pass
+        send_times[step] = monotonic()
+        messages.send(pose_publisher, messages.POSE, pose, binary=binary)
+    received = np.array(results.recv()).reshape(-1, 2)
+    for worker in workers:
+        worker.join()
+    pose_publisher.close(linger=0)
+    context.term()
+    steps = received[:, 0].astype(int)
+    latencies = (received[:, 1] - send_times[steps]) * 1e6
+    elapsed = received[-1, 1] - send_times[1] if len(received) else np.nan
+    return (len(received), len(received) / elapsed,
+            np.median(latencies), np.percentile(latencies, 99))
+
+
+def main():
+    count = 5000
+    period = 0.02
+    help_msg = ('Usage: bench_messages.py [-n <messages>], '
+                '[--messages=<messages>], [-p <seconds>], '
+                '[--period=<seconds>]')
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:p:",
+                                   ["messages=", "period="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--messages"):
+            count = int(arg)
+        elif opt in ("-p", "--period"):
+            period = float(arg)
+    print("{:>7} {:>11} {:>12}".format('format', 'pose (us)', 'speed (us)'))
+    for binary in (False, True):
+        print("{:>7} {:>11.2f} {:>12.2f}".format(
+                'binary' if binary else 'json', *time_codec(binary)))
+    print("{:>7} {:>9} {:>10} {:>13} {:>10}".format(
+            'format', 'received', 'msg/s', 'median (us)', 'p99 (us)'))
+    for binary in (False, True):
+        print("{:>7} {:>9} {:>10.0f} {:>13.0f} {:>10.0f}".format(
+                'binary' if binary else 'json',
+                *run_chain(count, period, binary)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Benchmark of the recording of the UGVs poses during long runs.
+
+Every cycle, the data fusion thread records a row with the time and the
+pose of each UGV. The rows are appended with *np.vstack*, as it was
+done before, and with a *recorder.Recorder* in memory and mapped to a
+temporary file. The run is split in blocks of rows, and the mean time
+per append of every block is printed. The *np.vstack* appends are only
+run until they take longer than the given limit.
+
+**Usage: bench_recorder.py [-n <rows>], [--rows=<rows>],
+[-b <blocks>], [--blocks=<blocks>], [-l <seconds>], [--limit=<seconds>]**
+"""
+# Standard libraries
+import getopt
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+# Third party libraries
+import numpy as np
+# Local libraries
+try:
+    import recorder
+except ImportError:
+    # Exit program if the uvispace package can't be found.
+    sys.exit("Can't find recorder module. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+
+def append_vstack(history, rows):
+    """Append the rows one by one with np.vstack."""
+    for row in rows:
+        history = np.vstack((history, row))
+    return history
+
+
+def append_recorder(history, rows):
+    """Append the rows one by one to a recorder."""
+    for row in rows:
+        history.append((row[0], row[1], row[2], row[3]))
+    return history
+
+
+def main():
+    rows = 1000000
+    blocks = 10
+    limit = 60
+    help_msg = ('Usage: bench_recorder.py [-n <rows>], [--rows=<rows>], '
+                '[-b <blocks>], [--blocks=<blocks>], [-l <seconds>], '
+                '[--limit=<seconds>]')
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:b:l:",
+                                   ["rows=", "blocks=", "limit="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--rows"):
+            rows = int(arg)
+        elif opt in ("-b", "--blocks"):
+            blocks = int(arg)
+        elif opt in ("-l", "--limit"):
+            limit = float(arg)
+    block_rows = rows // blocks
+    data = np.random.RandomState(0).normal(0, 1000, size=(block_rows, 4))
+    folder = tempfile.mkdtemp()
+    histories = [np.zeros((0, 4)), recorder.Recorder(4),
+                 recorder.Recorder(4, filename=os.path.join(folder,
+                                                            'ugv.dat'))]
+    functions = [append_vstack, append_recorder, append_recorder]
+    elapsed = 0
+    print("{:>10} {:>12} {:>14} {:>14}".format(
+            'rows', 'vstack (us)', 'memory (us)', 'mapped (us)'))
+    try:
+        for block in range(blocks):
+            times = []
+            for index, function in enumerate(functions):
+                if index == 0 and elapsed > limit:
+                    times.append(float('nan'))
+                    continue
+                start_time = timeit.default_timer()
+                histories[index] = function(histories[index], data)
+                block_time = timeit.default_timer() - start_time
+                if index == 0:
+                    elapsed += block_time
+                times.append(block_time / block_rows * 1e6)
+            print("{:>10} {:>12.1f} {:>14.2f} {:>14.2f}".format(
+                    (block + 1) * block_rows, *times))
+        start_time = timeit.default_timer()
+        histories[2].close()
+        print("Mapped file closed in {:.1f} ms".format(
+                (timeit.default_timer() - start_time) * 1e3))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Benchmark of the conversion of the register replies.
+
+The replies are converted with *ast.literal_eval*, as done previously,
+and with the *client.parse_reply* and *client.parse_binary_reply*
+functions. Every conversion includes building the numpy array of the
+points, as the camera threads do with the ACTUAL_LOCATION replies.
+
+The replies reproduce the formats sent by the FPGA: the image shape
+tuple and the tracker points, with 8 contour points per tracker.
+
+**Usage: bench_replies.py [-n <replies>], [--replies=<replies>]**
+"""
+# Standard libraries
+import ast
+import getopt
+import struct
+import sys
+import timeit
+# Third party libraries
+import numpy as np
+# Local libraries
+try:
+    import uvisensor.client as client
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+POINTS = 8
+TRACKERS = (1, 4)
+
+
+def location_replies(trackers, points=POINTS, seed=0):
+    """Get the text and binary replies of an ACTUAL_LOCATION read."""
+    random = np.random.RandomState(seed)
+    locations = {}
+    payload = []
+    for tracker in range(1, trackers + 1):
+        coords = random.randint(0, 2000, size=(points, 2))
+        locations[str(tracker)] = coords.tolist()
+        payload.extend([tracker, points] + coords.ravel().tolist())
+    binary = struct.pack('<{}i'.format(len(payload)), *payload)
+    return '{}\n'.format(locations), binary
+
+
+def literal_location(reply):
+    """Conversion of a location reply previous to parse_reply."""
+    return dict((key, np.array(value))
+                for key, value in ast.literal_eval(reply).items())
+
+
+def main():
+    replies = 10000
+    help_msg = 'Usage: bench_replies.py [-n <replies>], [--replies=<replies>]'
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:", ["replies="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--replies"):
+            replies = int(arg)
+    cases = [('shape', '(640, 480)\n', ast.literal_eval, 't',
+              struct.pack('<2i', 640, 480))]
+    for trackers in TRACKERS:
+        text, binary = location_replies(trackers)
+        cases.append(('{} tracker(s)'.format(trackers), text,
+                      literal_location, 'd', binary))
+    print("{:>14} {:>14} {:>14} {:>14} {:>8}".format(
+            'reply', 'literal (us)', 'text (us)', 'binary (us)', 'speedup'))
+    for name, text, legacy, kind, binary in cases:
+        literal = min(timeit.repeat(lambda: legacy(text), number=replies,
+                                    repeat=3)) * 1e6 / replies
+        parsed = min(timeit.repeat(lambda: client.parse_reply(text),
+                                   number=replies, repeat=3)) * 1e6 / replies
+        decoded = min(timeit.repeat(
+                lambda: client.parse_binary_reply(kind, binary),
+                number=replies, repeat=3)) * 1e6 / replies
+        print("{:>14} {:>14.2f} {:>14.2f} {:>14.2f} {:>7.1f}x".format(
+                name, literal, parsed, decoded, literal / parsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Benchmark of the triangles classification in cluttered frames.
+
+The legacy classification, that ran the polygon approximation on every
+contour and created a *geometry.Triangle* for each triangle found, is
+compared against *imgprocessing.classify_triangles*.
+
+The contours are extracted from a binary frame with 4 triangles and a
+variable number of round reflections and small specks.
+
+**Usage: bench_shapes.py [-n <frames>], [--frames=<frames>]**
+"""
+# Standard libraries
+import getopt
+import logging
+import sys
+import timeit
+# Third party libraries
+import cv2
+import numpy as np
+import skimage.measure
+# Local libraries
+try:
+    import uvisensor.geometry as geometry
+    import uvisensor.imgprocessing as imgprocessing
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+SHAPE = (486, 648)
+REFLECTIONS = (0, 12, 48)
+
+
+def legacy_classification(contours, shape, tolerance=8):
+    """Triangles classification previous to classify_triangles."""
+    triangles = []
+    for cnt in contours:
+        coords = skimage.measure.approximate_polygon(cnt, tolerance)
+        max_coords = np.array(shape) - 1
+        if len(coords) == 3 and (not np.array_equal(coords[0], coords[-1])):
+            triangle = geometry.Triangle(np.clip(coords, [0,0], max_coords))
+            triangles.append(triangle)
+        if len(coords) == 4 and np.array_equal(coords[0], coords[-1]):
+            triangle = geometry.Triangle(np.clip(coords[1:],
+                                                 [0,0], max_coords))
+            triangles.append(triangle)
+    return triangles
+
+
+def cluttered_contours(reflections, seed=0):
+    """Get the contours of a binary frame with triangles and reflections."""
+    random = np.random.RandomState(seed)
+    image = np.zeros(SHAPE, np.uint8)
+    for col in (100, 250, 400, 550):
+        vertices = np.array([[col - 15, 300], [col + 15, 300],
+                             [col, 250]], np.int32)
+        cv2.fillConvexPoly(image, vertices, 255)
+    for _ in range(reflections):
+        center = (random.randint(0, SHAPE[1]), random.randint(0, 200))
+        radius = random.randint(1, 15)
+        cv2.circle(image, center, radius, 255, -1)
+    return skimage.measure.find_contours(image, 200)
+
+
+def main():
+    frames = 200
+    help_msg = 'Usage: bench_shapes.py [-n <frames>], [--frames=<frames>]'
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:", ["frames="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--frames"):
+            frames = int(arg)
+    # The legacy classification is measured without its debug messages.
+    logging.disable(logging.DEBUG)
+    max_coords = np.array(SHAPE) - 1
+    print("{:>11} {:>9} {:>12} {:>12} {:>8}".format(
+            'reflections', 'contours', 'legacy (ms)', 'batch (ms)',
+            'speedup'))
+    for reflections in REFLECTIONS:
+        contours = cluttered_contours(reflections)
+        legacy = min(timeit.repeat(
+                lambda: legacy_classification(contours, SHAPE),
+                number=frames, repeat=3)) * 1000 / frames
+        batch = min(timeit.repeat(
+                lambda: imgprocessing.classify_triangles(contours,
+                                                         max_coords),
+                number=frames, repeat=3)) * 1000 / frames
+        print("{:>11} {:>9} {:>12.3f} {:>12.3f} {:>7.1f}x".format(
+                reflections, len(contours), legacy, batch, legacy / batch))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Benchmark of the frame rate achieved by the frame capture modes.
+
+A simulated camera, with the geometry of the first configuration file,
+captures a frame at the beginning of every sensor frame. Every captured
+frame is binarized, as the calibration and video tools do, and then an
+additional processing time is simulated with a sleep. The loop of
+*VideoSensor.capture_frame* calls is compared against the *FrameStream*
+iterator, without and with the prefetch of the next frame.
+
+**Usage: bench_stream.py [-n <frames>], [--frames=<frames>],
+[-f <fps>], [--fps=<fps>]**
+"""
+# Standard libraries
+import getopt
+import os
+import shutil
+import sys
+import tempfile
+import time
+# Local libraries
+try:
+    import uvisensor.imgprocessing as imgprocessing
+    from uvisensor.resources import sim_cameras
+    from uvisensor.scheduler import monotonic
+    import uvisensor.videosensor as videosensor
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+CONF_FILE = os.path.join(os.path.dirname(__file__), 'config',
+                         'video_sensor1.cfg')
+# Additional processing time of every frame, in milliseconds.
+LOADS = (0, 20, 40)
+
+
+def capture_loop(camera, frames, process):
+    """Capture and process frames with *capture_frame*."""
+    start_time = monotonic()
+    for _ in range(frames):
+        process(camera.capture_frame())
+    return frames / (monotonic() - start_time)
+
+
+def stream_loop(camera, frames, process, prefetch):
+    """Capture and process frames with a *FrameStream*."""
+    stream = camera.stream_frames(frames=frames, prefetch=prefetch)
+    for _, frame in stream:
+        process(frame)
+    return stream.stats['fps']
+
+
+def main():
+    frames = 50
+    fps = 30.0
+    help_msg = ('Usage: bench_stream.py [-n <frames>], [--frames=<frames>], '
+                '[-f <fps>], [--fps=<fps>]')
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:f:", ["frames=", "fps="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-n", "--frames"):
+            frames = int(arg)
+        elif opt in ("-f", "--fps"):
+            fps = float(arg)
+    world = sim_cameras.SimulatedWorld(robots=4, fps=fps)
+    server = sim_cameras.CameraServer(sim_cameras.SimulatedCamera(world,
+                                                                  CONF_FILE))
+    server.start()
+    folder = tempfile.mkdtemp()
+    conf_file = os.path.join(folder, 'camera.cfg')
+    sim_cameras.write_config(CONF_FILE, conf_file, server.port)
+    camera = videosensor.camera_startup(conf_file)
+    binarizer = imgprocessing.Binarizer()
+    binarizer.set_thresholds(camera._params['red_thresholds'])
+    print("Sensor at {:.1f} fps".format(fps))
+    print("{:>10} {:>14} {:>8} {:>18}".format('load (ms)', 'capture_frame',
+                                              'stream', 'stream+prefetch'))
+    for load in LOADS:
+        def process(frame):
+            binarizer.binarize(frame)
+            time.sleep(load / 1000.)
+        print("{:>10} {:>14.1f} {:>8.1f} {:>18.1f}".format(
+                load, capture_loop(camera, frames, process),
+                stream_loop(camera, frames, process, prefetch=False),
+                stream_loop(camera, frames, process, prefetch=True)))
+    camera.disconnect_client()
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
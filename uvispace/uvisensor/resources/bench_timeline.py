@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Benchmark of the fusion of measurements received with latency jitter.
+
+Several UGVs move with speed set points that change every 20 ms. Each
+UGV is measured at 50 Hz by one of 4 cameras, whose cycles are out of
+phase, and every measurement reaches the data fusion thread after a
+random latency, as the TCP reads of the FPGA registers. The fusion
+thread publishes the poses every 20 ms.
+
+The events are fused with a *timeline.FusionTimeline* in 2 ways: with
+the time when they are received, as if they were current, and with the
+time when they were captured, in time order. For each mean latency
+jitter, the RMS errors of the published poses and the mean time of a
+fusion cycle are printed.
+
+The first second of the simulation is not evaluated, as the filters
+are converging, so the duration must be a little longer.
+
+**Usage: bench_timeline.py [-t <seconds>], [--time=<seconds>],
+[-r <robots>], [--robots=<robots>]**
+"""
+# Standard libraries
+import getopt
+import sys
+import timeit
+# Third party libraries
+import numpy as np
+# Local libraries
+try:
+    import uvisensor.timeline as timeline
+    from uvisensor.kalmanfilter import wrap_angle
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+CYCLE = 0.02
+CAMERAS = 4
+# Mean latency jitter of the measurements, over a 2 ms minimum.
+JITTERS = (0.002, 0.01, 0.03)
+# Standard deviation of the measured poses.
+SENSOR_NOISE = np.array([10., 10., 1*np.pi/180])
+# Integration step of the real trajectories.
+SIM_STEP = 0.001
+# Time for the filters to converge, not evaluated.
+WARM_UP = 1.0
+
+
+def simulate(robots, duration, jitter, seed=0):
+    """Get the real poses and the received events of the UGVs.
+
+    :return: the real poses every 1 ms, and the events with their
+     reception time, capture time, kind, slots and values.
+    """
+    random = np.random.RandomState(seed)
+    steps = int(duration / SIM_STEP)
+    sim_times = np.arange(steps) * SIM_STEP
+    poses = np.zeros((steps, robots, 3))
+    poses[0, :, :2] = random.uniform(-1000, 1000, (robots, 2))
+    events = []
+    speeds = np.zeros((robots, 2))
+    phases = random.rand(robots) * CYCLE
+    camera_phases = np.arange(CAMERAS) * CYCLE / CAMERAS
+    for step in range(1, steps):
+        now = sim_times[step]
+        # New speed set points, sent 1 ms before they are applied.
+        for slot in np.flatnonzero(
+                (now - phases) % CYCLE < SIM_STEP - 1e-9):
+            speeds[slot] = (300, 1.5 * np.sin(0.7 * now + slot))
+            events.append((now + 0.001, now, 'speeds', slot,
+                           tuple(speeds[slot])))
+        pose = poses[step - 1].copy()
+        pose[:, 0] += speeds[:, 0] * np.cos(pose[:, 2]) * SIM_STEP
+        pose[:, 1] += speeds[:, 0] * np.sin(pose[:, 2]) * SIM_STEP
+        pose[:, 2] += speeds[:, 1] * SIM_STEP
+        poses[step] = pose
+        # Measurements of the UGVs of each camera.
+        for camera in np.flatnonzero(
+                (now - camera_phases) % CYCLE < SIM_STEP - 1e-9):
+            slots = np.arange(camera, robots, CAMERAS)
+            if not len(slots):
+                continue
+            measured = pose[slots] + random.normal(0, SENSOR_NOISE,
+                                                   (len(slots), 3))
+            measured[:, 2] = wrap_angle(measured[:, 2])
+            latency = 0.002 + random.exponential(jitter)
+            events.append((now + latency, now, 'poses', slots, measured))
+    events.sort(key=lambda event: event[0])
+    return sim_times, poses, events
+
+
+def run_fusion(robots, sim_times, poses, events, use_capture):
+    """Fuse the events every cycle and get the errors and cycle time."""
+    fusion = timeline.FusionTimeline(
+            window=0.1, measurement_noise=tuple(SENSOR_NOISE**2))
+    for _ in range(robots):
+        fusion.add()
+    errors = []
+    elapsed = 0
+    index = 0
+    for now in np.arange(CYCLE, sim_times[-1], CYCLE):
+        start_time = timeit.default_timer()
+        while index < len(events) and events[index][0] <= now:
+            received, captured, kind, slots, values = events[index]
+            timestamp = captured if use_capture else received
+            if kind == 'speeds':
+                fusion.add_speeds(slots, timestamp, *values)
+            else:
+                fusion.add_poses(timestamp, slots, values)
+            index += 1
+        states = fusion.estimate(now)[:, :, 0]
+        elapsed += timeit.default_timer() - start_time
+        real = poses[int(round(now / SIM_STEP))]
+        errors.append(np.hstack((
+                np.hypot(*(states[:, :2] - real[:, :2]).T)[:, np.newaxis],
+                np.abs(wrap_angle(states[:, 2:] - real[:, 2:])))))
+    cycles = len(errors)
+    # Skip the first second, while the filters converge.
+    errors = np.array(errors[int(WARM_UP / CYCLE):])
+    rms = np.sqrt(np.mean(errors**2, axis=(0, 1)))
+    return rms[0], np.degrees(rms[1]), elapsed / cycles * 1e6
+
+
+def main():
+    duration = 20
+    robots = 4
+    help_msg = ('Usage: bench_timeline.py [-t <seconds>], [--time=<seconds>]'
+                ', [-r <robots>], [--robots=<robots>]')
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "ht:r:",
+                                   ["time=", "robots="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print(help_msg)
+            sys.exit()
+        elif opt in ("-t", "--time"):
+            duration = float(arg)
+        elif opt in ("-r", "--robots"):
+            robots = int(arg)
+    if duration < WARM_UP + 2 * CYCLE:
+        sys.exit("The duration must be at least {}s.".format(
+                WARM_UP + 2 * CYCLE))
+    print("{:>11} {:>10} {:>10} {:>10} {:>10}".format(
+            'jitter (s)', 'timestamp', 'pos (mm)', 'head (deg)',
+            'cycle (us)'))
+    for jitter in JITTERS:
+        data = simulate(robots, duration, jitter)
+        for use_capture in (False, True):
+            errors = run_fusion(robots, *data, use_capture=use_capture)
+            print("{:>11} {:>10} {:>10.1f} {:>10.2f} {:>10.0f}".format(
+                    jitter, 'capture' if use_capture else 'reception',
+                    *errors))
+
+
+if __name__ == '__main__':
+    main()
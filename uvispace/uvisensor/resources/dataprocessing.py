@@ -48,12 +48,16 @@ class DataAnalyzer(object):
     def set_data(self, data):
         """Update raw_data matrix with time and poses.
 
+        The data is not copied, e.g. the rows of a *recorder.Recorder*
+        are analyzed in place. The methods of the analyzer replace the
+        raw_data matrix, but never modify it.
+
         :param data: Matrix of floats64 with M data.
         :type data: numpy.array float64 (shape=Mx4).
         :return: data matrix loaded.
         :rtype: numpy.array float64 (shape=Mx4).
         """
-        self._raw_data = np.copy(data)
+        self._raw_data = np.asarray(data, dtype=np.float64)
         return data
 
     def set_setpoints(self, sp_left, sp_right):
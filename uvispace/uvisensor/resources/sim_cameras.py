@@ -0,0 +1,516 @@
+#!/usr/bin/env python
+"""This module simulates the FPGA cameras for testing uvisensor offline.
+
+Each simulated camera is a local TCP server that speaks the protocol of
+*client.Client*:
+
+* 'r,<register>' and 'b,<register>' read a register, with a text or a
+  binary reply, and 'w,<register>,<value>' writes it.
+* 'S' waits for the next frame and captures it, and then it is sent
+  with 'G' (gray) or 'D' (color). 'C' configures the camera and 'Q'
+  closes the connection.
+
+The cameras watch a *SimulatedWorld*, where M UGVs, represented by
+triangles, move along ellipses crossing the 4 quadrants. The geometry of
+every camera (image shape, quadrant offsets and homography) is read from
+its configuration file, so the UGVs are projected at the pixels where
+*multiplecamera* expects them. The world state advances at the
+configured frame rate.
+
+The ROI trackers are emulated as well: every window set with the
+'SET_WINDOW' register follows the UGV inside it, and the
+'ACTUAL_LOCATION' register replies the contour points of every tracked
+triangle, in FPGA coordinates, or an empty list if it was lost.
+
+When run as a script, N cameras are served on consecutive ports, and a
+copy of their configuration files pointing to the simulated servers is
+written to the output folder. Then, *multiplecamera* can be run with the
+option '--config=<folder>'. The configuration files are used cyclically
+when N is greater than their number.
+
+**Usage: sim_cameras.py [-n <cameras>], [--cameras=<cameras>],
+[-r <robots>], [--robots=<robots>], [-f <fps>], [--fps=<fps>],
+[-p <port>], [--port=<port>], [-o <folder>], [--output=<folder>],
+[--resolution=<width>x<height>]**
+"""
+# Standard libraries
+import ConfigParser
+import getopt
+import glob
+import logging
+import os
+import signal
+import SocketServer
+import struct
+import sys
+import threading
+import time
+# Third party libraries
+import cv2
+import numpy as np
+# Local libraries
+try:
+    from uvisensor.cameramodel import load_camera_model
+    from uvisensor.client import Client
+    from uvisensor.imgprocessing import decode_thresholds
+    from uvisensor.scheduler import monotonic
+except ImportError:
+    # Exit program if the uvisensor package can't be found.
+    sys.exit("Can't find uvisensor package. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+
+try:
+    # Logging setup.
+    import settings
+except ImportError:
+    # Exit program if the settings module can't be found.
+    sys.exit("Can't find settings module. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+logger = logging.getLogger('sensor')
+
+# Header of the binary replies: kind of value and length of the payload.
+_BINARY_HEADER = struct.Struct('<cI')
+# Register identifiers, and their key names.
+_REGISTER_NAMES = dict((value, key) for key, value
+                       in Client._REGISTERS.items())
+WELCOME = 'Welcome to the UviSpace camera simulator\n'
+
+
+class SimulatedWorld(object):
+    """UGVs moving along ellipses around the center of the space.
+
+    The UGVs have different ellipses and directions, so that they cross
+    the borders between the cameras. Their poses are a function of the
+    time, quantized to the frame period, and thus they can be computed
+    by several threads without sharing any state.
+
+    :param int robots: number of simulated UGVs. Their ids are 1 to M.
+    :param float fps: frames per second. The poses are only updated at
+     the beginning of every frame.
+    :param float speed: linear speed of the UGVs, in mm/s.
+    :param center: [x, y] center of the ellipses, in mm.
+    :param axes: [x, y] semi-axes of the biggest ellipse, in mm.
+    :param length: height of the triangles, from the base to the
+     front vertex, in mm.
+    :param width: base of the triangles, in mm.
+    """
+
+    def __init__(self, robots=1, fps=50.0, speed=300.0, center=(0, 100),
+                 axes=(1500, 1100), length=200, width=120):
+        """Class constructor. Set the trajectory of every UGV."""
+        self.robot_ids = range(1, robots + 1)
+        self.fps = float(fps)
+        self.center = np.array(center, dtype=float)
+        # Scale of the ellipse, initial phase and direction of every UGV.
+        scales = np.arange(robots, 0, -1, dtype=float) / robots
+        self.axes = np.outer(0.4 + 0.6 * scales, axes)
+        self.phases = 2 * np.pi * np.arange(robots) / robots
+        self.directions = np.where(np.arange(robots) % 2, -1.0, 1.0)
+        # Angular speed giving the linear speed on a circle of mean radius.
+        self.angular_speeds = speed / self.axes.mean(axis=1)
+        # Vertices of the triangle relative to its barycenter, with the
+        # front vertex pointing at the X axis.
+        self.shape = np.array([[2 * length / 3., 0],
+                               [-length / 3., width / 2.],
+                               [-length / 3., -width / 2.]])
+        self.start_time = monotonic()
+
+    def frame_time(self, now=None):
+        """Get the beginning of the frame containing the given time.
+
+        :param float now: monotonic time. By default, the current one.
+        :return: elapsed time, in seconds, since the world creation.
+        :rtype: float
+        """
+        if now is None:
+            now = monotonic()
+        return np.floor((now - self.start_time) * self.fps) / self.fps
+
+    def wait_frame(self):
+        """Sleep until the beginning of the next frame."""
+        now = monotonic()
+        time.sleep(max(0, self.frame_time(now) + 1 / self.fps
+                       - (now - self.start_time)))
+
+    def poses(self, elapsed):
+        """Get the poses of the UGVs.
+
+        :param float elapsed: time, in seconds, since the world creation.
+        :return: [x, y, theta] pose of every UGV.
+        :rtype: numpy.array(shape=Mx3)
+        """
+        angles = self.phases + self.directions * self.angular_speeds * elapsed
+        poses = np.empty((len(self.robot_ids), 3))
+        poses[:, 0] = self.center[0] + self.axes[:, 0] * np.cos(angles)
+        poses[:, 1] = self.center[1] + self.axes[:, 1] * np.sin(angles)
+        # The heading is the derivative of the position.
+        poses[:, 2] = np.arctan2(
+                self.directions * self.axes[:, 1] * np.cos(angles),
+                -self.directions * self.axes[:, 0] * np.sin(angles))
+        return poses
+
+    def triangles(self, elapsed):
+        """Get the vertices of the triangles of the UGVs.
+
+        :param float elapsed: time, in seconds, since the world creation.
+        :return: global cartesian [x, y] coordinates of the 3 vertices of
+         every UGV, in mm.
+        :rtype: numpy.array(shape=Mx3x2)
+        """
+        poses = self.poses(elapsed)
+        cos = np.cos(poses[:, 2])[:, np.newaxis]
+        sin = np.sin(poses[:, 2])[:, np.newaxis]
+        vertices = np.empty((len(poses), 3, 2))
+        vertices[:, :, 0] = (poses[:, 0:1] + cos * self.shape[:, 0]
+                             - sin * self.shape[:, 1])
+        vertices[:, :, 1] = (poses[:, 1:2] + sin * self.shape[:, 0]
+                             + cos * self.shape[:, 1])
+        return vertices
+
+
+class SimulatedCamera(object):
+    """State and replies of a simulated FPGA camera.
+
+    The requests of every connection are processed under a lock, as the
+    registers and trackers belong to the device.
+
+    :param world: *SimulatedWorld* object watched by the camera.
+    :param str conf_file: configuration file of the real camera, whose
+     geometry is simulated, including the scale ratios between the FPGA,
+     image and global coordinates.
+    :param float step: distance, in FPGA pixels, between the contour
+     points of the 'ACTUAL_LOCATION' replies.
+    :param int seed: seed of the background noise of the frames.
+    """
+
+    def __init__(self, world, conf_file, step=4.0, seed=0):
+        """Class constructor. Load the geometry of the camera."""
+        self.world = world
+        self.step = step
+        # Compiled camera parameters, without connecting to any device.
+        model = load_camera_model(conf_file)
+        self.scale = model.scale
+        self.K = model.K
+        self.shape = model.shape
+        self.offsets = model.offsets
+        self.projection = model.projection
+        # Gray level of the triangles, in the middle of the thresholds.
+        self.level = int(np.mean(decode_thresholds(
+                model.params['red_thresholds'])))
+        # Registers values, and tracker windows [min_x, min_y, width,
+        # height] in FPGA coordinates, indexed by tracker id.
+        self.registers = {}
+        self.trackers = {}
+        self._lock = threading.Lock()
+        self._background = np.random.RandomState(seed).randint(
+                0, 90, size=self.shape).astype(np.uint8)
+        self._frame = self._background
+
+    def project(self, vertices):
+        """Convert global cartesian coordinates to image coordinates.
+
+        It is the inverse of the transformation done by *multiplecamera*
+        i.e. an inverse homography and *Triangle.global2local*.
+
+        :param vertices: array of global [x, y] coordinates, in mm.
+        :return: [row, column] image coordinates of the same shape.
+        """
+        points = vertices.reshape(-1, 2)
+        projected = self.projection.backward(points)
+        image = np.empty_like(points)
+        image[:, 0] = self.offsets[0] - projected[:, 1] / self.K
+        image[:, 1] = projected[:, 0] / self.K + self.offsets[1]
+        return image.reshape(vertices.shape)
+
+    def visible_triangles(self, elapsed):
+        """Get the triangles of the UGVs entirely inside the image.
+
+        :param float elapsed: time, in seconds, since the world creation.
+        :return: the ids of the visible UGVs, and the [row, column]
+         image coordinates of their vertices.
+        :rtype: (list, numpy.array(shape=Vx3x2))
+        """
+        vertices = self.project(self.world.triangles(elapsed))
+        inside = (vertices >= 0) & (vertices < self.shape)
+        visible = inside.all(axis=2).all(axis=1)
+        ids = [robot_id for robot_id, seen
+               in zip(self.world.robot_ids, visible) if seen]
+        return ids, vertices[visible]
+
+    def capture(self):
+        """Render a new frame with the visible triangles."""
+        _, vertices = self.visible_triangles(self.world.frame_time())
+        frame = self._background.copy()
+        for triangle in vertices:
+            # OpenCV expects [x, y] points.
+            cv2.fillConvexPoly(frame, np.round(triangle[:, ::-1]).astype(
+                    np.int32), self.level)
+        self._frame = frame
+
+    def locations(self):
+        """Update the trackers, and get the contour tracked by each one.
+
+        A tracker follows the triangle whose barycenter is inside its
+        window, and centers the window on it. If there is none, its
+        contour is empty.
+
+        :return: list of points of the contour of every tracker, in FPGA
+         [x, y] coordinates, indexed by the tracker id.
+        :rtype: dict
+        """
+        _, vertices = self.visible_triangles(self.world.frame_time())
+        # FPGA cartesian coordinates of the triangles.
+        vertices = vertices[:, :, ::-1] * self.scale
+        barycenters = vertices.mean(axis=1)
+        contours = {}
+        for tracker_id, window in sorted(self.trackers.items()):
+            min_x, min_y, width, height = window
+            inside = np.flatnonzero(
+                    (barycenters[:, 0] >= min_x)
+                    & (barycenters[:, 0] <= min_x + width)
+                    & (barycenters[:, 1] >= min_y)
+                    & (barycenters[:, 1] <= min_y + height))
+            if not len(inside):
+                contours[tracker_id] = np.empty((0, 2), dtype=int)
+                continue
+            triangle = vertices[inside[0]]
+            center = barycenters[inside[0]]
+            window[0] = int(center[0] - width / 2)
+            window[1] = int(center[1] - height / 2)
+            contours[tracker_id] = self._contour(triangle)
+        return contours
+
+    def _contour(self, vertices):
+        """Sample the sides of a triangle as a closed contour."""
+        points = []
+        for start, end in zip(vertices, np.roll(vertices, -1, axis=0)):
+            count = max(1, int(np.ceil(np.linalg.norm(end - start)
+                                       / self.step)))
+            fractions = np.arange(count, dtype=float)[:, np.newaxis] / count
+            points.append(start + fractions * (end - start))
+        points.append(vertices[:1])
+        return np.round(np.concatenate(points)).astype(int)
+
+    def process(self, line):
+        """Get the reply to a request line.
+
+        :param str line: request, without its newline character.
+        :return: reply to be sent. It is empty if there is none.
+        :rtype: str
+        """
+        # A capture waits for the next frame of the sensor.
+        if line == 'S':
+            self.world.wait_frame()
+        with self._lock:
+            fields = line.split(',')
+            if fields[0] in ('r', 'b') and len(fields) > 1:
+                return self._read(fields[1], binary=fields[0] == 'b')
+            elif fields[0] == 'w' and len(fields) > 1:
+                return self._write(fields[1], fields[2:])
+            elif line == 'S':
+                self.capture()
+                return 'Image captured.\n'
+            elif line == 'G':
+                return self._frame.tostring()
+            elif line == 'D':
+                color = np.zeros(self.shape + (3,), dtype=np.uint8)
+                color[:, :, 0] = self._frame
+                return color.tostring()
+            elif line == 'C':
+                return 'Camera configured.\n'
+            elif line == 'V':
+                return ''
+            logger.warn('Unknown request: {}'.format(line))
+            return 'Unknown request.\n'
+
+    def _read(self, register, binary=False):
+        """Get the reply to a register read."""
+        if register == 'al':
+            value = self.locations()
+        elif register == 'aw':
+            value = tuple(sorted(self.trackers))
+        else:
+            value = self.registers.get(register, 0)
+        if binary:
+            return self._binary_reply(value)
+        if isinstance(value, dict):
+            return '{{{}}}\n'.format(', '.join(
+                    "'{}': {}".format(key, points.tolist())
+                    for key, points in sorted(value.items())))
+        return '{}\n'.format(value)
+
+    def _binary_reply(self, value):
+        """Encode a value as a binary reply, see *parse_binary_reply*."""
+        if isinstance(value, dict):
+            kind = 'd'
+            values = []
+            for key, points in sorted(value.items()):
+                values.extend([key, len(points)])
+                values.extend(points.ravel().tolist())
+        elif isinstance(value, tuple):
+            kind = 't'
+            values = value
+        else:
+            kind = 'i'
+            values = [value]
+        payload = np.array(values, dtype='<i4').tostring()
+        return _BINARY_HEADER.pack(kind, len(payload)) + payload
+
+    def _write(self, register, fields):
+        """Apply a register write and get its acknowledgement."""
+        values = [int(field) for field in fields if field.strip()]
+        if register == 'sw':
+            self.trackers[values[0]] = values[1:5]
+        elif register == 'ft':
+            self.trackers.pop(values[0], None)
+        elif register == 'fa':
+            self.trackers.clear()
+        elif len(values) == 1:
+            self.registers[register] = values[0]
+        else:
+            self.registers[register] = tuple(values)
+        return 'ACK {}\n'.format(_REGISTER_NAMES.get(register, register))
+
+
+class CameraRequestHandler(SocketServer.StreamRequestHandler):
+    """Handler of a connection to a simulated camera."""
+    # Send the short replies at once, even after a frame transfer.
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        """Reply every request line until the connection is closed."""
+        self.wfile.write(WELCOME)
+        for line in iter(self.rfile.readline, ''):
+            line = line.strip()
+            if line == 'Q':
+                break
+            reply = self.server.camera.process(line)
+            if reply:
+                self.wfile.write(reply)
+
+
+class CameraServer(SocketServer.ThreadingTCPServer):
+    """TCP server of a simulated camera, with a thread per connection.
+
+    :param camera: *SimulatedCamera* object that replies the requests.
+    :param int port: listening port. If 0, a free one is chosen.
+    :param str host: listening address.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, camera, port=0, host='127.0.0.1'):
+        """Class constructor. Bind the listening socket."""
+        SocketServer.ThreadingTCPServer.__init__(self, (host, port),
+                                                 CameraRequestHandler)
+        self.camera = camera
+        self.port = self.server_address[1]
+
+    def start(self):
+        """Serve the requests from a daemon thread."""
+        thread = threading.Thread(target=self.serve_forever,
+                                  name='Simulator{}'.format(self.port))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+def write_config(conf_file, output_file, port, host='127.0.0.1',
+                 resolution=None):
+    """Copy a camera configuration file pointing to a simulated camera.
+
+    :param str conf_file: original configuration file.
+    :param str output_file: path of the new configuration file.
+    :param int port: port of the simulated camera.
+    :param str host: address of the simulated camera.
+    :param resolution: optional (width, height) of the images, replacing
+     the configured ones.
+    """
+    conf = ConfigParser.RawConfigParser()
+    conf.read(conf_file)
+    conf.set('VideoSensor', 'ip', host)
+    conf.set('VideoSensor', 'port', port)
+    if resolution is not None:
+        conf.set('Camera', 'width', resolution[0])
+        conf.set('Camera', 'height', resolution[1])
+    with open(output_file, 'w') as outfile:
+        conf.write(outfile)
+
+
+def main():
+    logger.info("BEGINNING EXECUTION")
+
+    # SIGINT handling:
+    # -Create a global flag to check if the execution should keep running.
+    # -Whenever SIGINT is received, set the global flag to False.
+    global run_program
+    run_program = True
+
+    def sigint_handler(signal, frame):
+        global run_program
+        logger.info("Shutting down")
+        run_program = False
+        return
+    signal.signal(signal.SIGINT, sigint_handler)
+
+    # Main routine
+    cameras = 4
+    robots = 1
+    fps = 50.0
+    port = 5005
+    output = '/tmp/uvispace-simulator'
+    resolution = None
+    help_msg = ("Usage: sim_cameras.py [-n <cameras>], [--cameras=<cameras>],"
+                " [-r <robots>], [--robots=<robots>], [-f <fps>], "
+                "[--fps=<fps>], [-p <port>], [--port=<port>], "
+                "[-o <folder>], [--output=<folder>], "
+                "[--resolution=<width>x<height>]")
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hn:r:f:p:o:",
+                                   ["cameras=", "robots=", "fps=", "port=",
+                                    "output=", "resolution="])
+    except getopt.GetoptError:
+        print(help_msg)
+        sys.exit()
+    for opt, arg in opts:
+        if opt == '-h':
+            print help_msg
+            sys.exit()
+        elif opt in ("-n", "--cameras"):
+            cameras = int(arg)
+        elif opt in ("-r", "--robots"):
+            robots = int(arg)
+        elif opt in ("-f", "--fps"):
+            fps = float(arg)
+        elif opt in ("-p", "--port"):
+            port = int(arg)
+        elif opt in ("-o", "--output"):
+            output = arg
+        elif opt == "--resolution":
+            resolution = tuple(int(value) for value in arg.split('x'))
+    conf_files = sorted(glob.glob(os.path.join(os.path.dirname(__file__),
+                                               'config', '*.cfg')))
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    world = SimulatedWorld(robots, fps)
+    servers = []
+    for index in range(cameras):
+        output_file = os.path.join(output, 'video_sensor{}.cfg'.format(
+                index + 1))
+        write_config(conf_files[index % len(conf_files)], output_file,
+                     port + index, resolution=resolution)
+        servers.append(CameraServer(SimulatedCamera(world, output_file,
+                                                    seed=index),
+                                    port + index))
+        servers[-1].start()
+    logger.info("Simulating {} cameras and {} UGVs at {} fps. Configuration "
+                "files written to {}".format(cameras, robots, fps, output))
+    while run_program:
+        time.sleep(0.5)
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
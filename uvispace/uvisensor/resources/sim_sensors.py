@@ -21,6 +21,7 @@ except ImportError:
     # Exit program if the settings module can't be found.
     sys.exit("Can't find settings module. Maybe environment variables are not"
              "set. Run the environment .sh script at the project root folder.")
+import messages
 logger = logging.getLogger('sensor')
 
 
@@ -80,7 +81,7 @@ def main():
     while run_program:
         step += 1
         position['step'] = step
-        pose_publisher.send_json(position)
+        messages.send(pose_publisher, messages.POSE, position)
         logger.info("Sent {}".format(position))
         time.sleep(0.025)
     # Cleanup resources
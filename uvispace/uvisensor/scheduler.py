@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""This module contains the timing utilities of the periodic threads.
+
+The *PeriodicTimer* class provides drift-free deadlines for the loops
+that run every cycle, e.g. the threads of *multiplecamera*. Instead of
+waiting actively until the end of the cycle, the threads sleep (or wait
+on an event) until the next deadline, and the timer keeps statistics of
+the overruns and the jitter of every loop.
+
+The deadlines are measured with a monotonic clock, that is not affected
+by the system clock adjustments. As Python 2 has not *time.monotonic*,
+the *monotonic* function calls *clock_gettime* when it is missing.
+"""
+# Standard libraries
+import ctypes
+import ctypes.util
+import logging
+import sys
+import time
+
+try:
+    # Logging setup.
+    import settings
+except ImportError:
+    # Exit program if the settings module can't be found.
+    sys.exit("Can't find settings module. Maybe environment variables are not"
+             "set. Run the environment .sh script at the project root folder.")
+logger = logging.getLogger("sensor")
+
+# Identifier of the monotonic clock in the Linux headers.
+_CLOCK_MONOTONIC = 1
+
+
+class _Timespec(ctypes.Structure):
+    """C structure filled by clock_gettime."""
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+def _get_monotonic():
+    """Get a monotonic clock function, in seconds.
+
+    :return: *time.monotonic* if available, or else a function calling
+     *clock_gettime*. If neither is available, *time.time*.
+    :rtype: function
+    """
+    try:
+        return time.monotonic
+    except AttributeError:
+        pass
+    try:
+        library = ctypes.CDLL(ctypes.util.find_library('rt') or 'libc.so.6',
+                              use_errno=True)
+        clock_gettime = library.clock_gettime
+    except (OSError, AttributeError):
+        logger.warn('No monotonic clock available. Using time.time')
+        return time.time
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+
+    def monotonic():
+        """Return the value, in seconds, of the monotonic clock."""
+        spec = _Timespec()
+        if clock_gettime(_CLOCK_MONOTONIC, ctypes.byref(spec)):
+            raise OSError(ctypes.get_errno(), 'clock_gettime failed')
+        return spec.tv_sec + spec.tv_nsec * 1e-9
+    return monotonic
+
+monotonic = _get_monotonic()
+
+
+class PeriodicTimer(object):
+    """Drift-free periodic deadlines for a loop.
+
+    The *wait* method is called at the beginning of every cycle. The
+    first call returns immediately, and the following ones wait until
+    the next deadline. The deadlines are multiples of the period since
+    the first call, so the delays do not accumulate.
+
+    When a cycle takes longer than the period, it is counted as an
+    overrun, the missed deadlines are skipped and the next cycle starts
+    immediately. Otherwise, the delay between the deadline and the
+    actual wake up is measured as the jitter.
+
+    The *stats* dictionary contains the number of 'cycles' and
+    'overruns', and the 'mean_jitter' and 'max_jitter' in seconds.
+
+    :param float period: time, in seconds, between deadlines.
+    :param str name: name used in the statistics report.
+    """
+
+    def __init__(self, period, name=''):
+        """Class constructor. Set attributes."""
+        self.period = period
+        self.name = name
+        self._deadline = None
+        # Accumulated jitter, and number of cycles where it was measured.
+        self._jitter_sum = 0.0
+        self._sleeps = 0
+        self.stats = {
+            'cycles': 0,
+            'overruns': 0,
+            'mean_jitter': 0.0,
+            'max_jitter': 0.0,
+        }
+
+    def wait(self, event=None):
+        """Wait until the next deadline.
+
+        :param event: optional *threading.Event* or
+         *multiprocessing.Event* object. If it is set while waiting, the
+         method returns immediately.
+        :return: True if the event is set, False otherwise.
+        :rtype: bool
+        """
+        now = monotonic()
+        if self._deadline is None:
+            self._deadline = now
+        elif now > self._deadline:
+            self.stats['overruns'] += 1
+            missed = int((now - self._deadline) // self.period)
+            self._deadline += missed * self.period
+        else:
+            remaining = self._deadline - now
+            if event is None:
+                time.sleep(remaining)
+            elif event.wait(remaining):
+                return True
+            jitter = max(0.0, monotonic() - self._deadline)
+            self._jitter_sum += jitter
+            self._sleeps += 1
+            self.stats['mean_jitter'] = self._jitter_sum / self._sleeps
+            self.stats['max_jitter'] = max(self.stats['max_jitter'], jitter)
+        self.stats['cycles'] += 1
+        self._deadline += self.period
+        return event is not None and event.is_set()
+
+    def remaining(self):
+        """Get the time, in seconds, until the next deadline.
+
+        :return: remaining time of the current cycle, or 0 if the
+         deadline was already reached.
+        :rtype: float
+        """
+        if self._deadline is None:
+            return 0.0
+        return max(0.0, self._deadline - monotonic())
+
+    def report(self):
+        """Log the timing statistics of the loop."""
+        logger.info("{}: {} cycles of {:.1f}ms, {} overruns, jitter mean "
+                    "{:.2f}ms and max {:.2f}ms".format(
+                            self.name, self.stats['cycles'],
+                            self.period * 1000, self.stats['overruns'],
+                            self.stats['mean_jitter'] * 1000,
+                            self.stats['max_jitter'] * 1000))
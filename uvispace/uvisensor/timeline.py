@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+"""This module fuses timestamped data of a fleet of UGVs in time order.
+
+The poses measured by the cameras and the speed set points of the UGVs
+are events with the monotonic time when they were captured or sent (see
+*scheduler.monotonic*). They reach the data fusion thread with a
+variable latency, e.g. because of the TCP reads of the FPGA registers,
+so they are not received in the order they happened.
+
+A *FusionTimeline* runs the Kalman filters of the fleet (a
+*kalmanfilter.KalmanBank*) through the events in timestamp order. Each
+event predicts the filters from the time of the previous one, with the
+speeds set at that moment, and then merges the measured poses or sets
+the new speeds. The states after each event of the last *window*
+seconds are kept, so an event received late is inserted in its place
+and the following events are fused again from the state before it
+(retrodiction). The events older than the window are dropped.
+"""
+# Standard libraries
+import bisect
+# Third party libraries
+import numpy as np
+# Local libraries
+import kalmanfilter
+
+# Kinds of events.
+_SPEEDS = 0
+_POSES = 1
+
+
+class FusionTimeline(object):
+    """Kalman filters of a fleet of UGVs, fed with timestamped events.
+
+    The process noise grows linearly with the time between events. When
+    the speeds of a UGV are unknown, it is predicted as stopped, with
+    the *unknown_noise* instead of the *prediction_noise*.
+
+    :param float window: time, in seconds, during which the events can
+     be received late and still be fused in order.
+    :param prediction_noise: variances of the (x, y, theta) prediction
+     error per second, when the speeds are known.
+    :param unknown_noise: variances of the prediction error per second,
+     when the speeds are unknown.
+    :param measurement_noise: variances of the measured poses.
+    :param bool extended: if True, run extended Kalman filters.
+    """
+
+    def __init__(self, window=0.1,
+                 prediction_noise=(3.5**2 / 0.02, 3.5**2 / 0.02,
+                                   0.015**2 / 0.02),
+                 unknown_noise=(1000**2 / 0.02, 1000**2 / 0.02,
+                                2*np.pi**2 / 0.02),
+                 measurement_noise=(50**2, 50**2, (2*np.pi/180)**2),
+                 extended=True):
+        """FusionTimeline class constructor."""
+        self.window = window
+        self.bank = kalmanfilter.KalmanBank(extended=extended)
+        self._prediction_noise = np.diag(prediction_noise)
+        self._unknown_noise = np.diag(unknown_noise)
+        self._measurement_noise = tuple(measurement_noise)
+        # Time of the last fused event, or None before the first one.
+        self.time = None
+        # Speed set points of each UGV, and flags of the known ones.
+        self.inputs = np.zeros([0, 2, 1])
+        self.known = np.zeros(0, dtype=bool)
+        # Events of the window, sorted by their (timestamp, sequence)
+        # keys, and state after each one: time, filters, speeds and known
+        # flags.
+        self._events = []
+        self._keys = []
+        self._states = []
+        self._sequence = 0
+        # Events received since the last estimation.
+        self._pending = []
+        # State before the first event of the window, and start of the
+        # window on the last estimation.
+        self._base = self._get_state()
+        self._horizon = -np.inf
+        self.stats = {
+            'events': 0,
+            'retrodicted': 0,
+            'dropped': 0,
+        }
+
+    def __len__(self):
+        return len(self.bank)
+
+    def add(self):
+        """Append the filter of a new UGV, with unknown speeds.
+
+        :return: index of the new filter.
+        :rtype: int
+        """
+        slot = self.bank.add()
+        self.inputs = np.concatenate((self.inputs, np.zeros([1, 2, 1])))
+        self.known = np.append(self.known, False)
+        # The saved states get the initial values of the new filter.
+        new = self._get_state()
+        self._base = self._pad_state(self._base, new, slot)
+        self._states = [self._pad_state(state, new, slot)
+                        for state in self._states]
+        return slot
+
+    def add_speeds(self, slot, timestamp, linear, angular):
+        """Add a new speed set point of a UGV.
+
+        The events are fused on the next call to *estimate*.
+
+        :param int slot: index of the filter of the UGV.
+        :param float timestamp: monotonic time when it was sent.
+        :param float linear: linear speed, in mm/s.
+        :param float angular: angular speed, in rad/s.
+        :return: False if the event is older than the window and it was
+         dropped.
+        :rtype: bool
+        """
+        return self._add_event(timestamp, (_SPEEDS, slot,
+                                           (linear, angular)))
+
+    def add_poses(self, timestamp, slots, poses):
+        """Add the poses of some UGVs measured at the same time.
+
+        The events are fused on the next call to *estimate*.
+
+        :param float timestamp: monotonic time when they were captured.
+        :param slots: indexes of the filters of the measured UGVs.
+        :type slots: list or np.array(shape=M)
+        :param poses: measured (x, y, theta) pose of each UGV.
+        :type poses: np.array(shape=Mx3)
+        :return: False if the event is older than the window and it was
+         dropped.
+        :rtype: bool
+        """
+        return self._add_event(timestamp, (_POSES, np.array(slots),
+                                           np.array(poses, dtype=float)))
+
+    def estimate(self, now):
+        """Fuse the new events and get the states of all the UGVs.
+
+        The new events are inserted in time order, and fused with the
+        ones after them. Then, the events older than the window are
+        dropped, and the filters are predicted from the last event to
+        *now*, without changing them.
+
+        :param float now: monotonic time of the estimation.
+        :return: the (x, y, theta) state of each UGV.
+        :rtype: np.array(shape=Nx3x1)
+        """
+        if self._pending:
+            self._fuse_pending()
+        # Move the base state to the last event older than the window.
+        self._horizon = max(self._horizon, now - self.window)
+        old = bisect.bisect_right(self._keys, (self._horizon, np.inf))
+        if old:
+            self._base = self._states[old - 1]
+            del self._events[:old], self._keys[:old], self._states[:old]
+        if self.time is None:
+            return self.bank.states.copy()
+        self._predict(max(now - self.time, 0))
+        return self.bank.pred_states.copy()
+
+    def _add_event(self, timestamp, event):
+        """Keep a new event until the next estimation."""
+        if timestamp < self._horizon:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['events'] += 1
+        self._pending.append(((timestamp, self._sequence), event))
+        self._sequence += 1
+        return True
+
+    def _fuse_pending(self):
+        """Insert the pending events in order, and fuse from the first."""
+        self._pending.sort(key=lambda item: item[0])
+        index = bisect.bisect_right(self._keys, self._pending[0][0])
+        if index < len(self._keys):
+            # Late events. Go back to the state before the first one.
+            self.stats['retrodicted'] += sum(
+                    key < self._keys[-1] for key, _ in self._pending)
+            self._set_state(self._states[index - 1] if index
+                            else self._base)
+        items = sorted(zip(self._keys[index:], self._events[index:])
+                       + self._pending, key=lambda item: item[0])
+        self._pending = []
+        del self._keys[index:], self._events[index:], self._states[index:]
+        for key, event in items:
+            self._fuse(key[0], event)
+            self._keys.append(key)
+            self._events.append(event)
+            self._states.append(self._get_state())
+
+    def _fuse(self, timestamp, event):
+        """Predict the filters until an event, and apply it."""
+        if self.time is not None:
+            self._predict(timestamp - self.time)
+        else:
+            self._predict(0)
+        self.time = timestamp
+        kind, slots, values = event
+        mask = np.zeros(len(self), dtype=bool)
+        measurements = np.zeros([len(self), 3, 1])
+        if kind == _POSES:
+            mask[slots] = True
+            measurements[slots, :, 0] = values
+            self.bank.set_measurement_noise(self._measurement_noise)
+        self.bank.update(measurements, mask)
+        if kind == _SPEEDS:
+            self.inputs[slots, :, 0] = values
+            self.known[slots] = True
+
+    def _predict(self, delta_t):
+        """Predict the filters, with the noise of the elapsed time."""
+        noise = np.where(self.known[:, np.newaxis, np.newaxis],
+                         self._prediction_noise, self._unknown_noise)
+        self.bank.set_prediction_noise(noise * delta_t)
+        self.bank.predict(self.inputs, delta_t)
+
+    def _get_state(self):
+        """Get the time, filters and speeds after the last event."""
+        return (self.time, self.bank.save(), self.inputs.copy(),
+                self.known.copy())
+
+    def _set_state(self, state):
+        """Restore a state obtained with *_get_state*."""
+        self.time, saved, inputs, known = state
+        self.bank.restore(saved)
+        self.inputs = inputs.copy()
+        self.known = known.copy()
+
+    @staticmethod
+    def _pad_state(state, new, slot):
+        """Append the values of the new filters to a saved state."""
+        time, saved, inputs, known = state
+        saved = tuple(np.concatenate((values, new_values[slot:]))
+                      for values, new_values in zip(saved, new[1]))
+        return (time, saved, np.concatenate((inputs, new[2][slot:])),
+                np.concatenate((known, new[3][slot:])))
@@ -4,20 +4,22 @@
 The functions are calls to the VideoSensor class methods in order to
 capture images and then work with them using the imgprrocessing.Image
 class and its methods.
+
+The *FrameStream* class captures frames continuously, requesting the
+next frame to the FPGA while the current one is being processed.
 """
 # Standard libraries
-import ast
 import ConfigParser
 import logging
 import socket
 import sys
 # Third party libraries
-import numpy as np
-import pylab
 from scipy import misc
 # Local libraries
+import cameramodel
 from client import Client
 import imgprocessing
+from scheduler import monotonic
 
 try:
     # Logging setup.
@@ -55,6 +57,11 @@ def get_image(camera, filename=''):
     If a filename is specified, the captured frame will be saved on the
     specified path.
 
+    The shapes are only looked for inside the windows of the triangles
+    detected on the last call to *set_tracker*, if any. The whole frame
+    is scanned when an UGV is lost, and every *rescan_period* frames of
+    the camera, so that the UGVs entering the view are detected too.
+
     :param camera: 
     :type camera: VideoSensor() object
     :param str filename: path to the file where the captured frame will
@@ -62,13 +69,15 @@ def get_image(camera, filename=''):
     :return: The image from the captured frame after processing it.
     """
     screenshot = camera.capture_frame(gray=True, output_file=filename)
-    image = imgprocessing.Image(screenshot)
-    image.binarize(camera._params['red_thresholds'])
-    image.get_shapes()
+    image = imgprocessing.Image(screenshot, rois=camera._windows)
+    image.binarize(camera._params['red_thresholds'], camera._binarizer)
+    camera._frame_count += 1
+    image.get_shapes(full_frame=not camera._frame_count
+                     % camera.rescan_period)
     return image
 
 
-def set_tracker(camera, image=None):
+def set_tracker(camera, image=None, tracker_ids=None):
     """Configure trackers according to detected triangles.
 
     :param camera: Instance of the VideoSensor() class, from whom the 
@@ -81,30 +90,63 @@ def set_tracker(camera, image=None):
      from the camera.
     :type image: imgprocessing.Image() object
 
+    :param list tracker_ids: Optional identifiers of the trackers of
+     each triangle of the image. By default, they are numbered from 1.
+
     :return: A frame captured and obtained from the FPGA; and a list
-     with the information about the configured tracker whose first
-     element is the tracker id, the 2nd and 3rd are the X,Y initial
-     coordinates and the 4th and 5th are the width and height.
-    :rtype: imgprocessing.Image() object, 5-elements list
+     with the information about each configured tracker. For each one,
+     the first element is the tracker id, the 2nd and 3rd are the X,Y
+     initial coordinates and the 4th and 5th are the width and height.
+    :rtype: imgprocessing.Image() object, list of 5-elements lists
+
+    The windows of the triangles are stored in the camera, and they are
+    used as regions of interest on the next call to *get_image*.
     """
     if image is None:
         # Get an Image object with triangle shapes in it already segregated.
         tracker_image = get_image(camera)
     else:
         tracker_image = image
+    triangles = tracker_image.triangles
+    if tracker_ids is None:
+        tracker_ids = range(1, len(triangles) + 1)
     tracker_position = []
-    for index, triangle in enumerate(tracker_image.triangles):
+    windows = []
+    for tracker_id, triangle in zip(tracker_ids, triangles):
         triangle.get_pose()
         triangle.get_window(min_value=0, max_value=tracker_image.image.shape)
+        windows.append(triangle.window)
         min_x = int(camera._scale * triangle.window[0, 1])
         min_y = int(camera._scale * triangle.window[0, 0])
         width = int(camera._scale * triangle.window[1, 1] - min_x)
         height = int(camera._scale * triangle.window[1, 0] - min_y)
-        camera.configure_tracker(index + 1, min_x, min_y, width, height)
-        tracker_position = [index + 1, min_x, min_y, width, height]
+        camera.configure_tracker(tracker_id, min_x, min_y, width, height)
+        tracker_position.append([tracker_id, min_x, min_y, width, height])
+    camera._windows = windows
     return tracker_image, tracker_position
 
 
+def _format_register_value(value):
+    """Convert a register value into the string format of the FPGA.
+
+    :param value: the value that will be written to the register.
+    :type value: str, int or tuple
+    :return: the formatted value.
+    :rtype: str
+    """
+    # int values are directly converted to string variables.
+    if type(value) in (str, int):
+        formatted_value = str(value)
+    # In case of tuples, FPGA only understands decomposed string elements.
+    # i.e. '(value1, value2)' is not valid. 'value1,value2' is valid.
+    elif type(value) is tuple:
+        formatted_value = ','.join(str(item) for item in value)
+    else:
+        logger.warn("Not valid value type for {}".format(value))
+        raise ValueError("Not valid value type for {}".format(value))
+    return formatted_value
+
+
 class VideoSensor(object):
     """This class contains methods for dealing with FPGA-camera system.
 
@@ -143,8 +185,23 @@ class VideoSensor(object):
         self._scale = scale
         self._H = None
         self._limits = None
+        # Compiled model of the configuration file, loaded on demand.
+        self.model = None
         # Dictionary variable where camera parameters are stored.
         self._params = {}
+        # Binarization engine, reused for every captured frame.
+        self._binarizer = imgprocessing.Binarizer()
+        # Windows of the last configured trackers, in image coordinates,
+        # number of frames processed with *get_image*, and number of
+        # frames between full frame scans.
+        self._windows = []
+        self._frame_count = 0
+        self.rescan_period = 10
+        # Function that queues the register writes, instead of sending
+        # them and waiting for their messages, e.g. the *queue_write*
+        # method of a *cameraloop.LocationPoller*. None for blocking
+        # writes.
+        self.write_queue = None
         # The Client class handles the TCP/IP connection to the device.
         self._client = Client()
         self._connected = False
@@ -198,25 +255,9 @@ class VideoSensor(object):
         if not self.conf.sections():
             logger.error('Missing config file: {}'.format(self.filename))
             return
-        # Sensor color thresholds parameters
-        self._params['red_thresholds'] = ast.literal_eval(
-                self.conf.get('Sensor', 'red_thresholds'))
-        self._params['green_thresholds'] = ast.literal_eval(
-                self.conf.get('Sensor', 'green_thresholds'))
-        self._params['blue_thresholds'] = ast.literal_eval(
-                self.conf.get('Sensor', 'blue_thresholds'))
-        # Camera acquisition geometry parameters
-        self._params['width'] = self.conf.getint('Camera', 'width')
-        self._params['height'] = self.conf.getint('Camera', 'height')
-        self._params['start_col'] = self.conf.getint('Camera', 'start_column')
-        self._params['start_row'] = self.conf.getint('Camera', 'start_row')
-        self._params['col_size'] = self.conf.getint('Camera', 'column_size')
-        self._params['row_size'] = self.conf.getint('Camera', 'row_size')
-        self._params['col_mode'] = self.conf.getint('Camera', 'column_mode')
-        self._params['row_mode'] = self.conf.getint('Camera', 'row_mode')
-        self._params['exposure'] = self.conf.getint('Camera', 'exposure')
-        self._params['skip'] = self._params['row_mode']
-        self._params['output'] = 0
+        # Sensor color thresholds and camera acquisition parameters, from
+        # the compiled model of the configuration file.
+        self._params.update(self.get_model().params)
         # Read and store the camera offsets
         self.get_offsets()
         self.get_homography_array()
@@ -226,26 +267,25 @@ class VideoSensor(object):
             logger.debug("Loaded parameters. FPGA wasn't configured")
             return
         # --------------------------------------------------------------#
-        # Write to the FPGA registers the loaded configuration.
-        # SENSOR COLOR THRESHOLDS
-        # They must be of string type.
-        self.set_register('RED_THRESHOLD', self._params['red_thresholds'])
-        self.set_register('GREEN_THRESHOLD', self._params['green_thresholds'])
-        self.set_register('BLUE_THRESHOLD', self._params['blue_thresholds'])
-
-        # CAMERA GEOMETRY PARAMETERS
-        # They must be string type.
-        self.set_register('IMAGE_SHAPE', (self._params['width'],
-                                          self._params['height']))
-        self.set_register('IMAGE_EXPOSURE', self._params['exposure'])
-        # Ignore initial rows and columns, as they contain useless pixels.
-        self.set_register('START_INDEXES', (self._params['start_col'],
-                                            self._params['start_row']))
-        self.set_register('SYSTEM_SHAPE', (self._params['col_size'],
-                                           self._params['row_size']))
-        self.set_register('SYSTEM_MODES', (self._params['col_mode'],
-                                           self._params['row_mode']))
-        self.set_register('SYSTEM_OUTPUT', self._params['output'])
+        # Write to the FPGA registers the loaded configuration, in a single
+        # batch of requests.
+        self.set_registers([
+            # SENSOR COLOR THRESHOLDS
+            ('RED_THRESHOLD', self._params['red_thresholds']),
+            ('GREEN_THRESHOLD', self._params['green_thresholds']),
+            ('BLUE_THRESHOLD', self._params['blue_thresholds']),
+            # CAMERA GEOMETRY PARAMETERS
+            ('IMAGE_SHAPE', (self._params['width'], self._params['height'])),
+            ('IMAGE_EXPOSURE', self._params['exposure']),
+            # Ignore initial rows and columns, as they contain useless pixels.
+            ('START_INDEXES', (self._params['start_col'],
+                               self._params['start_row'])),
+            ('SYSTEM_SHAPE', (self._params['col_size'],
+                              self._params['row_size'])),
+            ('SYSTEM_MODES', (self._params['col_mode'],
+                              self._params['row_mode'])),
+            ('SYSTEM_OUTPUT', self._params['output']),
+        ])
         # Send the configuration command to the FPGA
         conf = self._client.write_command('CONFIGURE_CAMERA', True)
         logger.debug(repr("Obtained '{}' "
@@ -254,36 +294,37 @@ class VideoSensor(object):
     def read_conffile(self, filename):
         """Look for a configuration file on the given path and read it."""
         self.filename = filename
+        self.model = None
         self.conf.read(self.filename)
         return
 
+    def get_model(self):
+        """Get the compiled model of the configuration file.
+
+        The model is loaded only once, and the configuration file is
+        only parsed if it changed since the last time it was compiled.
+
+        :rtype: cameramodel.CameraModel
+        :raises ValueError: if the configuration file is invalid.
+        """
+        if self.model is None:
+            self.model = cameramodel.load_camera_model(self.filename)
+        return self.model
+
     def get_homography_array(self):
-        """Get an homography array from the configuration file."""
-        try:
-            # Read the value of H as is written on file.
-            raw_H = self.conf.get('Misc', 'H')
-        except ConfigParser.NoSectionError:
-            logger.error("There is no 'H' section in the conf file")
-            raise AttributeError("There is no 'H' section in the conf file")
-        # Format the value in order to get a 3x3 array.
-        tuple_format = ','.join(raw_H.split('\n'))
-        array_format = ast.literal_eval(tuple_format)
-        self._H = np.array(array_format)
+        """Get an homography array from the configuration file.
+
+        The array is shared with the camera model, so it is read-only.
+        """
+        self._H = self.get_model().H
         return self._H
 
     def get_limits_array(self):
-        """Get the limits array from the configuration file."""
-        try:
-            # Read the value of H as is written on file.
-            raw_L = self.conf.get('Misc', 'limits')
-        except ConfigParser.NoSectionError:
-            logger.error("There is no 'limits' section in the conf file")
-            raise AttributeError(
-                    "There is no 'limits' section in the conf file")
-        # Format the value in order to get a 3x3 array.
-        tuple_format = ','.join(raw_L.split('\n'))
-        array_format = ast.literal_eval(tuple_format)
-        self._limits = np.array(array_format)
+        """Get the limits array from the configuration file.
+
+        The array is shared with the camera model, so it is read-only.
+        """
+        self._limits = self.get_model().limits
         return self._limits
 
     def get_offsets(self):
@@ -295,26 +336,8 @@ class VideoSensor(object):
         :return: row and column offsets i.e. [row_offset, col_offset] 
         :rtype: list[float, float]
         """
-        # Get the physical quadrant value
-        quadrant = self.conf.get('Misc', 'quadrant')
-        try:
-            width = self._params['width']
-            height = self._params['height']
-        except KeyError:
-            raise KeyError("VideoSensor parameters were not loaded yet")
-        if quadrant == '1':
-            offsets = [height, 0]
-        elif quadrant == '2':
-            offsets = [height, width]
-        elif quadrant == '3':
-            offsets = [0, width]
-        elif quadrant == '4':
-            offsets = [0, 0]
-        try:
-            self.offsets = offsets
-        except UnboundLocalError:
-            raise AttributeError("Quadrant not valid: {}".format(quadrant))
-        return offsets
+        self.offsets = list(self.get_model().offsets)
+        return self.offsets
 
     def get_register(self, register):
         """Read the content of the specified register.
@@ -339,7 +362,8 @@ class VideoSensor(object):
          not allowed, so they have to be eliminated.
         :type value: int or tuple/list   
         :return: message obtained back from the FPGA after writing into 
-         the register. 
+         the register. If the writes are queued (see *write_queue*),
+         'EMPTY BUFFER'.
 
         :examples:
         
@@ -348,24 +372,46 @@ class VideoSensor(object):
            * sent_value = '(3.45, 2.21)' ---> No OK
            * sent_value = '3.45, 2.21' ---> OK
         """
-        # int values are directly converted to string variables.
-        if type(value) in (str, int):
-            formatted_value = str(value)
-        # In case of tuples, FPGA only understands decomposed string elements.
-        # i.e. '(value1, value2)' is not valid. 'value1,value2' is valid.
-        elif type(value) is tuple:
-            # First element is added individually because it is not preceded
-            # by a comma separator.
-            formatted_value = str(value[0])
-            for item in value[1:]:
-                formatted_value = "{},{}".format(formatted_value, item)
-        else:
-            logger.warn("Not valid value type for {}".format(value))
+        formatted_value = _format_register_value(value)
+        if self.write_queue is not None:
+            self.write_queue(register, formatted_value)
+            return "EMPTY BUFFER"
         message = self._client.write_register(register, formatted_value)
         logger.debug("Obtained '{}' after writing {} on {} register.".format(
                 message, formatted_value, register))
         return message
 
+    def get_registers(self, registers):
+        """Read the content of several registers in a single batch.
+
+        :param list registers: key identifiers of valid register names.
+        :return: the data stored in each register, in the same order.
+        :rtype: list
+        """
+        for register in registers:
+            self._client.queue_read(register)
+        return self._client.flush_queue()
+
+    def set_registers(self, registers):
+        """Write several FPGA registers in a single batch.
+
+        The values are formatted as in *set_register*, and all the
+        writes are sent together, waiting once for their messages.
+
+        :param list registers: (register, value) pairs, where register
+         is the key identifier of a valid register name.
+        :return: messages obtained back from the FPGA after writing into
+         each register.
+        :rtype: list
+        """
+        for register, value in registers:
+            self._client.queue_write(register, _format_register_value(value))
+        messages = self._client.flush_queue()
+        for (register, value), message in zip(registers, messages):
+            logger.debug("Obtained '{}' after writing {} on {} register."
+                         .format(message, value, register))
+        return messages
+
     def configure_tracker(self, tracker_id, min_x, min_y, width, height):
         """Send to FPGA rectangle parameters for defining a tracker.
 
@@ -402,7 +448,9 @@ class VideoSensor(object):
         :return: image contained in an array with dimensions specified 
          in the configuration file. If gray color is True, the dim value 
          will be 1, and 3 for False (representing color images). dim
-         equals to the number of components per pixel.
+         equals to the number of components per pixel. The array is a
+         view of the client reception buffer, so it is overwritten by
+         the next captured frame.
         :rtype: MxNxdim numpy.array
         """
         # Request a frame capture to the socket client
@@ -412,12 +460,11 @@ class VideoSensor(object):
                 logger.warn("Stop waiting for a frame after 20 tries")
                 sys.exit()
             tries -= 1
-            # Timeout error means that the FPGA buffer is empty. If this
+            # No line means that the FPGA buffer is empty. If this
             # happens, it will try to read the buffer again.
-            try:
-                message = self._client.recv(self._client.buffer_size)
-            except socket.timeout:
-                pass
+            lines = self._client._read_lines(1)
+            if lines:
+                message = lines[0]
         logger.debug(repr("'{}' after {} tries.".format(message, 20 - tries)))
         # Set dim (dimensions) to the number of components per pixel.
         if gray:
@@ -430,10 +477,155 @@ class VideoSensor(object):
             shape = (self._params['height'], self._params['width'], dim)
         self._client.write_command(command)
         logger.debug("'{}' command sent.".format(command))
-        # SIZE = Width x Height x Dimensions
-        img_size = self._params['width'] * self._params['height'] * dim
-        data = self._client.read_data(img_size)
-        image = pylab.fromstring(data, dtype=pylab.uint8).reshape(shape)
+        # The image is received in place, without intermediate copies.
+        image = self._client.read_array(shape)
+        logger.debug("Frame received at {:.0f} bytes/s with {} recv calls"
+                     .format(self._client.read_stats['bytes_per_second'],
+                             self._client.read_stats['recv_calls']))
         if output_file:
             misc.imsave(output_file, image)
         return image
+
+    def stream_frames(self, gray=True, frames=None, prefetch=True):
+        """Get an iterator over continuously captured frames.
+
+        See the *FrameStream* class for the details.
+
+        :param bool gray: if True, gray-scale frames are captured.
+         Otherwise, they are RGB.
+        :param int frames: number of frames to be captured. By default,
+         the frames are captured until the iteration is stopped.
+        :param bool prefetch: if True, the FPGA captures the next frame
+         while the current one is being processed.
+        :return: iterable yielding (timestamp, frame) tuples.
+        :rtype: FrameStream
+        """
+        return FrameStream(self, gray, frames, prefetch)
+
+
+class FrameStream(object):
+    """Continuous capture of frames from a *VideoSensor*.
+
+    *capture_frame* requests a capture, waits for it and then transfers
+    the frame, so the three phases are serialized. When iterating over a
+    *FrameStream* with *prefetch* enabled, the transfer request of every
+    frame is sent together with the capture request of the next one.
+    Thus, the FPGA captures frame N+1 right after sending frame N, while
+    frame N is being processed.
+
+    Every iteration yields a tuple with the capture timestamp and the
+    frame. The timestamp is the *scheduler.monotonic* time when the FPGA
+    started the capture of the frame, i.e. when the capture request was
+    sent or, for a prefetched frame, when the transfer of the previous
+    one ended. It does not depend on the time spent processing the
+    previous frame, when the 'Image captured' message is read. The frame
+    is a view of the client reception buffer, that is overwritten on the
+    next iteration, so it must be copied to be kept.
+
+    The *stats* dictionary contains the number of 'frames' yielded, the
+    elapsed 'seconds' since the first capture request, and the achieved
+    'fps'. They are logged when the iteration ends.
+
+    :param camera: *VideoSensor* object with an open connection.
+    :param bool gray: if True, gray-scale frames are captured.
+     Otherwise, they are RGB.
+    :param int frames: number of frames to be captured. By default,
+     the frames are captured until the iteration is stopped.
+    :param bool prefetch: if True, the FPGA captures the next frame
+     while the current one is being processed.
+    :param int tries: number of reads waiting for a capture message.
+    """
+    CAPTURED = "Image captured.\n"
+
+    def __init__(self, camera, gray=True, frames=None, prefetch=True,
+                 tries=20):
+        """Class constructor. Set attributes."""
+        self.camera = camera
+        self.frames = frames
+        self.prefetch = prefetch
+        self.tries = tries
+        if gray:
+            self._command = Client._COMMANDS['GET_GRAY_IMAGE']
+            self.shape = (camera._params['height'], camera._params['width'])
+        else:
+            self._command = Client._COMMANDS['GET_COLOR_IMAGE']
+            self.shape = (camera._params['height'], camera._params['width'],
+                          3)
+        self._capture = Client._COMMANDS['GET_NEW_FRAME']
+        self.stats = {
+            'frames': 0,
+            'seconds': 0.0,
+            'fps': 0.0,
+        }
+
+    def __iter__(self):
+        """Capture frames and yield them with their timestamps."""
+        client = self.camera._client
+        start_time = monotonic()
+        # Whether a capture was requested and its message is pending, and
+        # time when the FPGA started it.
+        pending = False
+        capture_time = None
+        try:
+            client.send('{}\n'.format(self._capture))
+            capture_time = monotonic()
+            pending = True
+            while self.frames is None or self.stats['frames'] < self.frames:
+                # Clear the flag before waiting, so that a failed wait is
+                # not repeated when the iteration ends.
+                pending = False
+                self._wait_capture()
+                timestamp = capture_time
+                # Request the next capture after the transfer, unless the
+                # current frame is the last one.
+                last = self.stats['frames'] + 1 == self.frames
+                if self.prefetch and not last:
+                    client.send('{}\n{}\n'.format(self._command,
+                                                   self._capture))
+                    pending = True
+                else:
+                    client.send('{}\n'.format(self._command))
+                frame = client.read_array(self.shape)
+                # The prefetched capture starts after the transfer.
+                capture_time = monotonic()
+                self.stats['frames'] += 1
+                self._update_stats(start_time)
+                yield timestamp, frame
+                if not pending and not last:
+                    client.send('{}\n'.format(self._capture))
+                    capture_time = monotonic()
+                    pending = True
+        finally:
+            # Consume the message of the last capture, if any, so that
+            # the connection can be used afterwards.
+            if pending:
+                try:
+                    self._wait_capture()
+                except IOError as error:
+                    logger.warn('Capture message lost: {}'.format(error))
+            self._update_stats(start_time)
+            logger.info("Captured {} frames in {:.2f}s ({:.1f} fps)".format(
+                    self.stats['frames'], self.stats['seconds'],
+                    self.stats['fps']))
+
+    def _wait_capture(self):
+        """Wait for the message of the requested capture.
+
+        :raises IOError: if the message is not received after *tries*
+         reads.
+        """
+        for _ in range(self.tries):
+            lines = self.camera._client._read_lines(1)
+            if lines and lines[0] == self.CAPTURED:
+                return
+            elif lines:
+                logger.debug(repr("Obtained '{}' while waiting for a "
+                                  "frame".format(lines[0])))
+        raise IOError("Stop waiting for a frame after {} tries".format(
+                self.tries))
+
+    def _update_stats(self, start_time):
+        """Update the elapsed time and the achieved frame rate."""
+        self.stats['seconds'] = monotonic() - start_time
+        if self.stats['seconds']:
+            self.stats['fps'] = self.stats['frames'] / self.stats['seconds']